@@ -0,0 +1,384 @@
+"""
+A backend that translates VM commands to Hack assembly, for --asm.
+"""
+import typing
+from VMWriter import VMWriter
+
+# The registers that hold the bases of the segments that have one.
+BASES = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
+POINTERS = ("THIS", "THAT")
+TEMP_BASE = 5
+# Up to this index, a slot of a segment with a base is reached by
+# incrementing A, which leaves D alone.
+MAX_STEPS = 6
+# The computations of the binary commands: with the first operand in D and
+# the second in A or M, and with the first in M and the second in D.
+BINARY_WITH_OPERAND = {"add": "D+{}", "sub": "D-{}", "and": "D&{}",
+                       "or": "D|{}"}
+BINARY_ON_STACK = {"add": "D+M", "sub": "M-D", "and": "D&M", "or": "D|M"}
+# The jumps taken when x - y, the difference of the operands of a
+# comparison, makes it true, and false.
+JUMPS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+INVERTED_JUMPS = {"eq": "JNE", "gt": "JLE", "lt": "JGE"}
+# The operations that leave their first operand as it is when the second is
+# 0, counting a comparison as the difference of its operands.
+ZERO_IDENTITIES = {"add", "sub", "or", "eq", "gt", "lt"}
+# The instructions of the unary commands, on D. The shifts use the shift
+# instructions of the extended Hack ALU.
+UNARY = {"neg": ["D=-D"], "not": ["D=!D"], "shiftleft": ["D=D<<"],
+         "shiftright": ["D=D>>"]}
+CALL_LABEL = "$CALL"
+RETURN_LABEL = "$RETURN"
+HALT_LABEL = "$HALT"
+# What every program starts with: the bootstrap, which calls the entry of
+# the program, and the call and return sequences that every call and
+# return jump to. A call puts the number of arguments in R13, the callee in
+# R14 and the return address in D. A return puts the value in D.
+RUNTIME = [
+    "@256", "D=A", "@SP", "M=D",
+    "@R13", "M=0", "@{entry}", "D=A", "@R14", "M=D",
+    "@" + HALT_LABEL, "D=A", "@" + CALL_LABEL, "0;JMP",
+    "(" + HALT_LABEL + ")", "@" + HALT_LABEL, "0;JMP",
+    "(" + CALL_LABEL + ")",
+    "@SP", "A=M", "M=D",
+    "@LCL", "D=M", "@SP", "AM=M+1", "M=D",
+    "@ARG", "D=M", "@SP", "AM=M+1", "M=D",
+    "@THIS", "D=M", "@SP", "AM=M+1", "M=D",
+    "@THAT", "D=M", "@SP", "AM=M+1", "M=D",
+    "@SP", "MD=M+1", "@LCL", "M=D",
+    "@R13", "D=D-M", "@5", "D=D-A", "@ARG", "M=D",
+    "@R14", "A=M", "0;JMP",
+    "(" + RETURN_LABEL + ")",
+    "@R13", "M=D",
+    "@LCL", "D=M", "@5", "A=D-A", "D=M", "@R14", "M=D",
+    "@R13", "D=M", "@ARG", "A=M", "M=D",
+    "@ARG", "D=M+1", "@SP", "M=D",
+    "@LCL", "AM=M-1", "D=M", "@THAT", "M=D",
+    "@LCL", "AM=M-1", "D=M", "@THIS", "M=D",
+    "@LCL", "AM=M-1", "D=M", "@ARG", "M=D",
+    "@LCL", "A=M-1", "D=M", "@LCL", "M=D",
+    "@R14", "A=M", "0;JMP",
+]
+
+
+def rom_size(lines: typing.Iterable[str]) -> int:
+    """
+    Args:
+        lines (typing.Iterable[str]): lines of Hack assembly.
+
+    Returns:
+        int: how many instructions they assemble to.
+    """
+    return sum(1 for line in lines
+               if line.split("//")[0].strip() and not line.startswith("("))
+
+
+class AsmWriter(VMWriter):
+    """Writes Hack assembly instead of VM code. The commands are buffered
+    and optimized like VMWriter's, and translated when they are flushed.
+
+    The value on top of the stack is kept in D for as long as possible, so
+    a push followed by a pop is a move through D, and an operation on a
+    value the previous command pushed does not go through the stack. It is
+    stored to the stack before labels, jumps and calls. A push of a
+    constant or of a variable that A can address without D is combined
+    with the binary operation after it, and a comparison followed by a
+    conditional jump is a single jump on the difference of its operands.
+    Like the standard translation, gt and lt jump on the sign of that
+    difference, so they are wrong when it overflows.
+    Calls and returns jump to a single copy of their sequences, written
+    once by write_runtime().
+    """
+
+    def __init__(self, output_stream: typing.TextIO,
+                 passes: typing.Sequence = ()) -> None:
+        """Creates a new writer of Hack assembly.
+
+        Args:
+            output_stream (typing.TextIO): where the assembly is written.
+            passes (typing.Sequence): the optimization passes to run on
+            every subroutine, like VMWriter's.
+        """
+        super().__init__(output_stream, passes)
+        self.function = ""
+        self.class_name = ""
+        self.labels = 0
+        self.cached = False  # whether the top of the stack is in D
+        self.lines = []
+        self.instructions = 0
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how many instructions were written.
+        """
+        return {"asm instructions": self.instructions}
+
+    def write_runtime(self, entry: str) -> None:
+        """Writes the bootstrap and the call and return sequences, which
+        must come first in the program.
+
+        Args:
+            entry (str): the function the program starts with, Sys.init
+            with the OS, which never returns. When the entry returns, the
+            program loops forever.
+        """
+        lines = [line.format(entry=entry) for line in RUNTIME]
+        self.out.write("".join(line + "\n" for line in lines))
+        self.instructions += rom_size(lines)
+
+    def emit(self, commands: typing.List[tuple]) -> None:
+        """Translates optimized commands and writes their assembly.
+
+        Args:
+            commands (typing.List[tuple]): the commands to translate.
+        """
+        self.lines = []
+        index = 0
+        while index < len(commands):
+            index = self.translate(commands, index)
+        self.spill()
+        self.out.write("".join(line + "\n" for line in self.lines))
+        self.instructions += rom_size(self.lines)
+
+    def new_label(self) -> str:
+        """
+        Returns:
+            str: a label of the current function that no VM label can be,
+            as those never start with "$".
+        """
+        self.labels += 1
+        return "{}$${}".format(self.function, self.labels)
+
+    def spill(self) -> None:
+        """Stores the top of the stack, if it is in D."""
+        if self.cached:
+            self.lines.extend(["@SP", "AM=M+1", "A=A-1", "M=D"])
+            self.cached = False
+
+    def load(self) -> None:
+        """Pops the top of the stack into D, if it is not there."""
+        if not self.cached:
+            self.lines.extend(["@SP", "AM=M-1", "D=M"])
+            self.cached = True
+
+    def address(self, segment: str,
+                index: int) -> typing.Optional[typing.List[str]]:
+        """
+        Args:
+            segment (str): a segment other than constant.
+            index (int): the index of a slot in it.
+
+        Returns:
+            typing.Optional[typing.List[str]]: the instructions that set A
+            to the address of the slot without changing D, or None if there
+            are none short enough.
+        """
+        if segment == "temp":
+            return ["@R{}".format(TEMP_BASE + index)]
+        if segment == "pointer":
+            return ["@" + POINTERS[index]]
+        if segment == "static":
+            return ["@{}.{}".format(self.class_name, index)]
+        if index == 0:
+            return ["@" + BASES[segment], "A=M"]
+        if index <= MAX_STEPS:
+            return ["@" + BASES[segment], "A=M+1"] + ["A=A+1"] * (index - 1)
+        return None
+
+    def operand(self, command: tuple) \
+            -> typing.Optional[typing.Tuple[typing.List[str], str]]:
+        """
+        Args:
+            command (tuple): a push command.
+
+        Returns:
+            typing.Optional[typing.Tuple[typing.List[str], str]]: the
+            instructions that put the pushed value in A or M without
+            changing D, and which of the two it is in, or None.
+        """
+        if command[1] == "constant":
+            return ["@{}".format(command[2])], "A"
+        lines = self.address(command[1], command[2])
+        return (lines, "M") if lines is not None else None
+
+    def translate(self, commands: typing.List[tuple], index: int) -> int:
+        """Translates the command at an index, and the ones after it that
+        it is combined with.
+
+        Args:
+            commands (typing.List[tuple]): the commands being translated.
+            index (int): the index of the command to translate.
+
+        Returns:
+            int: the index of the next command to translate.
+        """
+        command = commands[index]
+        operation = command[0]
+        following = commands[index + 1][0] if index + 1 < len(commands) \
+            else None
+        if operation == "push" and (following in BINARY_WITH_OPERAND or
+                                    following in JUMPS):
+            operand = self.operand(command)
+            if operand is not None:
+                self.load()
+                lines, register = operand
+                if command == ("push", "constant", 1) and \
+                        following in {"add", "sub"}:
+                    self.lines.append("D=D+1" if following == "add"
+                                      else "D=D-1")
+                elif not (command == ("push", "constant", 0) and
+                          following in ZERO_IDENTITIES):
+                    operation = "sub" if following in JUMPS else following
+                    self.lines.extend(lines)
+                    self.lines.append("D=" + BINARY_WITH_OPERAND[
+                        operation].format(register))
+                if following in JUMPS:
+                    return self.compare(following, commands, index + 2)
+                return index + 2
+        if operation == "push":
+            self.translate_push(command,
+                                commands[index - 1] if index else None)
+        elif operation == "pop":
+            self.translate_pop(command[1], command[2])
+        elif operation in BINARY_ON_STACK:
+            self.load()
+            self.lines.extend(["@SP", "AM=M-1",
+                               "D=" + BINARY_ON_STACK[operation]])
+        elif operation in JUMPS:
+            self.load()
+            self.lines.extend(["@SP", "AM=M-1", "D=M-D"])
+            return self.compare(operation, commands, index + 1)
+        elif operation in UNARY:
+            self.load()
+            self.lines.extend(UNARY[operation])
+        elif operation == "label":
+            self.spill()
+            self.lines.append("({}${})".format(self.function, command[1]))
+        elif operation == "goto":
+            self.spill()
+            self.lines.extend(["@{}${}".format(self.function, command[1]),
+                               "0;JMP"])
+        elif operation == "if-goto":
+            self.load()
+            self.lines.extend(["@{}${}".format(self.function, command[1]),
+                               "D;JNE"])
+            self.cached = False
+        elif operation == "function":
+            self.translate_function(command[1], command[2])
+        elif operation == "call":
+            self.translate_call(command[1], command[2])
+        elif operation == "return":
+            self.load()
+            self.lines.extend(["@" + RETURN_LABEL, "0;JMP"])
+            self.cached = False
+        return index + 1
+
+    def translate_push(self, command: tuple,
+                       previous: typing.Optional[tuple]) -> None:
+        """
+        Args:
+            command (tuple): a push command.
+            previous (typing.Optional[tuple]): the command before it.
+        """
+        if previous == ("pop",) + command[1:]:
+            # A pop leaves the value it stored in D.
+            self.cached = True
+            return
+        self.spill()
+        segment, index = command[1], command[2]
+        if segment == "constant" and index in {0, 1}:
+            self.lines.append("D={}".format(index))
+        elif segment == "constant":
+            self.lines.extend(["@{}".format(index), "D=A"])
+        else:
+            lines = self.address(segment, index) or [
+                "@" + BASES[segment], "D=M", "@{}".format(index), "A=D+A"]
+            self.lines.extend(lines + ["D=M"])
+        self.cached = True
+
+    def translate_pop(self, segment: str, index: int) -> None:
+        """
+        Args:
+            segment (str): the segment to pop to.
+            index (int): the index of the slot.
+        """
+        lines = self.address(segment, index)
+        if lines is not None:
+            self.load()
+            self.lines.extend(lines + ["M=D"])
+        elif self.cached:
+            self.lines.extend([
+                "@R13", "M=D", "@" + BASES[segment], "D=M",
+                "@{}".format(index), "D=D+A", "@R14", "M=D", "@R13", "D=M",
+                "@R14", "A=M", "M=D"])
+        else:
+            self.lines.extend([
+                "@" + BASES[segment], "D=M", "@{}".format(index), "D=D+A",
+                "@R13", "M=D", "@SP", "AM=M-1", "D=M", "@R13", "A=M", "M=D"])
+        self.cached = False
+
+    def compare(self, operation: str, commands: typing.List[tuple],
+                index: int) -> int:
+        """Finishes a comparison, once D holds the difference of its
+        operands.
+
+        Args:
+            operation (str): "eq", "gt" or "lt".
+            commands (typing.List[tuple]): the commands being translated.
+            index (int): the index of the command after the comparison.
+
+        Returns:
+            int: the index of the next command to translate.
+        """
+        following = commands[index:index + 2]
+        if following and following[0][0] == "if-goto":
+            self.lines.extend(["@{}${}".format(self.function, following[0][1]),
+                               "D;" + JUMPS[operation]])
+            self.cached = False
+            return index + 1
+        if len(following) == 2 and following[0] == ("not",) and \
+                following[1][0] == "if-goto":
+            self.lines.extend(["@{}${}".format(self.function, following[1][1]),
+                               "D;" + INVERTED_JUMPS[operation]])
+            self.cached = False
+            return index + 2
+        true, end = self.new_label(), self.new_label()
+        self.lines.extend(["@" + true, "D;" + JUMPS[operation], "D=0",
+                           "@" + end, "0;JMP", "({})".format(true), "D=-1",
+                           "({})".format(end)])
+        self.cached = True
+        return index
+
+    def translate_function(self, name: str, n_locals: int) -> None:
+        """
+        Args:
+            name (str): the name of the function.
+            n_locals (int): the number of its locals, which start as 0.
+        """
+        self.spill()
+        self.function = name
+        self.class_name = name.split(".")[0]
+        self.labels = 0
+        self.lines.append("({})".format(name))
+        if n_locals == 1:
+            self.lines.extend(["@SP", "AM=M+1", "A=A-1", "M=0"])
+        elif n_locals:
+            self.lines.extend(["@SP", "A=M"] + ["M=0", "A=A+1"] * n_locals +
+                              ["D=A", "@SP", "M=D"])
+
+    def translate_call(self, name: str, n_args: int) -> None:
+        """
+        Args:
+            name (str): the name of the function to call.
+            n_args (int): the number of arguments on the stack.
+        """
+        self.spill()
+        if n_args in {0, 1}:
+            self.lines.extend(["@R13", "M={}".format(n_args)])
+        else:
+            self.lines.extend(["@{}".format(n_args), "D=A", "@R13", "M=D"])
+        returned = self.new_label()
+        self.lines.extend(["@" + name, "D=A", "@R14", "M=D", "@" + returned,
+                           "D=A", "@" + CALL_LABEL, "0;JMP",
+                           "({})".format(returned)])
@@ -0,0 +1,174 @@
+"""
+Tracks which outputs are up to date with their sources for incremental
+builds, and shares compiled outputs through an optional cache directory.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import typing
+
+MANIFEST_NAME = ".jackc-manifest.json"
+
+
+def compiler_version() -> str:
+    """
+    Returns:
+        str: a hash of the compiler's own source files, so that any change to
+        the compiler invalidates everything it compiled before.
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(directory, "*.py"))):
+        with open(path, "rb") as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """
+    Args:
+        path (str): a file to hash.
+
+    Returns:
+        str: the SHA-256 of the file's contents.
+    """
+    with open(path, "rb") as source:
+        return hashlib.sha256(source.read()).hexdigest()
+
+
+def replace_atomically(source_path: str, output_path: str) -> None:
+    """Copies a file so that output_path is never seen half written."""
+    temp_path = "{}.{}.tmp".format(output_path, os.getpid())
+    shutil.copyfile(source_path, temp_path)
+    os.replace(temp_path, output_path)
+
+
+class BuildCache:
+    """Decides which files of a build are unchanged since the last one.
+
+    A manifest next to the outputs records, for every source file, the hash
+    of its contents, the compiler version and a fingerprint of the options it
+    was compiled with. A file is up to date if all three match and its output
+    is still there, untouched. Optionally, outputs are also kept in a shared,
+    content-addressed cache directory, so several checkouts can reuse each
+    other's results.
+    """
+
+    def __init__(self, directory: str, options: typing.Dict[str, typing.Any],
+                 cache_dir: typing.Optional[str] = None) -> None:
+        """Loads the manifest of a directory.
+
+        Args:
+            directory (str): where the outputs and the manifest live.
+            options (typing.Dict[str, typing.Any]): the compile options,
+            outputs compiled with other options are never reused.
+            cache_dir (typing.Optional[str]): the shared cache directory.
+        """
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.version = compiler_version()
+        self.options = hashlib.sha256(json.dumps(
+            options, sort_keys=True).encode()).hexdigest()
+        self.cache_dir = cache_dir
+        self.up_to_date = 0
+        self.restored = 0
+        self.compiled = 0
+        self.entries = {}
+        self.source_hashes = {}
+        try:
+            with open(self.manifest_path) as manifest:
+                self.entries = json.load(manifest)["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _source_hash(self, input_path: str) -> str:
+        if input_path not in self.source_hashes:
+            self.source_hashes[input_path] = hash_file(input_path)
+        return self.source_hashes[input_path]
+
+    def _cache_path(self, input_path: str) -> str:
+        key = hashlib.sha256("{} {} {}".format(
+            self.version, self.options,
+            self._source_hash(input_path)).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".vm")
+
+    def restore(self, input_path: str, output_path: str) -> bool:
+        """Checks whether a file needs to be compiled, and restores its
+        output from the shared cache if it is there.
+
+        Args:
+            input_path (str): the .jack file.
+            output_path (str): where its VM code goes.
+
+        Returns:
+            bool: True if output_path is up to date, False if the file has to
+            be compiled.
+        """
+        entry = self.entries.get(os.path.basename(input_path))
+        if entry and entry["version"] == self.version and \
+                entry["options"] == self.options and \
+                entry["source"] == self._source_hash(input_path):
+            try:
+                stat = os.stat(output_path)
+            except OSError:
+                stat = None
+            if stat and [stat.st_size, stat.st_mtime_ns] == entry["output"]:
+                if self.cache_dir and \
+                        not os.path.exists(self._cache_path(input_path)):
+                    self._store(input_path, output_path)
+                self.up_to_date += 1
+                return True
+        if self.cache_dir and os.path.exists(self._cache_path(input_path)):
+            replace_atomically(self._cache_path(input_path), output_path)
+            self._record(input_path, output_path)
+            self.restored += 1
+            return True
+        return False
+
+    def _record(self, input_path: str, output_path: str) -> None:
+        stat = os.stat(output_path)
+        self.entries[os.path.basename(input_path)] = {
+            "source": self._source_hash(input_path),
+            "version": self.version,
+            "options": self.options,
+            "output": [stat.st_size, stat.st_mtime_ns]
+        }
+
+    def record(self, input_path: str, output_path: str) -> None:
+        """Records a freshly compiled file in the manifest and the shared
+        cache.
+
+        Args:
+            input_path (str): the .jack file.
+            output_path (str): the VM code it was compiled to.
+        """
+        self._record(input_path, output_path)
+        self.compiled += 1
+        if self.cache_dir:
+            self._store(input_path, output_path)
+
+    def _store(self, input_path: str, output_path: str) -> None:
+        cache_path = self._cache_path(input_path)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        replace_atomically(output_path, cache_path)
+
+    def save(self) -> None:
+        """Writes the manifest back next to the outputs."""
+        temp_path = "{}.{}.tmp".format(self.manifest_path, os.getpid())
+        with open(temp_path, "w") as manifest:
+            json.dump({"files": self.entries}, manifest, indent=1,
+                      sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: the hit and miss statistics of this build.
+        """
+        total = self.up_to_date + self.restored + self.compiled
+        hits = self.up_to_date + self.restored
+        return "incremental: {} up to date, {} from cache, {} compiled " \
+               "({:.0%} hit rate)".format(
+                   self.up_to_date, self.restored, self.compiled,
+                   hits / total if total else 1.0)
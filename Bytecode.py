@@ -0,0 +1,257 @@
+"""
+The .vmb format, a compact binary encoding of VM code: a writer, a
+reader that decodes in place, and converters to and from .vm text.
+"""
+import argparse
+import io
+import mmap
+import os
+import typing
+from IR import OPCODES, SEGMENTS, Instruction, Opcode, decode, encode
+from VMWriter import VMWriter, format_command, parse_commands
+
+# A .vmb file is MAGIC, the string table and the instructions. The string
+# table is the number of names followed by every name, as its length in
+# bytes and its UTF-8 encoding, in the order the instructions number them.
+# An instruction is its opcode in one byte followed by its operands, and
+# every number is an unsigned LEB128 varint.
+MAGIC = b"VMB\x01"
+# The number of operands of every opcode: a push or a pop has a segment and
+# an index, a function or a call a name and a count, and a label or a jump
+# a name.
+OPERANDS = tuple(
+    2 if opcode in {Opcode.PUSH, Opcode.POP, Opcode.FUNCTION, Opcode.CALL}
+    else 1 if opcode in {Opcode.LABEL, Opcode.GOTO, Opcode.IF_GOTO} else 0
+    for opcode in Opcode)
+BY_VALUE = tuple(Opcode)
+# The opcode and the segment of every push and pop, by its first two words.
+PREFIXES = {(opcode.word, segment): bytes((opcode, SEGMENTS[segment]))
+            for opcode in (Opcode.PUSH, Opcode.POP) for segment in SEGMENTS}
+
+
+def write_varint(buffer: bytearray, value: int) -> None:
+    """
+    Args:
+        buffer (bytearray): where to append the varint.
+        value (int): a non-negative number.
+    """
+    while value >= 0x80:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: typing.Sequence[int],
+                offset: int) -> typing.Tuple[int, int]:
+    """
+    Args:
+        data (typing.Sequence[int]): the bytes to read from.
+        offset (int): where the varint starts.
+
+    Returns:
+        typing.Tuple[int, int]: its value and the offset after it.
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class BytecodeWriter(VMWriter):
+    """Writes VM bytecode instead of VM code. The commands are buffered and
+    optimized like VMWriter's and encoded when they are flushed, and the
+    whole file is written at once by close(), as the string table that
+    comes first is only complete then.
+    """
+
+    def __init__(self, output_stream: typing.BinaryIO,
+                 passes: typing.Sequence = ()) -> None:
+        """Creates a new writer of VM bytecode.
+
+        Args:
+            output_stream (typing.BinaryIO): where the bytecode is written.
+            passes (typing.Sequence): the optimization passes to run on
+            every subroutine, like VMWriter's.
+        """
+        super().__init__(output_stream, passes)
+        self.names = []
+        self.numbers = {}  # name -> its index in names
+        self.code = bytearray()
+
+    def number(self, name: str) -> int:
+        """
+        Args:
+            name (str): the name of a label or a function.
+
+        Returns:
+            int: its index in the string table, a new one if it is not in
+            the table yet.
+        """
+        if name not in self.numbers:
+            self.numbers[name] = len(self.names)
+            self.names.append(name)
+        return self.numbers[name]
+
+    def emit(self, commands: typing.List[tuple]) -> None:
+        """Encodes optimized commands.
+
+        Args:
+            commands (typing.List[tuple]): the commands to encode.
+        """
+        code = self.code
+        for command in commands:
+            # Pushes and pops are most of the code, and their first two
+            # words are a single lookup.
+            prefix = PREFIXES.get(command[:2])
+            if prefix is not None:
+                code.extend(prefix)
+            else:
+                opcode = OPCODES[command[0]]
+                code.append(opcode)
+                if not OPERANDS[opcode]:
+                    continue
+                write_varint(code, self.number(command[1]))
+                if OPERANDS[opcode] == 1:
+                    continue
+            write_varint(code, command[2])
+
+    def close(self) -> None:
+        """Flushes the buffered commands and writes the file."""
+        super().close()
+        header = bytearray(MAGIC)
+        write_varint(header, len(self.names))
+        for name in self.names:
+            encoded = name.encode("utf-8")
+            write_varint(header, len(encoded))
+            header.extend(encoded)
+        self.out.write(header)
+        self.out.write(self.code)
+
+
+def read(data: typing.Any) \
+        -> typing.Tuple[typing.List[str], typing.List[Instruction]]:
+    """Decodes VM bytecode in place, without copying it.
+
+    Args:
+        data (typing.Any): the bytecode, any object that supports the buffer
+        protocol, such as bytes or an mmap.
+
+    Returns:
+        typing.Tuple[typing.List[str], typing.List[Instruction]]: the string
+        table and the instructions, which number their names by it.
+
+    Raises:
+        ValueError: if the data is not valid VM bytecode.
+    """
+    with memoryview(data) as view:
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError("not VM bytecode")
+        try:
+            count, offset = read_varint(view, len(MAGIC))
+            names = []
+            for _ in range(count):
+                length, offset = read_varint(view, offset)
+                names.append(str(view[offset:offset + length], "utf-8"))
+                offset += length
+            instructions = []
+            end = len(view)
+            while offset < end:
+                opcode = view[offset]
+                operand = index = 0
+                operands = OPERANDS[opcode]
+                offset += 1
+                if operands:
+                    # Most operands fit in a single byte.
+                    operand = view[offset]
+                    offset += 1
+                    if operand >= 0x80:
+                        operand, offset = read_varint(view, offset - 1)
+                    if operands == 2:
+                        index = view[offset]
+                        offset += 1
+                        if index >= 0x80:
+                            index, offset = read_varint(view, offset - 1)
+                instructions.append(
+                    Instruction(BY_VALUE[opcode], operand, index))
+        except IndexError:
+            raise ValueError("truncated or corrupt VM bytecode") from None
+    return names, instructions
+
+
+def load(path: str) \
+        -> typing.Tuple[typing.List[str], typing.List[Instruction]]:
+    """Reads a .vm file or decodes a .vmb file, which is mapped to memory
+    rather than read.
+
+    Args:
+        path (str): the file to load.
+
+    Returns:
+        typing.Tuple[typing.List[str], typing.List[Instruction]]: like
+        read().
+    """
+    if os.path.splitext(path)[1].lower() != ".vmb":
+        with open(path, "r") as vm_file:
+            commands = parse_commands(vm_file.read())
+        writer = BytecodeWriter(io.BytesIO())
+        return writer.names, [encode(command, writer.number)
+                              for command in commands]
+    with open(path, "rb") as vmb_file, \
+            mmap.mmap(vmb_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return read(data)
+
+
+def from_text(text: str) -> bytes:
+    """
+    Args:
+        text (str): VM code.
+
+    Returns:
+        bytes: its bytecode.
+    """
+    output = io.BytesIO()
+    writer = BytecodeWriter(output)
+    writer.emit(parse_commands(text))
+    writer.close()
+    return output.getvalue()
+
+
+def to_text(data: typing.Any) -> str:
+    """
+    Args:
+        data (typing.Any): VM bytecode, as accepted by read().
+
+    Returns:
+        str: its VM code, without the comments of the text it was encoded
+        from.
+    """
+    names, instructions = read(data)
+    return "".join(format_command(decode(instruction, names))
+                   for instruction in instructions)
+
+
+if "__main__" == __name__:
+    # Converts .vm files to .vmb files and back, next to the input files.
+    parser = argparse.ArgumentParser(
+        prog="Bytecode",
+        description="Converts VM code to VM bytecode and back.")
+    parser.add_argument("input_paths", nargs="+", metavar="input_path",
+                        help="a .vm file, converted to .vmb, or a .vmb "
+                             "file, converted to .vm")
+    args = parser.parse_args()
+    for input_path in args.input_paths:
+        filename, extension = os.path.splitext(input_path)
+        if extension.lower() == ".vmb":
+            with open(input_path, "rb") as input_file, \
+                    open(filename + ".vm", "w") as output_file:
+                output_file.write(to_text(input_file.read()))
+        elif extension.lower() == ".vm":
+            with open(input_path, "r") as input_file, \
+                    open(filename + ".vmb", "wb") as output_file:
+                output_file.write(from_text(input_file.read()))
+        else:
+            parser.error("not a .vm or .vmb file: " + input_path)
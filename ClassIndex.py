@@ -0,0 +1,161 @@
+"""
+A pre-pass that indexes the signatures of the classes of a program by
+reading only their headers, and keeps the index on disk between runs.
+"""
+import json
+import os
+import re
+import typing
+from BuildCache import compiler_version
+
+INDEX_NAME = ".jackc-index.json"
+# Comments and string constants, which may contain anything.
+NOISE_PATTERN = re.compile(r'/(?:/[^\n]*|\*.*?\*/)|"[^"\n]*"', re.S)
+CLASS_PATTERN = re.compile(r'\bclass\s+(\w+)')
+# A class variable or subroutine declaration, up to its ";" or "{". There is
+# no leading \b, which would keep the engine from skipping ahead to the
+# first letters of the keywords, so word boundaries are checked by hand.
+DECLARATION_PATTERN = re.compile(
+    r'(constructor|function|method|static|field)\s+(\w+)\s+([^;{]*)')
+SUBROUTINE_KINDS = {"constructor", "function", "method"}
+
+
+def scan_headers(text: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """Reads the signature of a class, without parsing subroutine bodies.
+
+    Args:
+        text (str): the source of a .jack file.
+
+    Returns:
+        typing.Optional[typing.Dict[str, typing.Any]]: the name of the class,
+        its number of fields and statics, and every subroutine by name with
+        its kind, return type and number of parameters (not counting this),
+        or None if the file has no class.
+        For example: {"name": "Point", "fields": 2, "statics": 0,
+        "subroutines": {"new": {"kind": "constructor", "type": "Point",
+        "parameters": 2}}}
+    """
+    text = NOISE_PATTERN.sub(" ", text)
+    match = CLASS_PATTERN.search(text)
+    if not match:
+        return None
+    counts = {"static": 0, "field": 0}
+    subroutines = {}
+    for declaration in DECLARATION_PATTERN.finditer(text):
+        start = declaration.start()
+        if start and (text[start - 1].isalnum() or text[start - 1] == "_"):
+            continue
+        kind, declared_type, rest = declaration.groups()
+        if kind not in SUBROUTINE_KINDS:
+            counts[kind] += rest.count(",") + 1
+            continue
+        name, _, parameters = rest.partition("(")
+        parameters = parameters.rpartition(")")[0]
+        subroutines[name.strip()] = {
+            "kind": kind,
+            "type": declared_type,
+            "parameters": parameters.count(",") + 1 if parameters.strip()
+            else 0
+        }
+    return {"name": match.group(1), "fields": counts["field"],
+            "statics": counts["static"], "subroutines": subroutines}
+
+
+class ClassIndex:
+    """The signatures of every class of a program, built by a pre-pass over
+    its .jack files that only looks at class and subroutine headers.
+
+    The index is saved to a file, by default next to the sources, and a
+    later run only scans the files whose size or modification time changed.
+    An index saved by another version of the compiler is discarded, as the
+    analyses kept in it may have changed.
+    """
+
+    def __init__(self, directory: str,
+                 path: typing.Optional[str] = None) -> None:
+        """Loads the saved index of a directory, if there is one.
+
+        Args:
+            directory (str): the directory of the .jack files.
+            path (typing.Optional[str]): the file the index is saved to, by
+            default INDEX_NAME in the directory.
+        """
+        self.directory = directory
+        self.path = path or os.path.join(directory, INDEX_NAME)
+        self.files = {}  # file name -> {"stat": [...], "class": {...}, ...}
+        self.scanned = 0
+        self.version = compiler_version()
+        try:
+            with open(self.path) as saved:
+                index = json.load(saved)
+            if index["version"] == self.version:
+                self.files = index["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+        self.changed = False
+
+    def update(self, paths: typing.Iterable[str]) -> None:
+        """Scans the files that are new or changed since the index was saved,
+        and forgets the files that are gone.
+
+        Args:
+            paths (typing.Iterable[str]): every .jack file of the program.
+        """
+        names = set()
+        for path in paths:
+            name = os.path.basename(path)
+            names.add(name)
+            stat = os.stat(path)
+            stamp = [stat.st_size, stat.st_mtime_ns]
+            if name in self.files and self.files[name]["stat"] == stamp:
+                continue
+            with open(path) as source:
+                self.files[name] = {"stat": stamp,
+                                    "class": scan_headers(source.read())}
+            self.scanned += 1
+            self.changed = True
+        for name in set(self.files) - names:
+            del self.files[name]
+            self.changed = True
+
+    def annotate(self, key: str, analyze: typing.Callable[[str], typing.Any]) \
+            -> typing.Dict[str, typing.Any]:
+        """Keeps the result of another analysis of every file in the index.
+        Like the headers, it is only redone for the files scanned again, so
+        it must depend on nothing but the file itself.
+
+        Args:
+            key (str): the name of the analysis.
+            analyze (typing.Callable[[str], typing.Any]): takes the path of a
+            .jack file, returns something that can be saved as JSON.
+
+        Returns:
+            typing.Dict[str, typing.Any]: the result for every file, by file
+            name.
+        """
+        for name, entry in self.files.items():
+            if key not in entry:
+                entry[key] = analyze(os.path.join(self.directory, name))
+                self.changed = True
+        return {name: entry[key] for name, entry in sorted(self.files.items())}
+
+    def save(self) -> None:
+        """Writes the index back to disk, if it changed."""
+        if not self.changed:
+            return
+        temp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(temp_path, "w") as index:
+            # dumps() uses the C encoder, dump() does not.
+            index.write(json.dumps({"version": self.version,
+                                    "files": self.files}, sort_keys=True))
+        os.replace(temp_path, self.path)
+        self.changed = False
+
+    def classes(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """
+        Returns:
+            typing.Dict[str, typing.Dict[str, typing.Any]]: the signature of
+            every class, as returned by scan_headers, by class name.
+        """
+        return {entry["class"]["name"]: entry["class"]
+                for _, entry in sorted(self.files.items()) if entry["class"]}
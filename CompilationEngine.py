@@ -5,9 +5,13 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import ConstantFolder
 import JackTokenizer
+import LoopHoister
+import StringPool
 import SymbolTable
 import VMWriter
+import typing
 
 STATEMENTS = {"let", "while", "if", "do", "return"}
 OPS = {'+', '-', '*', '/', '&', '|', '<', '>', '=', "&lt;", "&gt;", "&amp;"}
@@ -20,6 +24,35 @@ BIN_OPS_DICT = {
     '&amp;': 'AND',
     '|': 'OR',
 }
+COMPARISONS = {"eq", "gt", "lt"}
+# OS calls that are cheaper written out where they are made, by name and
+# number of arguments. The arguments are on the stack when the commands run.
+# They take no jumps, so the values of the enclosing expression may stay on
+# the stack: a comparison gives a mask m of 0 or -1, abs(x) is
+# x + (-2x & m) and min(a, b) and max(a, b) are a + (b - a & m). Temp 0 and
+# temp 1 only hold values inside an expansion, which never calls anything.
+INTRINSICS = {
+    ("Memory.peek", 1): [("pop", "pointer", 1), ("push", "that", 0)],
+    ("Memory.poke", 2): [("pop", "temp", 0), ("pop", "pointer", 1),
+                         ("push", "temp", 0), ("pop", "that", 0)],
+    ("Math.abs", 1): [("pop", "temp", 0), ("push", "temp", 0),
+                      ("push", "temp", 0), ("push", "temp", 0), ("add",),
+                      ("neg",), ("push", "temp", 0), ("push", "constant", 0),
+                      ("lt",), ("and",), ("add",)],
+    ("Math.min", 2): [("pop", "temp", 1), ("pop", "temp", 0),
+                      ("push", "temp", 0), ("push", "temp", 1),
+                      ("push", "temp", 0), ("sub",), ("push", "temp", 1),
+                      ("push", "temp", 0), ("lt",), ("and",), ("add",)],
+    ("Math.max", 2): [("pop", "temp", 1), ("pop", "temp", 0),
+                      ("push", "temp", 0), ("push", "temp", 1),
+                      ("push", "temp", 0), ("sub",), ("push", "temp", 1),
+                      ("push", "temp", 0), ("gt",), ("and",), ("add",)],
+}
+# Intrinsics whose call returns nothing useful: their expansion leaves no
+# value on the stack.
+VOID_INTRINSICS = {("Memory.poke", 2)}
+# Where a subroutine that calls itself last jumps back to, instead.
+START_LABEL = "SUBROUTINE_START"
 UNARY = {'#', '^', '~', '-'}
 UNARY_OPS_DICT = {
     '-': 'NEG',
@@ -42,11 +75,31 @@ class CompilationEngine:
     """
 
     def __init__(self, input_stream: "JackTokenizer",
-                 table: "SymbolTable", writer: "VMWriter") -> None:
+                 table: "SymbolTable", writer: "VMWriter",
+                 strings: "StringPool" = None, opt_level: int = 0,
+                 classes: dict = None, tail_calls: bool = True,
+                 loops: "LoopHoister" = None,
+                 intrinsics: bool = False) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
         :param input_stream: The input stream.
+        :param strings: if given, string constants are pooled in it instead
+        of being built every time they are evaluated.
+        :param opt_level: from 1 on, if and while statements are laid out so
+        that they take as few jumps as possible.
+        :param classes: the signatures of the classes of the program, by
+        name, as built by ClassIndex. A subroutine of this class called
+        without a qualifier is compiled by its signature. Without one, a do
+        statement calls it as a method and an expression calls the bare
+        name, as they did before the index.
+        :param tail_calls: from opt_level 1 on, a subroutine that returns
+        the result of calling itself jumps back to its start instead.
+        :param loops: if given, the invariant expressions of while loops are
+        hoisted out of them into new locals.
+        :param intrinsics: if True, the calls in INTRINSICS are expanded
+        where they are made, unless the program defines the class itself,
+        and array elements at a constant index are addressed directly.
         """
         # Your code goes here!
         # Note that you can write to output_stream like so:
@@ -54,16 +107,22 @@ class CompilationEngine:
         self.tkn = input_stream
         self.table = table
         self.writer = writer
+        self.strings = strings
+        self.opt_level = opt_level
+        self.classes = classes or {}
         self.out = writer.out
         self.outerFuncName = ""
+        self.subroutine_name = None
+        self.function_type = None
+        self.tail_calls = tail_calls and opt_level >= 1
+        self.restarts = 0
+        self.tail_calls_removed = 0
+        self.loops = loops
+        self.extra_locals = 0
+        self.intrinsics = intrinsics
+        self.intrinsics_expanded = {}  # name -> expansions
+        self.constant_indices = 0
 
-        self.get_name = {
-            "IDENTIFIER": self.tkn.identifier,
-            "KEYWORD": self.tkn.keyword,
-            "SYMBOL": self.tkn.symbol,
-            "STRING_CONST": self.tkn.string_val,
-            "INT_CONST": self.tkn.int_val
-        }
         self.statement_dict = {
             "let": self.compile_let,
             "if": self.compile_if,
@@ -88,19 +147,109 @@ class CompilationEngine:
         elif binary_op:
             self.writer.write_arithmetic(BIN_OPS_DICT[binary_op])
 
+    def write_call(self, name: str, n_args: int,
+                   discard: bool = False) -> None:
+        """Writes a call, or the expansion of an intrinsic in its place.
+
+        Args:
+            name (str): the full name of the subroutine.
+            n_args (int): the number of arguments on the stack.
+            discard (bool): if True, the value of the call is not used, as
+            in a do statement, and is thrown away into temp 0.
+        """
+        intrinsic = (name, n_args)
+        if not self.intrinsics or intrinsic not in INTRINSICS or \
+                name.split(".")[0] in self.classes:
+            self.writer.write_call(name, n_args)
+            if discard:
+                self.writer.write_pop("TEMP", 0)
+            return
+        self.writer.write_commands(INTRINSICS[intrinsic])
+        if intrinsic in VOID_INTRINSICS and not discard:
+            self.writer.write_push("CONST", 0)
+        elif intrinsic not in VOID_INTRINSICS and discard:
+            self.writer.write_pop("TEMP", 0)
+        self.intrinsics_expanded[name] = \
+            self.intrinsics_expanded.get(name, 0) + 1
+
+    def constant_index(self, mark: int) -> typing.Optional[int]:
+        """Takes back the index of an array access written since a mark, if
+        intrinsics are on and it is a constant that "that" can be offset by.
+
+        Args:
+            mark (int): where the commands of the index start.
+
+        Returns:
+            typing.Optional[int]: the constant, or None if the index was
+            left in place.
+        """
+        if self.intrinsics and self.writer.mark() == mark + 1:
+            command = self.writer.cut(mark)[0]
+            if command[:2] == ("push", "constant"):
+                self.constant_indices += 1
+                return command[2]
+            self.writer.write_commands([command])
+        return None
+
+    def signature(self, class_name: str, name: str) -> typing.Optional[dict]:
+        """
+        Args:
+            class_name (str): the name of a class.
+            name (str): the name of one of its subroutines.
+
+        Returns:
+            typing.Optional[dict]: the signature of the subroutine in the
+            class index, or None if the index does not have it.
+        """
+        return self.classes.get(class_name, {}).get(
+            "subroutines", {}).get(name)
+
+    def is_function(self, class_name: str, name: str) -> bool:
+        """
+        Args:
+            class_name (str): the name of a class.
+            name (str): the name of one of its subroutines.
+
+        Returns:
+            bool: True if the class index knows the subroutine is a function
+            or a constructor, so it takes no "this".
+        """
+        subroutine = self.signature(class_name, name)
+        return bool(subroutine) and subroutine["kind"] != "method"
+
+    def write_variable(self, command: str, name: str) -> None:
+        """Writes a push or a pop of a variable, resolved in a single lookup.
+        Unknown names are skipped, like the writer skips unknown segments.
+
+        Args:
+            command (str): "push" or "pop".
+            name (str): the name of the variable.
+        """
+        symbol = self.table.resolve(name)
+        if symbol and command == "push":
+            self.writer.write_push(symbol.segment, symbol.index)
+        elif symbol:
+            self.writer.write_pop(symbol.segment, symbol.index)
+
     def compile_class(self) -> None:
         """Compiles a complete class."""
         # Your code goes here!
 
         self.my_advance()
-        self.class_name = self.get_name[self.tkn.token_type()]()
+        self.class_name = self.tkn.value()
         self.my_advance()
         self.my_advance()
         if self.tkn.keyword() in {"field", "static"}:
             self.compile_class_var_dec()
+        if self.strings:
+            self.strings.start_class(self.class_name,
+                                     self.table.var_count("STATIC"))
 
         if self.tkn.keyword() in {"constructor", "function", "method"}:
             self.compile_subroutine()
+        if self.strings:
+            self.strings.write_initializer(self.writer)
+            self.writer.flush()
 
     def compile_class_var_dec(self) -> None:
         """Compiles a static declaration or a field declaration."""
@@ -108,15 +257,14 @@ class CompilationEngine:
         class_var = True
         while class_var:
             # static / field:
-            curr_kind = self.get_name[
-                self.tkn.token_type()]().upper()  # STATIC or FIELD
+            curr_kind = self.tkn.value().upper()  # STATIC or FIELD
             self.my_advance()
             # int, char, boolean, className
 
-            curr_type = self.get_name[self.tkn.token_type()]()
+            curr_type = self.tkn.value()
             self.my_advance()
             while self.tkn.token_type() != "KEYWORD":  # in case of x, y, z ...
-                curr_name = self.get_name[self.tkn.token_type()]()
+                curr_name = self.tkn.value()
                 if curr_name not in {",", ";"}:
                     self.table.define(curr_name, curr_type, curr_kind)
                 self.my_advance()
@@ -139,15 +287,17 @@ class CompilationEngine:
             self.my_advance()
             self.outerFuncName = self.class_name + "."
             self.outerFuncName += self.tkn.identifier()
+            self.subroutine_name = self.outerFuncName
+            self.function_type = function_type
             self.my_advance()
             self.my_advance()
             self.compile_parameter_list()
             self.my_advance()
             self.compile_subroutine_body(function_type)
+            self.writer.flush()
             self.table.start_subroutine()
-            if self.get_name[self.tkn.token_type()]() not in {"constructor",
-                                                              "function",
-                                                              "method"}:
+            if self.tkn.value() not in {"constructor", "function",
+                                        "method"}:
                 subroutine = False
             self.ifs = -1
             self.whiles = -1
@@ -158,13 +308,12 @@ class CompilationEngine:
         """
         # Your code goes here!
         curr_type = None
-        while self.get_name[self.tkn.token_type()]() != ")":
-            if self.get_name[self.tkn.token_type()]() != ",":
+        while self.tkn.value() != ")":
+            if self.tkn.value() != ",":
                 if not curr_type:
-                    curr_type = self.get_name[self.tkn.token_type()]()
+                    curr_type = self.tkn.value()
                 else:
-                    self.table.define(self.get_name[self.tkn.token_type()](),
-                                      curr_type, "ARG")
+                    self.table.define(self.tkn.value(), curr_type, "ARG")
                     curr_type = None
             self.my_advance()
 
@@ -180,32 +329,52 @@ class CompilationEngine:
     def compile_subroutine_body(self, function_type) -> None:
 
         self.my_advance()
+        mark = self.writer.mark()
         self.compile_var_dec()
+        self.restarts = 0
+        self.extra_locals = 0
         self.write_beginning(function_type)
         self.compile_statements()
+        if self.restarts or self.extra_locals:
+            # The start is only labeled once a tail call needs it, and the
+            # locals are only counted once every loop has been hoisted from.
+            commands = self.writer.cut(mark)
+            self.writer.write_function(commands[0][1],
+                                       commands[0][2] + self.extra_locals)
+            if self.restarts:
+                self.writer.write_label(START_LABEL)
+            self.writer.write_commands(commands[1:])
         self.my_advance()
 
+    def new_local(self) -> int:
+        """
+        Returns:
+            int: the index of a new local of the current subroutine, which
+            has no name.
+        """
+        self.extra_locals += 1
+        return self.table.var_count("VAR") + self.extra_locals - 1
+
     def compile_var_dec(self) -> None:
         """Compiles a var declaration."""
         # Your code goes here!
         curr_type = None
         count = 0
         while self.tkn.token_type() == "KEYWORD" and \
-                self.get_name[self.tkn.token_type()]() == "var":
+                self.tkn.value() == "var":
             self.my_advance()
             semicolon = False
             first = True
             while not semicolon:
                 if first:
-                    curr_type = self.get_name[self.tkn.token_type()]()
+                    curr_type = self.tkn.value()
                     first = False
                 else:
                     if self.tkn.token_type() != "SYMBOL":
-                        self.table.define(
-                            self.get_name[self.tkn.token_type()](), curr_type,
-                            "VAR")
+                        self.table.define(self.tkn.value(), curr_type,
+                                          "VAR")
                         count += 1
-                if self.get_name[self.tkn.token_type()]() == ";":
+                if self.tkn.value() == ";":
                     semicolon = True
                 self.my_advance()
         self.writer.write_function(self.outerFuncName, count)
@@ -217,7 +386,7 @@ class CompilationEngine:
         """
         # Your code goes here!
         while self.tkn.token_type() == "KEYWORD" and \
-                self.get_name[self.tkn.token_type()]() in STATEMENTS:
+                self.tkn.value() in STATEMENTS:
             self.statement_dict[self.tkn.keyword()]()
 
     def compile_do(self) -> None:
@@ -225,67 +394,107 @@ class CompilationEngine:
         # Your code goes here!
         n_args = 0
         self.my_advance()
-        lookahead = [self.tkn.token_type(),
-                     self.get_name[self.tkn.token_type()]()]
+        lookahead = [self.tkn.token_type(), self.tkn.value()]
         self.my_advance()
         if self.tkn.symbol() == ".":  # we know it is a symbol
-            if self.table.type_of(lookahead[1]):
-                self.outerFuncName+=self.table.type_of(lookahead[1])
-                self.writer.write_push(self.table.kind_of(lookahead[1]),
-                                       self.table.index_of(lookahead[1]))
+            symbol = self.table.resolve(lookahead[1])
+            if symbol:
+                self.outerFuncName+=symbol.type
+                self.writer.write_push(symbol.segment, symbol.index)
                 n_args+=1
             else:
                 self.outerFuncName += lookahead[1]
             self.my_advance()
-            lookahead = [self.tkn.token_type(),
-                         self.get_name[self.tkn.token_type()]()]
+            lookahead = [self.tkn.token_type(), self.tkn.value()]
             self.my_advance()
         else:
             self.outerFuncName +=self.class_name
-            self.writer.write_push("POINTER", 0)
-            n_args += 1
+            if not self.is_function(self.class_name, lookahead[1]):
+                self.writer.write_push("POINTER", 0)
+                n_args += 1
         self.outerFuncName += "."
         self.outerFuncName += lookahead[1]
         self.my_advance()
         n_args += self.compile_expression_list()
-        self.writer.write_call(self.outerFuncName, n_args)
+        self.write_call(self.outerFuncName, n_args, discard=True)
         self.outerFuncName= ""
         self.my_advance()
-        self.writer.write_pop("TEMP", 0)
         self.my_advance()
 
     def compile_let(self) -> None:
         """Compiles a let statement."""
 
         self.my_advance()
-        lhs = self.get_name[self.tkn.token_type()]()
+        lhs = self.tkn.value()
         self.my_advance()
         if self.tkn.symbol() == "[":  # todo: arrays
             self.my_advance()
+            mark = self.writer.mark()
             self.compile_expression()
-            self.writer.write_push(self.table.kind_of(lhs), self.table.index_of(lhs))
-            self.writer.write_arithmetic("ADD")
+            index = self.constant_index(mark)
+            if index is None:
+                self.write_variable("push", lhs)
+                self.writer.write_arithmetic("ADD")
             self.my_advance()
             self.my_advance()
+            mark = self.writer.mark()
             self.compile_expression()
-            self.writer.write_pop("TEMP", 0)
-            self.writer.write_pop("POINTER", 1)
-            self.writer.write_push("TEMP", 0)
-            self.writer.write_pop("THAT", 0)
+            value = self.writer.cut(mark)
+            if index is not None and \
+                    not any(command[0] == "call" for command in value):
+                # Without a call, the value cannot change the array
+                # variable, so its address is only pushed once it is needed.
+                self.writer.write_commands(value)
+                self.write_variable("push", lhs)
+                self.writer.write_pop("POINTER", 1)
+            else:
+                if index is not None:
+                    self.write_variable("push", lhs)
+                self.writer.write_commands(value)
+                self.writer.write_pop("TEMP", 0)
+                self.writer.write_pop("POINTER", 1)
+                self.writer.write_push("TEMP", 0)
+            self.writer.write_pop("THAT", index or 0)
             self.my_advance()
 
         else:
             self.my_advance()
             self.compile_expression()
-            self.writer.write_pop(self.table.kind_of(lhs),
-                                  self.table.index_of(lhs))
+            self.write_variable("pop", lhs)
             self.my_advance()
 
+    def compile_condition(self) -> list:
+        """Compiles the condition of an if or a while statement, and takes
+        its commands back from the writer so they can be placed freely.
+
+        Returns:
+            list: the commands of the condition.
+        """
+        mark = self.writer.mark()
+        self.compile_expression()
+        return self.writer.cut(mark)
+
+    def compile_block(self) -> list:
+        """Compiles statements enclosed in "{}", and takes their commands
+        back from the writer so they can be placed freely.
+
+        Returns:
+            list: the commands of the statements.
+        """
+        mark = self.writer.mark()
+        self.my_advance()
+        self.compile_statements()
+        self.my_advance()
+        return self.writer.cut(mark)
+
     def compile_while(self) -> None:
         """Compiles a while statement."""
         # Your code goes here!
         self.whiles += 1
         index = str(self.whiles)
+        if self.opt_level >= 1:
+            self.compile_rotated_while(index)
+            return
         self.writer.write_label("WHILE_EXP" + index)
         self.my_advance()
         self.my_advance()
@@ -299,24 +508,94 @@ class CompilationEngine:
         self.writer.write_goto("WHILE_EXP" + index)
         self.writer.write_label("WHILE_END" + index)
 
+    def compile_rotated_while(self, index: str) -> None:
+        """Compiles a while statement with the condition after the body, so
+        every iteration takes a single jump back, when the condition is a
+        comparison. Loops on a constant condition are laid out without it.
+        """
+        self.my_advance()
+        self.my_advance()
+        condition = self.compile_condition()
+        self.my_advance()
+        body = self.compile_block()
+        constant = ConstantFolder.constant_before(condition, len(condition))
+        if self.loops and not (constant and constant[0] == 0):
+            preheader, condition, body = self.loops.hoist(
+                condition, body, self.new_local)
+            self.writer.write_commands(preheader)
+        if constant and constant[1] == 0:
+            # Like "not; if-goto", only true (-1) keeps the loop going.
+            if constant[0] == -1:
+                self.writer.write_label("WHILE_EXP" + index)
+                self.writer.write_commands(body)
+                self.writer.write_goto("WHILE_EXP" + index)
+        elif condition and condition[-1][0] in COMPARISONS:
+            self.writer.write_goto("WHILE_EXP" + index)
+            self.writer.write_label("WHILE_BODY" + index)
+            self.writer.write_commands(body)
+            self.writer.write_label("WHILE_EXP" + index)
+            self.writer.write_commands(condition)
+            self.writer.write_if("WHILE_BODY" + index)
+        else:
+            self.writer.write_label("WHILE_EXP" + index)
+            self.writer.write_commands(condition)
+            self.writer.write_arithmetic("NOT")
+            self.writer.write_if("WHILE_END" + index)
+            self.writer.write_commands(body)
+            self.writer.write_goto("WHILE_EXP" + index)
+            self.writer.write_label("WHILE_END" + index)
+
     def compile_return(self) -> None:
         """Compiles a return statement."""
         # Your code goes here!
         self.my_advance()
+        if self.tail_calls and self.function_type != "constructor" and \
+                self.tkn.value() != ";":
+            self.compile_tail_return()
+            return
         if self.tkn.token_type() != "SYMBOL" or \
-                (self.tkn.token_type() == "SYMBOL" and self.get_name[
-                    self.tkn.token_type()]() != ";"):
+                (self.tkn.token_type() == "SYMBOL" and self.tkn.value() != ";"):
             self.compile_expression()
         else:
             self.writer.write_push("CONST", 0)
         self.writer.write_return()
         self.my_advance()
 
+    def compile_tail_return(self) -> None:
+        """Compiles the expression of a return statement. If its value is a
+        call of the subroutine being compiled, the arguments of the call
+        replace the subroutine's own, the locals are cleared like on entry,
+        and the subroutine starts over, so the stack does not grow.
+        """
+        mark = self.writer.mark()
+        self.compile_expression()
+        expression = self.writer.cut(mark)
+        n_args = self.table.var_count("ARG")
+        if expression[-1] != ("call", self.subroutine_name, n_args):
+            self.writer.write_commands(expression)
+            self.writer.write_return()
+            self.my_advance()
+            return
+        # The arguments are the only values on the stack under the call.
+        self.writer.write_commands(expression[:-1])
+        for index in reversed(range(n_args)):
+            self.writer.write_pop("ARG", index)
+        for index in range(self.table.var_count("VAR")):
+            self.writer.write_push("CONST", 0)
+            self.writer.write_pop("LOCAL", index)
+        self.writer.write_goto(START_LABEL)
+        self.restarts += 1
+        self.tail_calls_removed += 1
+        self.my_advance()
+
     def compile_if(self) -> None:
         """Compiles a if statement, possibly with a trailing else clause."""
         # Your code goes here!
         self.ifs+=1
         index = str(self.ifs)
+        if self.opt_level >= 1:
+            self.compile_inverted_if(index)
+            return
         self.my_advance()
         self.my_advance()
         self.compile_expression()
@@ -342,23 +621,66 @@ class CompilationEngine:
             self.writer.write_label("IF_FALSE" + index)
         # self.out.write("</ifStatement>\n")
 
+    def compile_inverted_if(self, index: str) -> None:
+        """Compiles an if statement with a single conditional jump. The else
+        clause comes right after the jump, or, without one, the jump skips
+        the then clause on the inverted comparison. Empty else clauses are
+        dropped, and so is the dead clause of a constant condition.
+        """
+        self.my_advance()
+        self.my_advance()
+        condition = self.compile_condition()
+        self.my_advance()
+        then_clause = self.compile_block()
+        else_clause = []
+        if self.tkn.token_type() == "KEYWORD" and \
+                self.tkn.keyword() == "else":
+            self.my_advance()
+            else_clause = self.compile_block()
+        constant = ConstantFolder.constant_before(condition, len(condition))
+        if constant and constant[1] == 0:
+            self.writer.write_commands(
+                then_clause if constant[0] else else_clause)
+        elif else_clause:
+            self.writer.write_commands(condition)
+            self.writer.write_if("IF_TRUE" + index)
+            self.writer.write_commands(else_clause)
+            self.writer.write_goto("IF_END" + index)
+            self.writer.write_label("IF_TRUE" + index)
+            self.writer.write_commands(then_clause)
+            self.writer.write_label("IF_END" + index)
+        elif condition and condition[-1][0] in COMPARISONS:
+            # A comparison is 0 or -1, so "not" inverts it exactly.
+            self.writer.write_commands(condition)
+            self.writer.write_arithmetic("NOT")
+            self.writer.write_if("IF_FALSE" + index)
+            self.writer.write_commands(then_clause)
+            self.writer.write_label("IF_FALSE" + index)
+        else:
+            self.writer.write_commands(condition)
+            self.writer.write_if("IF_TRUE" + index)
+            self.writer.write_goto("IF_FALSE" + index)
+            self.writer.write_label("IF_TRUE" + index)
+            self.writer.write_commands(then_clause)
+            self.writer.write_label("IF_FALSE" + index)
+
     def compile_expression(self) -> None:
         """Compiles an expression."""
         # Your code goes here!
         unary_op = None
-        if self.get_name[self.tkn.token_type()]() in UNARY:
-            unary_op = self.get_name[self.tkn.token_type()]()
+        if self.tkn.value() in UNARY:
+            unary_op = self.tkn.value()
             self.my_advance()
         self.compile_term()
         if unary_op:
             self.writer.write_arithmetic(UNARY_OPS_DICT[unary_op])
         unary_op = None
         binary_op = None
-        while self.get_name[self.tkn.token_type()]() in OPS:
-            binary_op = self.get_name[self.tkn.token_type()]()
+        while self.tkn.value() in OPS:
+            binary_op = self.tkn.value()
             self.my_advance()
-            if self.get_name[self.tkn.token_type()]() in UNARY:
-                unary_op = self.get_name[self.tkn.token_type()]()
+            if self.tkn.value() in UNARY:
+                unary_op = self.tkn.value()
                 self.my_advance()
             self.compile_term()
             if unary_op:
@@ -378,38 +700,46 @@ class CompilationEngine:
         """
         # Your code goes here!
         cur_func_name =""
-        lookahead = [self.tkn.token_type(),
-                     self.get_name[self.tkn.token_type()]()]
+        lookahead = [self.tkn.token_type(), self.tkn.value()]
         self.my_advance()
-        if self.get_name[self.tkn.token_type()]() == "(" \
+        if self.tkn.value() == "(" \
                 and lookahead[1] != "(":
 
-            # lookahead[1] is the name of a function
+            # lookahead[1] is the name of a subroutine of this class, which
+            # is only qualified if the class index has it
 
             self.my_advance()
-            n_args = self.compile_expression_list()
-            self.writer.write_call(lookahead[1], n_args)
+            n_args = 0
+            name = lookahead[1]
+            signature = self.signature(self.class_name, name)
+            if signature:
+                name = self.class_name + "." + name
+                if signature["kind"] == "method":
+                    self.writer.write_push("POINTER", 0)
+                    n_args += 1
+            n_args += self.compile_expression_list()
+            self.write_call(name, n_args)
             self.my_advance()
 
-        elif self.get_name[self.tkn.token_type()]() == ".":
+        elif self.tkn.value() == ".":
             n_args =0
-            if self.table.type_of(lookahead[1]):
-                cur_func_name +=self.table.type_of(lookahead[1])
+            symbol = self.table.resolve(lookahead[1])
+            if symbol:
+                cur_func_name +=symbol.type
                 cur_func_name +='.'
-                self.writer.write_push(self.table.kind_of(lookahead[1]),
-                                       self.table.index_of(lookahead[1]))
+                self.writer.write_push(symbol.segment, symbol.index)
                 n_args+=1
                 self.my_advance()
             else:
                 cur_func_name +=lookahead[1]
                 cur_func_name +='.'
                 self.my_advance()
-            cur_func_name += self.get_name[self.tkn.token_type()]()
+            cur_func_name += self.tkn.value()
             self.my_advance()
             self.my_advance()
             n_args += self.compile_expression_list()
             self.my_advance()
-            self.writer.write_call(cur_func_name, n_args)
+            self.write_call(cur_func_name, n_args)
             # self.outerFuncName=""
             # self.my_advance()
 
@@ -435,28 +765,33 @@ class CompilationEngine:
                 if lookahead[1] == "this":
                     self.writer.write_push("POINTER", 0)
 
+            elif lookahead[0] == "STRING_CONST" and self.strings and \
+                    self.strings.can_pool(lookahead[1]):
+                self.writer.write_push(
+                    "STATIC", self.strings.static_index(lookahead[1]))
             elif lookahead[0] == "STRING_CONST":
                 self.writer.write_push("CONST", len(lookahead[1]))
                 self.writer.write_call("String.new", 1)
                 for char in lookahead[1]:
                     self.writer.write_push("CONST", ord(char))
                     self.writer.write_call("String.appendChar", 2)
-            elif self.get_name[self.tkn.token_type()]() == "[":  # todo: arrays
+            elif self.tkn.value() == "[":  # todo: arrays
                 self.my_advance()
+                mark = self.writer.mark()
                 self.compile_expression()
-                self.writer.write_push(self.table.kind_of(lookahead[1]),
-                                       self.table.index_of(lookahead[1]))
-                self.writer.write_arithmetic("ADD")
+                index = self.constant_index(mark)
+                self.write_variable("push", lookahead[1])
+                if index is None:
+                    self.writer.write_arithmetic("ADD")
                 # self.writer.write_pop("TEMP", 0)
                 self.writer.write_pop("POINTER",1)
                 # self.writer.write_push("TEMP", 0)
-                self.writer.write_push("THAT", 0)
+                self.writer.write_push("THAT", index or 0)
 
                 self.my_advance()
 
             else:  # it is an identifier
-                self.writer.write_push(self.table.kind_of(lookahead[1]),
-                                       self.table.index_of(lookahead[1]))
+                self.write_variable("push", lookahead[1])
 
 
 
@@ -465,10 +800,9 @@ class CompilationEngine:
         # Your code goes here!
         count = 0
         while self.tkn.token_type() != 'SYMBOL' or \
-                (self.tkn.token_type() == 'SYMBOL' and self.get_name[
-                    self.tkn.token_type()]() != ")"):
+                (self.tkn.token_type() == 'SYMBOL' and self.tkn.value() != ")"):
             if self.tkn.token_type() == 'SYMBOL' and \
-                    self.get_name[self.tkn.token_type()]() == ",":
+                    self.tkn.value() == ",":
                 self.my_advance()
             else:
                 self.compile_expression()
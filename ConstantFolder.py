@@ -0,0 +1,216 @@
+"""
+Folds constant expressions and propagates constant locals in the VM code
+of a subroutine.
+"""
+import typing
+from FlowGraph import FlowGraph
+
+
+def to_word(value: int) -> int:
+    """
+    Args:
+        value (int): any integer.
+
+    Returns:
+        int: the value as a signed 16-bit Hack word.
+    """
+    return (value + 0x8000) % 0x10000 - 0x8000
+
+
+def divide(first: int, second: int) -> typing.Optional[int]:
+    # Math.divide truncates towards zero, and fails on division by zero.
+    # -32768 has no positive counterpart, so it is left to the runtime.
+    if second == 0 or -0x8000 in (first, second):
+        return None
+    quotient = abs(first) // abs(second)
+    return quotient if (first < 0) == (second < 0) else -quotient
+
+
+def shift_right(value: int) -> typing.Optional[int]:
+    # Only non-negative values shift the same way whether the VM
+    # implementation shifts arithmetically or logically.
+    return value >> 1 if value >= 0 else None
+
+
+UNARY_FOLDS = {
+    "neg": lambda value: -value,
+    "not": lambda value: ~value,
+    "shiftleft": lambda value: value << 1,
+    "shiftright": shift_right
+}
+BINARY_FOLDS = {
+    "add": lambda first, second: first + second,
+    "sub": lambda first, second: first - second,
+    "and": lambda first, second: first & second,
+    "or": lambda first, second: first | second,
+    "eq": lambda first, second: -(first == second),
+    "gt": lambda first, second: -(first > second),
+    "lt": lambda first, second: -(first < second),
+    ("call", "Math.multiply", 2): lambda first, second: first * second,
+    ("call", "Math.divide", 2): divide
+}
+
+
+def constant_commands(value: int) -> typing.List[tuple]:
+    """
+    Args:
+        value (int): a 16-bit word.
+
+    Returns:
+        typing.List[tuple]: the shortest commands that push the value, as
+        "push constant" only takes 0..32767.
+    """
+    if value >= 0:
+        return [("push", "constant", value)]
+    if value == -0x8000:
+        return [("push", "constant", 0x7FFF), ("not",)]
+    return [("push", "constant", -value), ("neg",)]
+
+
+def constant_before(commands: typing.List[tuple], end: int) \
+        -> typing.Optional[typing.Tuple[int, int]]:
+    """Recognizes a constant pushed by the commands right before end: either
+    "push constant c" alone or followed by a "neg" or a "not".
+
+    Args:
+        commands (typing.List[tuple]): VM commands.
+        end (int): the index right after the constant.
+
+    Returns:
+        typing.Optional[typing.Tuple[int, int]]: the value of the constant
+        and the index of its first command, or None.
+    """
+    if end >= 1 and commands[end - 1][:2] == ("push", "constant"):
+        return to_word(commands[end - 1][2]), end - 1
+    if end >= 2 and commands[end - 1][0] in {"neg", "not"} and \
+            commands[end - 2][:2] == ("push", "constant"):
+        value = UNARY_FOLDS[commands[end - 1][0]](commands[end - 2][2])
+        return to_word(value), end - 2
+    return None
+
+
+class ConstantFolder:
+    """Evaluates constant subexpressions at compile time, with the 16-bit
+    semantics of the Hack platform, and replaces the reads of locals that are
+    assigned a constant exactly once, before any read, by that constant.
+
+    The pass works on the VM commands of a whole subroutine, so it also folds
+    the expressions that only become constant once a local is propagated.
+    """
+
+    def __init__(self) -> None:
+        """Creates a new folder."""
+        self.folded = 0
+        self.propagated = 0
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how many operations were folded and how
+            many locals were propagated.
+        """
+        return {"constants folded": self.folded,
+                "constants propagated": self.propagated}
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands with the constants folded.
+        """
+        commands = self.fold(commands)
+        while True:
+            propagated = self.propagate(commands)
+            if propagated is None:
+                return commands
+            commands = self.fold(propagated)
+
+    def fold(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """Folds every operation whose operands are all constants.
+
+        Args:
+            commands (typing.List[tuple]): VM commands.
+
+        Returns:
+            typing.List[tuple]: the folded commands.
+        """
+        out = []
+        for command in commands:
+            operation = command if command[0] == "call" else command[0]
+            result = start = None
+            if operation in UNARY_FOLDS:
+                operand = constant_before(out, len(out))
+                if operand:
+                    result = UNARY_FOLDS[operation](operand[0])
+                    start = operand[1]
+            elif operation in BINARY_FOLDS:
+                second = constant_before(out, len(out))
+                first = second and constant_before(out, second[1])
+                if first:
+                    result = BINARY_FOLDS[operation](first[0], second[0])
+                    start = first[1]
+            if result is not None:
+                replacement = constant_commands(to_word(result))
+                # "push constant 1; neg" is already as short as it gets.
+                if len(replacement) <= len(out) - start:
+                    del out[start:]
+                    out.extend(replacement)
+                    self.folded += 1
+                    continue
+            out.append(command)
+        return out
+
+    def propagate(self, commands: typing.List[tuple]) \
+            -> typing.Optional[typing.List[tuple]]:
+        """Replaces the reads of every local that is stored to exactly once,
+        with a constant, by that constant. This is only done if the store
+        dominates every read, so no read can see the initial zero or a value
+        from a previous loop iteration. The store itself is removed.
+
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.Optional[typing.List[tuple]]: the new commands, or None if
+            no local could be propagated.
+        """
+        stores = {}
+        reads = {}
+        for index, command in enumerate(commands):
+            if command[1:2] == ("local",):
+                if command[0] == "pop":
+                    stores.setdefault(command[2], []).append(index)
+                else:
+                    reads.setdefault(command[2], []).append(index)
+
+        graph = None
+        removed = {}  # index of a store -> index of its constant
+        values = {}  # local -> its constant value
+        for local, indices in stores.items():
+            if len(indices) != 1:
+                continue
+            constant = constant_before(commands, indices[0])
+            if not constant:
+                continue
+            graph = graph or FlowGraph(commands)
+            if all(graph.dominates(indices[0], read)
+                   for read in reads.get(local, [])):
+                removed[indices[0]] = constant[1]
+                values[local] = constant[0]
+        if not values:
+            return None
+
+        self.propagated += len(values)
+        skip = {index for store, start in removed.items()
+                for index in range(start, store + 1)}
+        out = []
+        for index, command in enumerate(commands):
+            if index in skip:
+                continue
+            if command[:2] == ("push", "local") and command[2] in values:
+                out.extend(constant_commands(values[command[2]]))
+            else:
+                out.append(command)
+        return out
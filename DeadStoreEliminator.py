@@ -0,0 +1,118 @@
+"""
+Removes the stores whose value is never read, and the locals that are
+then unused.
+"""
+import typing
+from FlowGraph import FlowGraph
+
+BINARY = {"add", "sub", "and", "or", "eq", "gt", "lt"}
+UNARY = {"neg", "not", "shiftleft", "shiftright"}
+# Temp 0 is where the engine throws values away, its stores are never dead.
+STORES = {"local", "argument", "temp"}
+DISCARD = ("pop", "temp", 0)
+WORD_BYTES = 2
+
+
+def value_starts(commands: typing.List[tuple]) \
+        -> typing.Dict[int, typing.Tuple[int, bool]]:
+    """
+    Args:
+        commands (typing.List[tuple]): the commands of one subroutine.
+
+    Returns:
+        typing.Dict[int, typing.Tuple[int, bool]]: for every pop, where the
+        commands that computed the value it pops start, and whether they can
+        be removed with it: they must neither call nor store anything.
+    """
+    starts = {}
+    stack = []  # (start, removable) of every value on the stack
+    for index, command in enumerate(commands):
+        operation = command[0]
+        if operation == "push":
+            stack.append((index, True))
+        elif operation in BINARY and len(stack) >= 2:
+            second, first = stack.pop(), stack.pop()
+            stack.append((first[0], first[1] and second[1]))
+        elif operation in UNARY and stack:
+            stack.append(stack.pop())
+        elif operation == "pop" and stack:
+            starts[index] = stack.pop()
+            # Whatever is still on the stack now spans a store.
+            stack = [(start, False) for start, _ in stack]
+        elif operation == "call":
+            arguments = [stack.pop() for _ in range(min(command[2],
+                                                        len(stack)))]
+            stack = [(start, False) for start, _ in stack]
+            stack.append((arguments[-1][0] if arguments else index, False))
+        else:
+            stack = []
+    return starts
+
+
+class DeadStoreEliminator:
+    """Removes the stores to locals, arguments and temps whose value is never
+    read, and the locals that are then never used.
+
+    A dead store is removed with the commands that computed its value, if
+    they neither call nor store anything; otherwise the value is still
+    computed and thrown away into temp 0. Removing a store can make others
+    dead, so this is repeated until no dead store is left. The remaining
+    locals are then renumbered, so the function declares only those.
+    """
+
+    def __init__(self) -> None:
+        self.stores = 0
+        self.saved = {}  # function -> frame bytes saved
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: the dead stores removed, and the frame
+            bytes saved in total and by every function that saved some.
+        """
+        stats = {"dead stores removed": self.stores,
+                 "frame bytes saved": sum(self.saved.values())}
+        for function, saved in self.saved.items():
+            stats["frame bytes saved: " + function] = saved
+        return stats
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands without the dead stores.
+        """
+        if not commands or commands[0][0] != "function":
+            return commands
+        while True:
+            live = FlowGraph(commands).liveness()
+            dead = [index for index, command in enumerate(commands)
+                    if command[0] == "pop" and command[1] in STORES and
+                    command != DISCARD and command[1:] not in live[index]]
+            if not dead:
+                break
+            starts = value_starts(commands)
+            removed = set()
+            for index in dead:
+                start, removable = starts.get(index, (index, False))
+                if removable:
+                    removed.update(range(start, index + 1))
+            self.stores += len(dead)
+            commands = [DISCARD if index in dead else command
+                        for index, command in enumerate(commands)
+                        if index not in removed]
+
+        used = sorted({command[2] for command in commands[1:]
+                       if command[1:2] == ("local",)})
+        name, declared = commands[0][1], commands[0][2]
+        if len(used) == declared:
+            return commands
+        renumbered = {old: new for new, old in enumerate(used)}
+        self.saved[name] = self.saved.get(name, 0) + \
+            (declared - len(used)) * WORD_BYTES
+        return [("function", name, len(used))] + [
+            command[:2] + (renumbered[command[2]],)
+            if command[1:2] == ("local",) else command
+            for command in commands[1:]]
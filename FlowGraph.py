@@ -0,0 +1,154 @@
+"""
+The control flow graph of the VM code of a subroutine, for the passes
+that analyze it across basic blocks.
+"""
+import typing
+
+JUMPS = {"goto", "if-goto"}
+ENDS_BLOCK = {"goto", "if-goto", "return"}
+VARIABLE_SEGMENTS = {"local", "argument", "temp"}
+
+
+class FlowGraph:
+    """The control flow graph of the VM commands of one subroutine, as
+    buffered by VMWriter. A basic block starts at the beginning of the
+    subroutine, at every label and right after every jump or return.
+    """
+
+    def __init__(self, commands: typing.List[tuple]) -> None:
+        """Splits the commands into basic blocks and links them.
+
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+        """
+        self.commands = commands
+        self.starts = []  # the index of the first command of every block
+        self.block_of = []  # the block of every command
+        labels = {}
+        new_block = True
+        for index, command in enumerate(commands):
+            if command[0] == "label" or new_block:
+                self.starts.append(index)
+            if command[0] == "label":
+                labels[command[1]] = len(self.starts) - 1
+            self.block_of.append(len(self.starts) - 1)
+            new_block = command[0] in ENDS_BLOCK
+
+        self.successors = [[] for _ in self.starts]
+        self.predecessors = [[] for _ in self.starts]
+        for block, start in enumerate(self.starts):
+            last = commands[self.end(block) - 1]
+            targets = []
+            if last[0] in JUMPS:
+                targets.append(labels[last[1]])
+            if last[0] not in {"goto", "return"} and \
+                    block + 1 < len(self.starts):
+                targets.append(block + 1)
+            for target in targets:
+                if target not in self.successors[block]:
+                    self.successors[block].append(target)
+                    self.predecessors[target].append(block)
+        self._dominators = None
+
+    def end(self, block: int) -> int:
+        """
+        Args:
+            block (int): a block number.
+
+        Returns:
+            int: the index right after the last command of the block.
+        """
+        if block + 1 < len(self.starts):
+            return self.starts[block + 1]
+        return len(self.commands)
+
+    def dominators(self) -> typing.List[typing.Set[int]]:
+        """
+        Returns:
+            typing.List[typing.Set[int]]: for every block, the blocks that
+            every path from the entry to it goes through. Unreachable blocks
+            are dominated by every block.
+        """
+        if self._dominators is None:
+            every_block = set(range(len(self.starts)))
+            dominators = [set(every_block) for _ in self.starts]
+            if self.starts:
+                dominators[0] = {0}
+            changed = True
+            while changed:
+                changed = False
+                for block in range(1, len(self.starts)):
+                    new = set(every_block)
+                    for predecessor in self.predecessors[block]:
+                        new &= dominators[predecessor]
+                    new.add(block)
+                    if new != dominators[block]:
+                        dominators[block] = new
+                        changed = True
+            self._dominators = dominators
+        return self._dominators
+
+    def dominates(self, first: int, second: int) -> bool:
+        """
+        Args:
+            first (int): the index of a command.
+            second (int): the index of another command.
+
+        Returns:
+            bool: True if every execution of the second command is preceded
+            by an execution of the first one in the same call.
+        """
+        first_block = self.block_of[first]
+        second_block = self.block_of[second]
+        if first_block == second_block:
+            return first < second
+        return first_block in self.dominators()[second_block]
+
+    def liveness(self) -> typing.List[typing.FrozenSet[tuple]]:
+        """Finds the variables whose value may still be read, after every
+        command. A variable is a slot of the local, argument or temp
+        segment, e.g. ("local", 0); a push reads it and a pop writes it.
+
+        Returns:
+            typing.List[typing.FrozenSet[tuple]]: the live variables right
+            after every command.
+        """
+        commands = self.commands
+        blocks = range(len(self.starts))
+        reads = [set() for _ in blocks]  # read before written in the block
+        writes = [set() for _ in blocks]
+        for block in blocks:
+            for command in commands[self.starts[block]:self.end(block)]:
+                if command[1:2] and command[1] in VARIABLE_SEGMENTS:
+                    variable = command[1:]
+                    if command[0] == "push" and variable not in writes[block]:
+                        reads[block].add(variable)
+                    elif command[0] == "pop":
+                        writes[block].add(variable)
+
+        live_in = [frozenset(reads[block]) for block in blocks]
+        live_out = [frozenset() for _ in blocks]
+        changed = True
+        while changed:
+            changed = False
+            for block in reversed(blocks):
+                out = frozenset().union(*(live_in[successor] for successor
+                                          in self.successors[block]))
+                if out != live_out[block]:
+                    live_out[block] = out
+                    live_in[block] = frozenset(
+                        reads[block] | (out - writes[block]))
+                    changed = True
+
+        after = [frozenset()] * len(commands)
+        for block in blocks:
+            live = set(live_out[block])
+            for index in reversed(range(self.starts[block], self.end(block))):
+                after[index] = frozenset(live)
+                command = commands[index]
+                if command[1:2] and command[1] in VARIABLE_SEGMENTS:
+                    if command[0] == "pop":
+                        live.discard(command[1:])
+                    elif command[0] == "push":
+                        live.add(command[1:])
+        return after
@@ -0,0 +1,119 @@
+"""
+An integer encoding of VM commands: their opcodes, segments, and operands
+with numbered names. It is the serialization format of VM bytecode, read by
+Bytecode and VMRunner; the optimization passes work on the VM commands as
+VMWriter buffers them.
+"""
+import enum
+import typing
+
+
+class Opcode(enum.IntEnum):
+    """The VM commands. The name of a member is its VM word, upper case and
+    with "-" as "_".
+    """
+    PUSH = 0
+    POP = 1
+    ADD = 2
+    SUB = 3
+    NEG = 4
+    EQ = 5
+    GT = 6
+    LT = 7
+    AND = 8
+    OR = 9
+    NOT = 10
+    SHIFTLEFT = 11
+    SHIFTRIGHT = 12
+    LABEL = 13
+    GOTO = 14
+    IF_GOTO = 15
+    FUNCTION = 16
+    CALL = 17
+    RETURN = 18
+
+    @property
+    def word(self) -> str:
+        """
+        Returns:
+            str: the VM word of the command, e.g. "if-goto".
+        """
+        return self.name.lower().replace("_", "-")
+
+
+class Segment(enum.IntEnum):
+    """The memory segments of push and pop."""
+    CONSTANT = 0
+    ARGUMENT = 1
+    LOCAL = 2
+    STATIC = 3
+    THIS = 4
+    THAT = 5
+    POINTER = 6
+    TEMP = 7
+
+    @property
+    def word(self) -> str:
+        """
+        Returns:
+            str: the VM word of the segment, e.g. "local".
+        """
+        return self.name.lower()
+
+
+OPCODES = {opcode.word: opcode for opcode in Opcode}
+SEGMENTS = {segment.word: segment for segment in Segment}
+# The commands whose first operand is a name: a label or a function.
+NAMED = {Opcode.LABEL, Opcode.GOTO, Opcode.IF_GOTO, Opcode.FUNCTION,
+         Opcode.CALL}
+
+
+class Instruction(typing.NamedTuple):
+    """A VM command with integer operands. A push or a pop has a segment
+    and an index, a label or a jump the number of its label, a function the
+    number of its name and its locals, and a call the number of the callee
+    and its arguments. Names are numbered by the file that holds the
+    instruction.
+    """
+    opcode: Opcode
+    operand: int = 0
+    index: int = 0
+
+
+def encode(command: tuple, number: typing.Callable[[str], int]) \
+        -> Instruction:
+    """
+    Args:
+        command (tuple): a VM command as buffered by VMWriter.
+        number (typing.Callable[[str], int]): gives the number of a name.
+
+    Returns:
+        Instruction: the command with integer operands.
+    """
+    opcode = OPCODES[command[0]]
+    if opcode in {Opcode.PUSH, Opcode.POP}:
+        return Instruction(opcode, SEGMENTS[command[1]], command[2])
+    if opcode in NAMED:
+        return Instruction(opcode, number(command[1]),
+                           command[2] if len(command) > 2 else 0)
+    return Instruction(opcode)
+
+
+def decode(instruction: Instruction, names: typing.Sequence[str]) -> tuple:
+    """
+    Args:
+        instruction (Instruction): an encoded command.
+        names (typing.Sequence[str]): the names, by number.
+
+    Returns:
+        tuple: the command as buffered by VMWriter.
+    """
+    opcode = Opcode(instruction.opcode)
+    if opcode in {Opcode.PUSH, Opcode.POP}:
+        return (opcode.word, Segment(instruction.operand).word,
+                instruction.index)
+    if opcode in {Opcode.FUNCTION, Opcode.CALL}:
+        return opcode.word, names[instruction.operand], instruction.index
+    if opcode in NAMED:
+        return opcode.word, names[instruction.operand]
+    return opcode.word,
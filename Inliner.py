@@ -0,0 +1,208 @@
+"""
+Finds small leaf subroutines and accessors, and inlines them at their
+call sites.
+"""
+import typing
+
+DEFAULT_BUDGET = 8
+# Temp 0 is the compiler's scratch slot, arguments and locals of inlined
+# bodies go to the ones after it.
+FIRST_TEMP = 1
+LAST_TEMP = 7
+METHOD_PROLOGUE = [("push", "argument", 0), ("pop", "pointer", 0)]
+NOT_INLINED = {"call", "function", "label", "goto", "if-goto"}
+# Rough Hack cycle costs, as emitted by the usual VM translator: a call with
+# its function entry and return, and a pop that moves one value.
+CALL_CYCLES = 100
+MOVE_CYCLES = 10
+
+
+def inline_candidate(commands: typing.List[tuple], method: bool,
+                     arguments: int, budget: int) \
+        -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """Decides whether a compiled subroutine can be inlined: it must call
+    nothing, have no branches and a single return at the end, and fit the
+    budget and the free temps.
+
+    Args:
+        commands (typing.List[tuple]): the commands of the subroutine.
+        method (bool): whether it is a method.
+        arguments (int): the number of arguments of its VM function,
+        counting "this" for a method.
+        budget (int): the most commands the body may have.
+
+    Returns:
+        typing.Optional[typing.Dict[str, typing.Any]]: the candidate for
+        Inliner, or None. The body is kept as lists, so the candidates can
+        be stored as JSON.
+    """
+    name, locals_count = commands[0][1], commands[0][2]
+    body = commands[1:]
+    if method:
+        if body[:2] != METHOD_PROLOGUE:
+            return None
+        body = body[2:]
+    if not body or body[-1] != ("return",) or len(body) - 1 > budget:
+        return None
+    body = body[:-1]
+    parameters = arguments - method
+    if parameters + locals_count > LAST_TEMP - FIRST_TEMP + 1:
+        return None
+    for command in body:
+        if command[0] in NOT_INLINED or command[0] == "return":
+            return None
+        if command[1:2] == ("temp",) and command[2] != 0:
+            return None
+        # A method's "this" is moved to that, so it must not use that.
+        if method and (command[1:2] == ("that",) or
+                       command[1:] == ("pointer", 1)):
+            return None
+    return {
+        "class": name.split(".")[0],
+        "method": method,
+        "arguments": arguments,
+        "locals": locals_count,
+        "static": any(command[1:2] == ("static",) for command in body),
+        "body": [list(command) for command in body]
+    }
+
+
+class CandidateCollector:
+    """A pass that leaves the code alone and keeps the subroutines that can
+    be inlined, to compile a file once before inlining its subroutines into
+    others.
+    """
+
+    def __init__(self, classes: typing.Dict[str, typing.Dict],
+                 budget: int = DEFAULT_BUDGET) -> None:
+        """
+        Args:
+            classes (typing.Dict[str, typing.Dict]): the signatures of the
+            classes, as returned by ClassIndex.classes().
+            budget (int): the most commands an inlined body may have.
+        """
+        self.classes = classes
+        self.budget = budget
+        self.candidates = {}
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: nothing, the pass changes no code.
+        """
+        return {}
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the same commands.
+        """
+        if not commands or commands[0][0] != "function":
+            return commands
+        name = commands[0][1]
+        class_name, _, subroutine = name.partition(".")
+        signature = self.classes.get(class_name, {}) \
+            .get("subroutines", {}).get(subroutine)
+        if signature is None or signature["kind"] == "constructor":
+            return commands
+        method = signature["kind"] == "method"
+        candidate = inline_candidate(
+            commands, method, signature["parameters"] + method, self.budget)
+        if candidate:
+            self.candidates[name] = candidate
+        return commands
+
+
+class Inliner:
+    """Replaces calls to small leaf subroutines by their bodies.
+
+    The arguments are popped from the stack into temps 1 to 7, and the
+    locals of the body get the temps after them. The receiver of a method is
+    popped into pointer 1, so "this" becomes "that" in the body, and the
+    caller's own "this" is left alone. A body that uses statics is only
+    inlined into its own class.
+    """
+
+    def __init__(self, candidates: typing.Dict[str, typing.Dict]) -> None:
+        """
+        Args:
+            candidates (typing.Dict[str, typing.Dict]): the subroutines that
+            can be inlined, by full name, as returned by inline_candidate.
+        """
+        self.candidates = candidates
+        self.inlined = 0
+        self.cycles = 0
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: the calls inlined and an estimate of the
+            Hack cycles that saves each time they run.
+        """
+        return {"calls inlined": self.inlined,
+                "inlined cycles saved": self.cycles}
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands with the calls inlined.
+        """
+        class_name = commands[0][1].split(".")[0] \
+            if commands and commands[0][0] == "function" else None
+        out = []
+        for command in commands:
+            candidate = self.candidates.get(command[1]) \
+                if command[0] == "call" else None
+            if candidate and candidate["arguments"] == command[2] and \
+                    (not candidate["static"] or
+                     candidate["class"] == class_name):
+                out.extend(self.expand(candidate))
+            else:
+                out.append(command)
+        return out
+
+    def expand(self, candidate: typing.Dict[str, typing.Any]) \
+            -> typing.List[tuple]:
+        """
+        Args:
+            candidate (typing.Dict[str, typing.Any]): the subroutine.
+
+        Returns:
+            typing.List[tuple]: its body, remapped to run in place of a call
+            to it, with its arguments on the stack.
+        """
+        method = candidate["method"]
+        parameters = candidate["arguments"] - method
+        segments = {"argument": {}, "local": {}}
+        for parameter in range(parameters):
+            segments["argument"][parameter + method] = FIRST_TEMP + parameter
+        for local in range(candidate["locals"]):
+            segments["local"][local] = FIRST_TEMP + parameters + local
+
+        expanded = [("pop", "temp", segments["argument"][argument])
+                    for argument in reversed(sorted(segments["argument"]))]
+        if method:
+            expanded.append(("pop", "pointer", 1))
+        for temp in segments["local"].values():
+            expanded.extend([("push", "constant", 0), ("pop", "temp", temp)])
+        moves = len(expanded) - len(segments["local"])
+
+        for command in candidate["body"]:
+            command = tuple(command)
+            if command[1:2] in {("argument",), ("local",)}:
+                command = (command[0], "temp",
+                           segments[command[1]][command[2]])
+            elif method and command[1:2] == ("this",):
+                command = (command[0], "that", command[2])
+            elif method and command[1:] == ("pointer", 0):
+                command = (command[0], "pointer", 1)
+            expanded.append(command)
+        self.inlined += 1
+        self.cycles += CALL_CYCLES - MOVE_CYCLES * moves
+        return expanded
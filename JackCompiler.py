@@ -5,34 +5,326 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import functools
+import io
 import os
 import sys
+import time
 import typing
+from AsmWriter import AsmWriter
+from BuildCache import BuildCache
+from Bytecode import BytecodeWriter
+from ClassIndex import ClassIndex, INDEX_NAME
 from CompilationEngine import CompilationEngine
+from ConstantFolder import ConstantFolder
+from DeadStoreEliminator import DeadStoreEliminator
+from Inliner import CandidateCollector, DEFAULT_BUDGET, Inliner
 from JackTokenizer import JackTokenizer
+from LocalPromoter import LocalPromoter
+from LoopHoister import LoopHoister
+from PassManager import PassManager
+from Peephole import Peephole
+from PointerReuse import PointerReuse
+from StrengthReducer import StrengthReducer
+from SubexpressionEliminator import SubexpressionEliminator
+from StringPool import StringPool
 from SymbolTable import SymbolTable
-from VMWriter import VMWriter
+from TreeShaker import TreeShaker
+from VMWriter import VMWriter, parse_commands
+
+# Options of compile_file that change how a file is compiled, but never the
+# VM code it is compiled to.
+RUNTIME_OPTIONS = {"streaming", "count_changes"}
+# The optimization passes, by the name pipelines refer to them with. Every
+# compiled file gets new passes, as they keep statistics.
+PASSES = {
+    "fold": ConstantFolder,
+    "strength": StrengthReducer,
+    "add-chains": functools.partial(StrengthReducer, add_chains=True),
+    "dead-stores": DeadStoreEliminator,
+    "promote": LocalPromoter,
+    "cse": SubexpressionEliminator,
+    "pointer-reuse": PointerReuse,
+    "peephole": Peephole,
+}
+# The passes of every optimization level, in the order they run.
+PIPELINES = {
+    0: [],
+    1: ["fold", "strength", "dead-stores", "pointer-reuse", "peephole"],
+    2: ["fold", "add-chains", "dead-stores", "promote", "cse",
+        "pointer-reuse", "peephole"],
+}
 
 
 def compile_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        streaming: bool = False, opt_level: int = 0,
+        string_pool: bool = False,
+        classes: typing.Optional[dict] = None,
+        inline: typing.Optional[dict] = None, tail_calls: bool = True,
+        intrinsics: bool = False,
+        passes: typing.Optional[typing.Sequence[str]] = None,
+        extra_passes: typing.Sequence[typing.Any] = (),
+        asm: bool = False, bytecode: bool = False,
+        count_changes: bool = False) -> typing.Dict[str, int]:
     """Compiles a single file.
 
     Args:
         input_file (typing.TextIO): the file to compile.
-        output_file (typing.TextIO): writes all output to this file.
+        output_file (typing.TextIO): writes all output to this file, which
+        is binary with bytecode.
+        streaming (bool): if True, the input is tokenized a chunk at a time
+        instead of being read whole, so memory stays flat for huge inputs.
+        The output is written subroutine by subroutine in both modes.
+        opt_level (int): 0 emits the code as parsed, 1 also folds constant
+        expressions, propagates constant locals, replaces multiplications
+        and divisions by powers of two with shifts, removes stores that are
+        never read and the locals that are then unused, and reuses the
+        address in pointer 1 across accesses to the same array element. 2
+        also replaces other multiplications by small constants with add
+        chains, keeps the most used locals and arguments in temps, computes
+        repeated expressions once and hoists invariant expressions out of
+        while loops. Both levels also lay out if and while statements with
+        fewer jumps and rewrite redundant sequences with the peephole
+        optimizer.
+        string_pool (bool): if True, every distinct string constant of the
+        class is built once and kept in a static slot.
+        classes (typing.Optional[dict]): the signatures of the classes of the
+        program, as returned by ClassIndex.classes(). They tell methods from
+        functions when a subroutine of the class is called without a
+        qualifier. Without them, such a call is compiled as it was before
+        the index: as a method call in a do statement, and by its bare name
+        in an expression.
+        inline (typing.Optional[dict]): the subroutines of the program to
+        inline at their call sites, by full name, as collected by
+        collect_inline_candidates.
+        tail_calls (bool): from opt_level 1 on, if True, a subroutine that
+        returns the result of calling itself jumps back to its start
+        instead.
+        intrinsics (bool): if True, calls of Memory.peek, Memory.poke,
+        Math.abs, Math.min and Math.max are expanded inline, and array
+        elements at a constant index are addressed without an addition.
+        passes (typing.Optional[typing.Sequence[str]]): the names of the
+        PASSES to run, in order, instead of the pipeline of opt_level. The
+        code the compilation engine emits still depends on opt_level.
+        extra_passes (typing.Sequence[typing.Any]): passes to run after the
+        others.
+        asm (bool): if True, Hack assembly is written instead of VM code,
+        to be preceded by the runtime of AsmWriter.write_runtime().
+        bytecode (bool): if True, VM bytecode is written instead of VM code.
+        count_changes (bool): if True, the instructions every pass changed
+        are counted too, which diffs the input and the output of every pass.
+
+    Returns:
+        typing.Dict[str, int]: statistics of the optimizations applied, and
+        the time every pass took and, with count_changes, the instructions
+        it changed.
     """
     # Your code goes here!
     # This function should be relatively similar to "analyze_file" in
     # JackAnalyzer.py from the previous project.
-    tokenizer = JackTokenizer(input_file)
+    tokenizer = JackTokenizer(input_file, streaming=streaming)
     table = SymbolTable()
-    writer = VMWriter(output_file)
-    engine = CompilationEngine(tokenizer, table, writer)
+    manager = PassManager(count_changes=count_changes)
+    strings = None
+    loops = LoopHoister() if opt_level >= 2 else None
+    if string_pool:
+        strings = StringPool()
+        manager.add("string-pool", strings)
+    if inline:
+        manager.add("inline", Inliner(inline))
+    for name in PIPELINES[opt_level] if passes is None else passes:
+        manager.add(name, PASSES[name]())
+    for optimization in extra_passes:
+        manager.add(type(optimization).__name__, optimization)
+    if asm:
+        writer = AsmWriter(output_file, [manager])
+    elif bytecode:
+        writer = BytecodeWriter(output_file, [manager])
+    else:
+        writer = VMWriter(output_file, [manager])
+    engine = CompilationEngine(tokenizer, table, writer, strings, opt_level,
+                               classes, tail_calls, loops, intrinsics)
 
     if tokenizer.has_more_tokens():
         tokenizer.advance()
     engine.compile_class()
+    writer.close()
+    stats = {}
+    if engine.tail_calls:
+        stats["tail calls removed"] = engine.tail_calls_removed
+    if loops:
+        stats.update(loops.stats())
+    if intrinsics:
+        stats["intrinsics expanded"] = sum(
+            engine.intrinsics_expanded.values())
+        for name, expanded in engine.intrinsics_expanded.items():
+            stats["intrinsics expanded: " + name] = expanded
+        stats["constant indices addressed"] = engine.constant_indices
+    stats.update(manager.stats())
+    if asm:
+        stats.update(writer.stats())
+    return stats
+
+
+def collect_inline_candidates(input_path: str, opt_level: int,
+                              classes: typing.Dict[str, typing.Dict],
+                              budget: int = DEFAULT_BUDGET,
+                              intrinsics: bool = False) \
+        -> typing.Dict[str, typing.Dict]:
+    """Compiles a file without writing it, to find its subroutines that can
+    be inlined.
+
+    Args:
+        input_path (str): the .jack file.
+        opt_level (int): the optimization level the program is compiled at.
+        classes (typing.Dict[str, typing.Dict]): the signatures of the
+        classes of the program.
+        budget (int): the most commands an inlined body may have.
+        intrinsics (bool): whether the program is compiled with intrinsics.
+
+    Returns:
+        typing.Dict[str, typing.Dict]: the candidates, by full name.
+    """
+    collector = CandidateCollector(classes, budget)
+    with open(input_path, 'r') as input_file:
+        # Bodies are taken before -O2 moves variables into temps, which
+        # inlined code needs for itself.
+        compile_file(input_file, io.StringIO(), opt_level=min(opt_level, 1),
+                     classes=classes, intrinsics=intrinsics,
+                     extra_passes=[collector])
+    return collector.candidates
+
+
+def compile_path(input_path: str, output_path: str,
+                 options: typing.Dict[str, typing.Any]) \
+        -> typing.Tuple[float, typing.Dict[str, int]]:
+    """Compiles a single file by path. The output is written to a temporary
+    file next to output_path and renamed over it only once it is complete,
+    so readers never see a partially written file.
+
+    Args:
+        input_path (str): the .jack file to compile.
+        output_path (str): where to write the VM code.
+        options (typing.Dict[str, typing.Any]): keyword arguments for
+        compile_file.
+
+    Returns:
+        typing.Tuple[float, typing.Dict[str, int]]: the wall time the
+        compilation took, in seconds, and the statistics of compile_file.
+    """
+    start = time.perf_counter()
+    temp_path = "{}.{}.tmp".format(output_path, os.getpid())
+    try:
+        with open(input_path, 'r') as input_file, \
+                open(temp_path, 'wb' if options.get("bytecode") else 'w') \
+                as output_file:
+            stats = compile_file(input_file, output_file, **options)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return time.perf_counter() - start, stats
+
+
+def find_entry(vm_files: typing.Iterable[typing.List[tuple]],
+               classes: typing.Optional[dict]) -> str:
+    """
+    Args:
+        vm_files (typing.Iterable[typing.List[tuple]]): the commands of the
+        .vm files of the program that are not compiled from a .jack file.
+        classes (typing.Optional[dict]): the signatures of the classes of the
+        program, as returned by ClassIndex.classes().
+
+    Returns:
+        str: the function the program starts with, Sys.init if it defines
+        one and Main.main otherwise.
+    """
+    defined = {command[1] for commands in vm_files
+               for command in commands if command[0] == "function"}
+    defined.update("{}.{}".format(class_name, subroutine)
+                   for class_name, signature in (classes or {}).items()
+                   for subroutine in signature["subroutines"])
+    return "Sys.init" if "Sys.init" in defined else "Main.main"
+
+
+def assemble_program(jack_paths: typing.List[str],
+                     vm_paths: typing.List[str], output_path: str,
+                     options: typing.Dict[str, typing.Any]) \
+        -> typing.Tuple[float, typing.Dict[str, int]]:
+    """Builds a whole program into a single Hack assembly file, in this
+    process. The .jack files are compiled straight to assembly, and the
+    .vm files, such as the OS, are translated as they are. Like
+    compile_path, the output is renamed over output_path once complete.
+
+    Args:
+        jack_paths (typing.List[str]): the .jack files of the program.
+        vm_paths (typing.List[str]): the .vm files that are not compiled
+        from one of them.
+        output_path (str): where to write the assembly.
+        options (typing.Dict[str, typing.Any]): keyword arguments for
+        compile_file.
+
+    Returns:
+        typing.Tuple[float, typing.Dict[str, int]]: the wall time the build
+        took, in seconds, and the statistics of every file, summed.
+    """
+    start = time.perf_counter()
+    vm_files = {}
+    for vm_path in vm_paths:
+        with open(vm_path, 'r') as vm_file:
+            vm_files[vm_path] = parse_commands(vm_file.read())
+    entry = find_entry(vm_files.values(), options.get("classes"))
+    totals = {}
+    temp_path = "{}.{}.tmp".format(output_path, os.getpid())
+    try:
+        with open(temp_path, 'w') as output_file:
+            writer = AsmWriter(output_file)
+            writer.write_runtime(entry)
+            for commands in vm_files.values():
+                writer.emit(commands)
+            totals.update(writer.stats())
+            for jack_path in jack_paths:
+                with open(jack_path, 'r') as input_file:
+                    stats = compile_file(input_file, output_file, asm=True,
+                                         **options)
+                for name, count in stats.items():
+                    totals[name] = totals.get(name, 0) + count
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return time.perf_counter() - start, totals
+
+
+def compile_all(paths: typing.List[typing.Tuple[str, str]],
+                options: typing.Dict[str, typing.Any],
+                jobs: int = 1) \
+        -> typing.List[typing.Tuple[float, typing.Dict[str, int]]]:
+    """Compiles several files, possibly in parallel. Every file is compiled
+    independently, so the outputs do not depend on the number of jobs.
+
+    Args:
+        paths (typing.List[typing.Tuple[str, str]]): (input, output) pairs.
+        options (typing.Dict[str, typing.Any]): keyword arguments for
+        compile_file.
+        jobs (int): how many processes to use, 1 compiles in this process.
+
+    Returns:
+        typing.List[typing.Tuple[float, typing.Dict[str, int]]]: the result
+        of compile_path for every file, in the given order.
+    """
+    if jobs == 1 or len(paths) < 2:
+        return [compile_path(input_path, output_path, options)
+                for input_path, output_path in paths]
+    with concurrent.futures.ProcessPoolExecutor(jobs) as pool:
+        futures = [pool.submit(compile_path, input_path, output_path, options)
+                   for input_path, output_path in paths]
+        return [future.result() for future in futures]
 
 
 if "__main__" == __name__:
@@ -41,20 +333,253 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackCompiler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        prog="JackCompiler", description="Compiles Jack files to VM code.")
+    parser.add_argument("input_path", help="a .jack file or a directory")
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="tokenize the input in chunks, keeping memory flat")
+    parser.add_argument(
+        "-O", dest="opt_level", type=int, choices=range(3), default=0,
+        help="optimization level (default: 0)")
+    parser.add_argument(
+        "--string-pool", action="store_true",
+        help="build every distinct string constant of a class only once; "
+             "string constants are then shared between their uses")
+    parser.add_argument(
+        "--tree-shake", action="store_true",
+        help="remove the subroutines that cannot be reached from Main.main, "
+             "Sys.init if the program defines it and the --root subroutines, "
+             "and report what was removed")
+    parser.add_argument(
+        "--root", action="append", default=[],
+        help="a subroutine to keep when tree shaking, e.g. Game.run")
+    parser.add_argument(
+        "--inline-budget", type=int, default=DEFAULT_BUDGET, metavar="N",
+        help="at -O2, inline the subroutines that call nothing and have at "
+             "most N VM commands, 0 inlines nothing (default: {})".format(
+                 DEFAULT_BUDGET))
+    parser.add_argument(
+        "--passes", type=lambda names: names.split(",") if names else [],
+        metavar="NAMES",
+        help="run these comma separated passes instead of the ones of the "
+             "-O level, out of: " + ", ".join(PASSES))
+    parser.add_argument(
+        "--time-passes", action="store_true",
+        help="report the time every pass took and how many instructions it "
+             "changed")
+    parser.add_argument(
+        "--intrinsics", action="store_true",
+        help="expand calls of Memory.peek, Memory.poke, Math.abs, Math.min "
+             "and Math.max inline, and address array elements at constant "
+             "indices directly")
+    parser.add_argument(
+        "--asm", action="store_true",
+        help="build the whole program into a single Hack assembly file, "
+             "translating the .vm files that no .jack file compiles to, "
+             "such as the OS")
+    parser.add_argument(
+        "--bytecode", action="store_true",
+        help="write VM bytecode to .vmb files instead of VM code")
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="report how often every optimization was applied")
+    parser.add_argument(
+        "-j", "--jobs", type=int,
+        help="compile N files in parallel and report the timings, "
+             "0 uses every core, 1 compiles serially")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="skip files that did not change since the last build")
+    parser.add_argument(
+        "--cache-dir", default=os.environ.get("JACKC_CACHE_DIR"),
+        help="share compiled outputs through this directory, implies "
+             "--incremental (default: $JACKC_CACHE_DIR)")
+    parser.add_argument(
+        "--index-path", metavar="PATH",
+        help="where to keep the class index, which is only built for the "
+             "options that read it: --asm, --tree-shake, --intrinsics and "
+             "inlining at -O2 (default: {} next to the outputs and the "
+             "build manifest)".format(INDEX_NAME))
+    args = parser.parse_args()
+    if args.passes is not None:
+        unknown = [name for name in args.passes if name not in PASSES]
+        if unknown:
+            parser.error("unknown passes: " + ", ".join(unknown))
+    if args.jobs is not None and args.jobs < 0:
+        parser.error("--jobs must be 0 or more")
+    argument_path = os.path.abspath(args.input_path)
+    if args.tree_shake and not os.path.isdir(argument_path):
+        parser.error("--tree-shake needs the directory of the whole program")
+    if args.bytecode and (args.asm or args.tree_shake):
+        parser.error("--bytecode cannot be combined with --asm or "
+                     "--tree-shake")
+    if args.asm and (args.jobs is not None or args.incremental or
+                     args.cache_dir or args.tree_shake):
+        parser.error("--asm builds in one process and cannot be combined "
+                     "with --jobs, --incremental, --cache-dir or "
+                     "--tree-shake")
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
     else:
         files_to_assemble = [argument_path]
+    paths = []
+    vm_paths = []
     for input_path in files_to_assemble:
         filename, extension = os.path.splitext(input_path)
+        if extension.lower() == ".vm" and \
+                not os.path.exists(filename + ".jack"):
+            vm_paths.append(input_path)
         if extension.lower() != ".jack":
             continue
-        output_path = filename + ".vm"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            compile_file(input_file, output_file)
+        paths.append((input_path,
+                      filename + (".vmb" if args.bytecode else ".vm")))
+    compile_options = {"streaming": args.streaming,
+                       "opt_level": args.opt_level,
+                       "string_pool": args.string_pool,
+                       "intrinsics": args.intrinsics,
+                       "passes": args.passes,
+                       "bytecode": args.bytecode,
+                       "count_changes": args.time_passes or args.stats}
+
+    # The pre-pass over the headers of every class in the directory, only
+    # for the options that read it. A file is compiled against the
+    # signatures of the others, so they are part of its options, and a
+    # changed signature invalidates the build cache.
+    index = None
+    index_start = time.perf_counter()
+    inline = args.opt_level >= 2 and args.inline_budget > 0
+    if inline or args.asm or args.tree_shake or args.intrinsics:
+        source_directory = os.path.dirname(argument_path) \
+            if not os.path.isdir(argument_path) else argument_path
+        index = ClassIndex(source_directory, args.index_path)
+        index.update(
+            os.path.join(source_directory, filename)
+            for filename in sorted(os.listdir(source_directory))
+            if os.path.splitext(filename)[1].lower() == ".jack")
+        compile_options["classes"] = index.classes()
+    if inline:
+        # Inlining needs the compiled bodies of the other classes, and they
+        # are kept in the index along with the headers.
+        candidates = index.annotate(
+            "inline {}{}".format(args.inline_budget,
+                                 " intrinsics" if args.intrinsics else ""),
+            lambda path: collect_inline_candidates(
+                path, args.opt_level, compile_options["classes"],
+                args.inline_budget, args.intrinsics))
+        compile_options["inline"] = {
+            name: candidate for found in candidates.values()
+            for name, candidate in found.items()}
+    if index:
+        index.save()
+    index_time = time.perf_counter() - index_start
+
+    outputs = [output_path for _, output_path in paths]
+
+    jobs = 1
+    if args.jobs is not None:
+        jobs = args.jobs or os.cpu_count()
+    start = time.perf_counter()
+    cache = None
+    if args.asm:
+        if os.path.isdir(argument_path):
+            asm_path = os.path.join(
+                argument_path, os.path.basename(argument_path) + ".asm")
+        else:
+            asm_path = os.path.splitext(argument_path)[0] + ".asm"
+    elif (args.incremental or args.cache_dir) and paths:
+        cache = BuildCache(
+            os.path.dirname(paths[0][1]),
+            {option: value for option, value in compile_options.items()
+             if option not in RUNTIME_OPTIONS}, args.cache_dir)
+        paths = [(input_path, output_path)
+                 for input_path, output_path in paths
+                 if not cache.restore(input_path, output_path)]
+    if args.asm:
+        results = [assemble_program(
+            [input_path for input_path, _ in paths], vm_paths, asm_path,
+            compile_options)]
+    else:
+        results = compile_all(paths, compile_options, jobs)
+    times = [elapsed for elapsed, _ in results]
+    if cache:
+        for input_path, output_path in paths:
+            cache.record(input_path, output_path)
+        cache.save()
+    if args.tree_shake:
+        # The cache keeps the whole outputs, a shaken file no longer matches
+        # the manifest and is restored or recompiled by the next build.
+        # Sys.init, the entry of --asm builds, calls Main.main, which is
+        # also kept for the builds that start with it.
+        vm_files = []
+        for vm_path in vm_paths:
+            with open(vm_path, 'r') as vm_file:
+                vm_files.append(parse_commands(vm_file.read()))
+        shaker = TreeShaker(
+            ["Main.main", find_entry(vm_files, compile_options["classes"])] +
+            args.root)
+        shaker.shake(outputs)
+        print(shaker.report(), file=sys.stderr)
+    wall_time = time.perf_counter() - start
+    if cache:
+        print("{} in {:.3f}s".format(cache.summary(), wall_time),
+              file=sys.stderr)
+    if args.jobs is not None:
+        for (input_path, _), elapsed in zip(paths, times):
+            print("{:>10.3f}s  {}".format(elapsed, input_path),
+                  file=sys.stderr)
+        print("{} files, {} jobs: {:.3f}s wall, {:.3f}s total, "
+              "{:.2f}x speedup".format(
+                  len(paths), jobs, wall_time, sum(times),
+                  sum(times) / wall_time if wall_time else 1.0),
+              file=sys.stderr)
+    if args.string_pool:
+        print("string pool: {} strings, {} bytes of VM code saved".format(
+            sum(stats["strings pooled"] for _, stats in results),
+            sum(stats["string bytes saved"] for _, stats in results)),
+            file=sys.stderr)
+        unpooled = sum(stats["strings left unpooled"] for _, stats in results)
+        if unpooled:
+            print("string pool: {} string constants built where they are "
+                  "used, the static segment is full".format(unpooled),
+                  file=sys.stderr)
+    if args.intrinsics:
+        print("intrinsics: {} calls expanded inline, {} constant array "
+              "indices addressed directly".format(
+                  sum(stats["intrinsics expanded"] for _, stats in results),
+                  sum(stats["constant indices addressed"]
+                      for _, stats in results)),
+              file=sys.stderr)
+    if args.asm:
+        print("asm: {} instructions written to {}".format(
+            results[0][1]["asm instructions"], asm_path), file=sys.stderr)
+    if compile_options.get("inline"):
+        print("inlining: {} calls inlined, saving about {} cycles when "
+              "each runs once".format(
+                  sum(stats["calls inlined"] for _, stats in results),
+                  sum(stats["inlined cycles saved"] for _, stats in results)),
+              file=sys.stderr)
+    if args.time_passes:
+        measured = {}  # pass -> [microseconds, instructions changed]
+        for _, stats in results:
+            for name, count in stats.items():
+                measure, _, pass_name = name.partition(": ")
+                if measure in {"pass microseconds", "instructions changed"}:
+                    measured.setdefault(pass_name, [0, 0])[
+                        measure == "instructions changed"] += count
+        for pass_name, (microseconds, changed) in measured.items():
+            print("{:>10.3f} ms {:>8} changed  {}".format(
+                microseconds / 1000, changed, pass_name), file=sys.stderr)
+    if args.stats:
+        if index:
+            print("class index: {} of {} files scanned in {:.3f}s".format(
+                index.scanned, len(index.files), index_time),
+                file=sys.stderr)
+        totals = {}
+        for _, stats in results:
+            for name, count in stats.items():
+                totals[name] = totals.get(name, 0) + count
+        for name, count in sorted(totals.items()):
+            print("{:>8}  {}".format(count, name), file=sys.stderr)
@@ -5,6 +5,8 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import array
+import re
 import typing
 
 SYMBOLS = {'{', '}', '(', ')', '[', ']', '.', ',', ';', '+',
@@ -13,6 +15,244 @@ KEYWORDS = {'class', 'constructor', "function", 'method', 'field',
             'static', 'var', 'int', 'char', 'boolean', 'void', 'true',
             'false', 'null', 'this', 'let', 'do', 'if', 'else',
             'while', 'return'}
+# symbol() escapes these the same way the XML analyzer did.
+SYMBOL_ESCAPES = {'<': "&lt;", '>': "&gt;", '&': "&amp;"}
+SYMBOL_UNESCAPES = {v: k for k, v in SYMBOL_ESCAPES.items()}
+
+# Token type codes, as stored in TokenStore.types.
+KEYWORD, SYMBOL, IDENTIFIER, INT_CONST, STRING_CONST = range(5)
+TOKEN_TYPES = ("KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST")
+
+# One master pattern for the whole buffer: whitespace and comments are
+# matched without a capturing group, and every kind of token has its own
+# group, so a match is classified by its lastindex alone.
+# A block comment with no closing "*/" matches OPEN_COMMENT_GROUP instead.
+TOKEN_PATTERN = re.compile(r"""
+    [\s\0]+
+  | //[^\n]*
+  | /\*.*?\*/
+  | "([^"\n]*)"
+  | (\d+)
+  | (\w+)
+  | (/\*)
+  | ([{}()\[\].,;+\-*/&|<>=~^\#]|\S)
+""", re.DOTALL | re.VERBOSE)
+STRING_GROUP, INT_GROUP, WORD_GROUP, OPEN_COMMENT_GROUP, SYMBOL_GROUP = \
+    range(1, 6)
+# How much source a streaming tokenizer reads at a time.
+CHUNK_SIZE = 1 << 20
+
+
+class TokenStore:
+    """A tokenized source file, kept as parallel arrays: the type code of
+    every token, the id of its interned value and its offset in the source.
+    Values are interned in the engine's view: symbols are escaped, string
+    constants have no quotes and integer constants are ints.
+    """
+    __slots__ = ("types", "values", "offsets", "table", "ids")
+
+    def __init__(self) -> None:
+        """Creates a new empty store."""
+        self.types = array.array("B")
+        self.values = array.array("I")
+        self.offsets = array.array("L")
+        self.table = []  # interned values, indexed by id
+        self.ids = {}  # (type code, value) -> id
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def append(self, code: int, value: typing.Union[str, int],
+               offset: int) -> None:
+        """Appends a token to the store.
+
+        Args:
+            code (int): the type code of the token.
+            value (typing.Union[str, int]): the value of the token.
+            offset (int): where the token starts in the source.
+        """
+        key = (code, value)
+        value_id = self.ids.get(key)
+        if value_id is None:
+            value_id = self.ids[key] = len(self.table)
+            self.table.append(value)
+        self.types.append(code)
+        self.values.append(value_id)
+        self.offsets.append(offset)
+
+    def append_raw(self, token: str, offset: int) -> None:
+        """Classifies a raw token, as it appears in the source, and appends
+        it to the store.
+
+        Args:
+            token (str): the token text, string constants with their quotes.
+            offset (int): where the token starts in the source.
+        """
+        if token in SYMBOLS:
+            self.append(SYMBOL, SYMBOL_ESCAPES.get(token, token), offset)
+        elif token.isdigit():
+            self.append(INT_CONST, int(token), offset)
+        elif token[0] == '"' or token[0] == "'":
+            self.append(STRING_CONST, token.replace('"', ''), offset)
+        elif token in KEYWORDS:
+            self.append(KEYWORD, token, offset)
+        else:
+            self.append(IDENTIFIER, token, offset)
+
+    def value(self, index: int) -> typing.Union[str, int]:
+        """
+        Args:
+            index (int): the position of a token in the store.
+
+        Returns:
+            typing.Union[str, int]: the value of that token.
+        """
+        return self.table[self.values[index]]
+
+
+def scan_regex(text: str, store: TokenStore, base: int = 0,
+               final: bool = True) -> int:
+    """Breaks a Jack source buffer into classified tokens in a single linear
+    pass.
+
+    Args:
+        text (str): the source to scan, the whole file unless streaming.
+        store (TokenStore): the tokens are appended to this store.
+        base (int): the source offset of the beginning of text.
+        final (bool): whether text runs until the end of the file. If it
+        does, an unterminated block comment runs until the end of the input,
+        otherwise scanning stops where the comment starts.
+
+    Returns:
+        int: how much of text was consumed.
+    """
+    append = store.append
+    for match in TOKEN_PATTERN.finditer(text):
+        group = match.lastindex
+        if group is None:
+            continue
+        token = match.group(group)
+        if group == WORD_GROUP:
+            append(KEYWORD if token in KEYWORDS else IDENTIFIER, token,
+                   base + match.start())
+        elif group == SYMBOL_GROUP:
+            append(SYMBOL, SYMBOL_ESCAPES.get(token, token),
+                   base + match.start())
+        elif group == INT_GROUP:
+            append(INT_CONST, int(token), base + match.start())
+        elif group == STRING_GROUP:
+            append(STRING_CONST, token, base + match.start())
+        elif not final:
+            return match.start()
+        else:
+            break
+    return len(text)
+
+
+def scan_legacy(text: str, store: TokenStore) -> int:
+    """Breaks a Jack source buffer into tokens by first stripping comments
+    character by character and then walking the cleaned lines. Offsets are
+    positions in the cleaned text.
+
+    Args:
+        text (str): the whole source file.
+        store (TokenStore): the tokens are appended to this store.
+
+    Returns:
+        int: how much of text was consumed, which is all of it.
+    """
+    lines = []  # this list will include only of meaningful lines
+    comment = False
+    in_quote = False
+    for line in text.splitlines():
+        end_of_line = False
+        prev = None
+        new_line = ""
+        for c in line:
+            if end_of_line:
+                prev = c
+                continue
+            elif in_quote:
+                new_line += c
+                if c == '"':
+                    in_quote = False
+                continue
+            elif c == '"' and not in_quote and not comment:
+                in_quote = True
+                new_line += c
+                prev = c
+                continue
+            elif prev == "/" and c == "*" and not comment:
+                prev = ""
+                comment = True
+                continue
+            elif prev == "*" and c == "/" and comment:
+                prev = ""
+                comment = False
+                continue
+            elif prev == "/" and c == "/" and not in_quote:
+                end_of_line = True
+                prev = c
+                continue
+            elif comment:
+                prev = c
+                continue
+            else:
+                if c == "\t" or c == "\0":
+                    new_line += " "
+
+                elif prev == "/" and (c != "/" and c != "*"):
+                    new_line += prev
+                    new_line += c
+
+                elif c == " " and prev == " ":
+                    new_line += ""
+                elif c != "/":
+                    new_line += c
+                prev = c
+        new_line = new_line.strip()
+        if new_line != "" and new_line != " ":
+            lines.append(new_line)
+
+    tokens = []
+
+    line_start = 0
+    for line in lines:
+        position = 0
+        while position < len(line):
+            if line[position] == " ":
+                position += 1  # a line can't end with space
+            start = position
+            token = line[position]
+            if token == '"':  # this is a constant string
+                end = line.find('"', position + 1)
+                if end == -1:
+                    end = len(line) - 1
+                token = '"' + line[position + 1:end] + '"'
+                position = end
+            elif token in SYMBOLS:
+                pass
+            elif token.isdigit():
+                while position + 1 < len(line) and \
+                        line[position + 1].isdigit():
+                    position += 1
+                    token += line[position]
+            else:
+                while position + 1 < len(line) and \
+                        line[position + 1] != " " and \
+                        line[position + 1] not in SYMBOLS:
+                    position += 1
+                    token += line[position]
+            store.append_raw(token, line_start + start)
+            position += 1
+        line_start += len(line) + 1
+    return len(text)
+
+
+SCANNERS = {
+    "regex": scan_regex,
+    "legacy": scan_legacy
+}
 
 
 class JackTokenizer:
@@ -99,73 +339,67 @@ class JackTokenizer:
     Note that ^, # correspond to shiftleft and shiftright, respectively.
     """
 
-    def __init__(self, input_stream: typing.TextIO) -> None:
-        """Opens the input stream and gets ready to tokenize it.
+    def __init__(self, input_stream: typing.TextIO,
+                 scanner: str = "regex", streaming: bool = False) -> None:
+        """Opens the input stream and tokenizes it into a TokenStore.
 
         Args:
             input_stream (typing.TextIO): input stream.
+            scanner (str): the scanning engine to use, can be "regex" (a
+            single pass of one compiled pattern) or "legacy" (the original
+            character by character comment stripper).
+            streaming (bool): if True, the input is read CHUNK_SIZE
+            characters at a time and the store only holds the tokens of the
+            current chunk, so memory does not grow with the input size.
+            Streaming needs the "regex" scanner.
         """
-        # Your code goes here!
-        # A good place to start is to read all the lines of the input:
-        messy_lines = input_stream.read().splitlines()
-        self.n = 0  # line number we're at
-        self.position = 0  # position within the line
-        self.lines = []  # this list will include only of meaningful lines
-        self.better_lines = []
-        self.token = None
-        self.first = True
-        comment = False
-        in_quote = False
-        for line in messy_lines:
-            end_of_line = False
-            prev = None
-            new_line = ""
-            for c in line:
-                if end_of_line:
-                    prev = c
-                    continue
-                elif in_quote:
-                    new_line += c
-                    if c == '"':
-                        in_quote = False
-                    continue
-                elif c == '"' and not in_quote and not comment:
-                    in_quote = True
-                    new_line += c
-                    prev = c
-                    continue
-                elif prev == "/" and c == "*" and not comment:
-                    prev = ""
-                    comment = True
-                    continue
-                elif prev == "*" and c == "/" and comment:
-                    prev = ""
-                    comment = False
-                    continue
-                elif prev == "/" and c == "/" and not in_quote:
-                    end_of_line = True
-                    prev = c
-                    continue
-                elif comment:
-                    prev = c
-                    continue
-                else:
-                    if c == "\t" or c == "\0":
-                        new_line += " "
-
-                    elif prev == "/" and (c != "/" and c != "*"):
-                        new_line += prev
-                        new_line += c
-
-                    elif c == " " and prev == " ":
-                        new_line += ""
-                    elif c != "/":
-                        new_line += c
-                    prev = c
-            new_line = new_line.strip()
-            if new_line != "" and new_line != " ":
-                self.lines.append(new_line)
-        self.lines_num = len(self.lines)
+        self.store = TokenStore()
+        self.cursor = -1  # no current token until the first advance()
+        self._stream = None
+        if streaming:
+            if scanner != "regex":
+                raise ValueError("streaming needs the regex scanner")
+            self._stream = input_stream
+            self._carry = ""  # source that was read but not scanned yet
+            self._base = 0  # the source offset of self._carry
+        else:
+            SCANNERS[scanner](input_stream.read(), self.store)
+        self._bind_store()
+
+    def _bind_store(self) -> None:
+        self._types = self.store.types
+        self._values = self.store.values
+        self._table = self.store.table
+
+    def _refill(self) -> bool:
+        """Replaces the scanned tokens with the ones in the next chunks of the
+        input, keeping only the current token.
+
+        Returns:
+            bool: True if new tokens were scanned, False at the end of input.
+        """
+        store = TokenStore()
+        if self.cursor >= 0:
+            store.append(self._types[self.cursor],
+                         self._table[self._values[self.cursor]],
+                         self.store.offsets[self.cursor])
+            self.cursor = 0
+        while self._stream is not None and len(store) <= self.cursor + 1:
+            chunk = self._stream.read(CHUNK_SIZE)
+            text = self._carry + chunk
+            if not chunk:
+                end = len(text)
+                self._stream = None
+            else:
+                # tokens never span lines, only block comments do.
+                end = text.rfind("\n") + 1
+            consumed = scan_regex(text[:end], store, self._base,
+                                  self._stream is None)
+            self._carry = text[consumed:]
+            self._base += consumed
+        self.store = store
+        self._bind_store()
+        return self.cursor + 1 < len(store)
 
     def has_more_tokens(self) -> bool:
         """Do we have more tokens in the input?
@@ -173,59 +407,41 @@ class JackTokenizer:
         Returns:
             bool: True if there are more tokens, False otherwise.
         """
-        # Your code goes here!
-        if self.n + 1 < self.lines_num:
+        if self.cursor + 1 < len(self._types):
             return True
-        if self.position + 1 < len(self.lines[self.n]):
-            return True
-        return False
+        return self._stream is not None and self._refill()
 
     def advance(self) -> None:
         """Gets the next token from the input and makes it the current token. 
         This method should be called if has_more_tokens() is true. 
         Initially there is no current token.
         """
-        # Your code goes here!
-        if self.has_more_tokens() and not self.first:
-            if self.position + 1 == len(self.lines[self.n]):
-                self.position = 0
-                self.n += 1
-            else:
-                self.position += 1
-
-        if self.lines[self.n][self.position] == " ":
-            self.position += 1  # we know it is legal because a line cant end with space
-        self.token = self.lines[self.n][self.position]
-        self.first = False
-
-        if self.token in SYMBOLS:
-            return
-        if self.token == '"':  # this is a constant string
-            if self.position + 1 < len(self.lines[self.n]):
-                self.position += 1
-                self.token = ""
-            while self.lines[self.n][self.position] != '"':
-                self.token += self.lines[self.n][self.position]
-                if self.position + 1 < len(self.lines[self.n]):
-                    self.position += 1
-            self.token = '"' + self.token + '"'
-            return
-
-        if self.token.isdigit():
-            while self.position + 1 < len(self.lines[self.n]) and \
-                    self.lines[self.n][self.position + 1].isdigit():
-                self.position += 1
-                self.token += self.lines[self.n][self.position]
-            return
-
-        while self.position + 1 < len(self.lines[self.n]) and \
-                self.lines[self.n][self.position + 1] != " " and \
-                self.lines[self.n][self.position + 1] not in SYMBOLS:
-            if self.position + 1 < len(self.lines[self.n]):
-                self.position += 1
-                self.token += self.lines[self.n][self.position]
-
-        return
+        self.cursor += 1
+
+    def _current(self) -> int:
+        """
+        Returns:
+            int: the index of the current token in the store.
+
+        Raises:
+            ValueError: if advance() was not called yet, as there is no
+            current token then.
+        """
+        if self.cursor < 0:
+            raise ValueError("there is no current token before the first "
+                             "call of advance()")
+        return self.cursor
+
+    @property
+    def token(self) -> str:
+        """The current token as it appears in the source."""
+        value = self.value()
+        code = self._types[self.cursor]
+        if code == STRING_CONST:
+            return '"' + value + '"'
+        if code == SYMBOL:
+            return SYMBOL_UNESCAPES.get(value, value)
+        return str(value)
 
     def token_type(self) -> str:
         """
@@ -233,16 +449,23 @@ class JackTokenizer:
             str: the type of the current token, can be
             "KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST"
         """
-        # Your code goes here!
-        if self.token in SYMBOLS:
-            return "SYMBOL"
-        if self.token.isdigit():
-            return "INT_CONST"
-        if self.token[0] == '"' or self.token[0] == "'":
-            return "STRING_CONST"
-        if self.token in KEYWORDS:
-            return "KEYWORD"
-        return "IDENTIFIER"
+        return TOKEN_TYPES[self._types[self._current()]]
+
+    def value(self) -> typing.Union[str, int]:
+        """
+        Returns:
+            typing.Union[str, int]: the value of the current token, whatever
+            its type: the same as keyword(), symbol(), identifier(),
+            int_val() or string_val() would return.
+        """
+        return self._table[self._values[self._current()]]
+
+    def offset(self) -> int:
+        """
+        Returns:
+            int: where the current token starts in the source.
+        """
+        return self.store.offsets[self._current()]
 
     def keyword(self) -> str:
         """
@@ -253,8 +476,7 @@ class JackTokenizer:
             "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO", 
             "IF", "ELSE", "WHILE", "RETURN", "TRUE", "FALSE", "NULL", "THIS"
         """
-        # Your code goes here!
-        return self.token
+        return self.value()
 
     def symbol(self) -> str:
         """
@@ -265,14 +487,7 @@ class JackTokenizer:
             symbol: '{' | '}' | '(' | ')' | '[' | ']' | '.' | ',' | ';' | '+' | 
               '-' | '*' | '/' | '&' | '|' | '<' | '>' | '=' | '~' | '^' | '#'
         """
-        # Your code goes here!
-        if self.token == '<':
-            return "&lt;"
-        if self.token == '>':
-            return "&gt;"
-        if self.token == "&":
-            return "&amp;"
-        return self.token
+        return self.value()
 
     def identifier(self) -> str:
         """
@@ -284,8 +499,7 @@ class JackTokenizer:
                   starting with a digit. You can assume keywords cannot be
                   identifiers, so 'self' cannot be an identifier, etc'.
         """
-        # Your code goes here!
-        return self.token
+        return self.value()
 
     def int_val(self) -> int:
         """
@@ -295,8 +509,7 @@ class JackTokenizer:
             Recall that integerConstant was defined in the grammar like so:
             integerConstant: A decimal number in the range 0-32767.
         """
-        # Your code goes here!
-        return int(self.token)
+        return self.value()
 
     def string_val(self) -> str:
         """
@@ -307,6 +520,4 @@ class JackTokenizer:
             StringConstant: '"' A sequence of Unicode characters not including 
                       double quote or newline '"'
         """
-        # Your code goes here!
-        new_token = self.token.replace('"', '')
-        return new_token
+        return self.value()
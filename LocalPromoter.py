@@ -0,0 +1,141 @@
+"""
+Moves the most used locals and arguments of a subroutine into the temps
+it leaves free.
+"""
+import typing
+from FlowGraph import FlowGraph
+
+# Temp 0 is the compiler's scratch slot and is never promoted into.
+PROMOTION_SLOTS = range(1, 8)
+# How much more an access inside a loop counts, per level of nesting.
+LOOP_WEIGHT = 10
+MAX_LOOP_DEPTH = 3
+# The weight an argument needs to pay for copying it into its temp on entry.
+MIN_WEIGHT = {"local": 1, "argument": 3}
+
+
+def loop_depths(commands: typing.List[tuple]) -> typing.List[int]:
+    """
+    Args:
+        commands (typing.List[tuple]): the commands of one subroutine.
+
+    Returns:
+        typing.List[int]: for every command, how many loops it is in. A loop
+        is the span between a label and a later jump back to it.
+    """
+    labels = {command[1]: index for index, command in enumerate(commands)
+              if command[0] == "label"}
+    depths = [0] * (len(commands) + 1)
+    for index, command in enumerate(commands):
+        if command[0] in {"goto", "if-goto"} and labels[command[1]] < index:
+            depths[labels[command[1]]] += 1
+            depths[index + 1] -= 1
+    depth = 0
+    for index in range(len(commands)):
+        depth += depths[index]
+        depths[index] = depth
+    return depths[:-1]
+
+
+class LocalPromoter:
+    """Moves the most used locals and arguments of a subroutine into the temp
+    segment, which lives at fixed addresses.
+
+    Temps are shared by all subroutines, so a variable is only promoted if it
+    is never live across a call. Accesses are counted with the ones inside
+    loops weighted, and the variables are given the temps that the
+    subroutine does not use, hottest first. Two variables that are never
+    live at the same time can share a temp. A promoted argument is copied
+    into its temp on entry, and so is a promoted local that may be read
+    before it is written, with the zero it starts with. The remaining locals
+    are renumbered, so the function declares fewer of them.
+    """
+
+    def __init__(self) -> None:
+        self.locals = 0
+        self.arguments = 0
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how many locals and arguments were promoted
+            into temps.
+        """
+        return {"locals promoted": self.locals,
+                "arguments promoted": self.arguments}
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands with the variables promoted.
+        """
+        if not commands or commands[0][0] != "function":
+            return commands
+        free = [slot for slot in PROMOTION_SLOTS
+                if ("temp", slot) not in {command[1:] for command in commands}]
+        if not free:
+            return commands
+
+        depths = loop_depths(commands)
+        weights = {}
+        for index, command in enumerate(commands):
+            if command[1:2] in {("local",), ("argument",)} and \
+                    command[0] in {"push", "pop"}:
+                weights[command[1:]] = weights.get(command[1:], 0) + \
+                    LOOP_WEIGHT ** min(depths[index], MAX_LOOP_DEPTH)
+
+        live = FlowGraph(commands).liveness()
+        across_calls = set()
+        interferes = {variable: set() for variable in weights}
+        for index, command in enumerate(commands):
+            if command[0] == "call":
+                across_calls |= live[index]
+            # Whatever a pop writes must not clobber a variable still live.
+            written = {command[1:]} if command[0] == "pop" else set()
+            for variable in live[index] | written:
+                if variable in interferes:
+                    interferes[variable] |= live[index] - {variable}
+        entry = live[0]
+        for variable in entry & set(interferes):
+            interferes[variable] |= entry - {variable}
+
+        slots = {}
+        for variable in sorted(weights, key=lambda variable: (
+                -weights[variable], variable)):
+            if variable in across_calls or \
+                    weights[variable] < MIN_WEIGHT[variable[0]]:
+                continue
+            taken = {slots[other] for other in interferes[variable]
+                     if other in slots}
+            slot = next((slot for slot in free if slot not in taken), None)
+            if slot is not None:
+                slots[variable] = slot
+        if not slots:
+            return commands
+
+        kept = [index for index in range(commands[0][2])
+                if ("local", index) not in slots]
+        renumbered = {("local", old): ("local", new)
+                      for new, old in enumerate(kept)}
+        out = [("function", commands[0][1], len(kept))]
+        for variable, slot in sorted(slots.items()):
+            if variable not in entry:
+                continue
+            if variable[0] == "argument":
+                out.append(("push",) + variable)
+            else:
+                out.append(("push", "constant", 0))
+            out.append(("pop", "temp", slot))
+        for command in commands[1:]:
+            variable = command[1:]
+            if command[0] in {"push", "pop"} and variable in slots:
+                command = (command[0], "temp", slots[variable])
+            elif command[0] in {"push", "pop"} and variable in renumbered:
+                command = (command[0],) + renumbered[variable]
+            out.append(command)
+        self.locals += sum(variable[0] == "local" for variable in slots)
+        self.arguments += sum(variable[0] == "argument" for variable in slots)
+        return out
@@ -0,0 +1,149 @@
+"""
+Moves the expressions of while loops that do not change between
+iterations out of the loops.
+"""
+import typing
+
+BINARY = {"add", "sub", "and", "or", "eq", "gt", "lt"}
+UNARY = {"neg", "not", "shiftleft", "shiftright"}
+# Calls that only compute their result. Math.divide is left out, hoisting it
+# out of a loop that never runs could divide by zero.
+PURE_CALLS = {("call", "Math.multiply", 2)}
+
+
+def expressions(commands: typing.List[tuple],
+                leaf: typing.Callable[[tuple], bool]) \
+        -> typing.List[typing.Tuple[int, int]]:
+    """Finds the largest expressions that are made of pure operations on
+    leaves accepted by a predicate.
+
+    Args:
+        commands (typing.List[tuple]): commands that start and end with an
+        empty stack, like the statements of a block.
+        leaf (typing.Callable[[tuple], bool]): tells if the value of a push
+        may be used.
+
+    Returns:
+        typing.List[typing.Tuple[int, int]]: the (start, end) index ranges
+        of the expressions, in order and not overlapping.
+    """
+    found = []
+    stack = []  # (start, pure) of every value on the stack
+    for index, command in enumerate(commands):
+        operation = command[0]
+        if operation == "push":
+            value = (index, leaf(command))
+        elif operation in BINARY or command in PURE_CALLS:
+            second, first = stack.pop(), stack.pop()
+            value = (first[0], first[1] and second[1])
+        elif operation in UNARY and stack:
+            first = stack.pop()
+            value = (first[0], first[1])
+        elif operation == "call":
+            arguments = [stack.pop() for _ in range(min(command[2],
+                                                        len(stack)))]
+            value = (arguments[-1][0] if arguments else index, False)
+        else:
+            if operation in {"pop", "if-goto", "return"} and stack:
+                stack.pop()
+            if operation in {"label", "goto", "return"}:
+                stack = []
+            continue
+        stack.append(value)
+        if value[1]:
+            # A larger expression replaces the ones it is made of.
+            while found and found[-1][0] >= value[0]:
+                found.pop()
+            found.append((value[0], index + 1))
+    return found
+
+
+class LoopHoister:
+    """Moves the expressions of a while loop that give the same value on
+    every iteration out of the loop, into new locals set before it.
+
+    The compilation engine hands every loop to hoist() with its condition
+    and body. An expression is invariant if it only reads constants, locals
+    and arguments that the loop never stores to, and fields and statics
+    that nothing in the loop may store to. A store through "that" may alias
+    a field, and any call but a pure one may store to fields and statics.
+    Array elements are never invariant. Only the largest invariant
+    expressions are hoisted, and only those that do some work or read a
+    field, like the base of an array field.
+    """
+
+    def __init__(self) -> None:
+        self.hoisted = 0
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how many expressions were hoisted.
+        """
+        return {"invariants hoisted": self.hoisted}
+
+    def hoist(self, condition: typing.List[tuple], body: typing.List[tuple],
+              new_local: typing.Callable[[], int]) \
+            -> typing.Tuple[typing.List[tuple], typing.List[tuple],
+                            typing.List[tuple]]:
+        """
+        Args:
+            condition (typing.List[tuple]): the commands of the condition.
+            body (typing.List[tuple]): the commands of the body.
+            new_local (typing.Callable[[], int]): returns the index of a new
+            local of the subroutine.
+
+        Returns:
+            typing.Tuple[typing.List[tuple], typing.List[tuple],
+            typing.List[tuple]]: the commands to run before the loop, and
+            the condition and the body that read the hoisted values.
+        """
+        stored = set()
+        pure = True
+        for command in condition + body:
+            if command[0] == "pop":
+                stored.add(command[1:])
+                stored.add(command[1])
+            elif command[0] == "call" and command not in PURE_CALLS:
+                pure = False
+
+        def invariant(command):
+            segment = command[1]
+            if segment == "constant":
+                return True
+            if segment in {"local", "argument", "pointer"}:
+                return command[1:] not in stored
+            if segment == "static":
+                return pure and command[1:] not in stored
+            if segment == "this":
+                return pure and not stored & {"this", "that", ("pointer", 0)}
+            return False
+
+        preheader = []
+        hoisted = {}  # the commands of an expression -> its local
+
+        def rewrite(commands):
+            out = []
+            end = 0
+            for start, stop in expressions(commands, invariant):
+                expression = tuple(commands[start:stop])
+                constant = all(command[1:2] == ("constant",) or
+                               len(command) == 1 or command in PURE_CALLS
+                               for command in expression)
+                if constant or (len(expression) == 1 and
+                                expression[0][1] != "this"):
+                    continue
+                if expression not in hoisted:
+                    hoisted[expression] = new_local()
+                    preheader.extend(expression)
+                    preheader.append(("pop", "local", hoisted[expression]))
+                    self.hoisted += 1
+                out.extend(commands[end:start])
+                out.append(("push", "local", hoisted[expression]))
+                end = stop
+            out.extend(commands[end:])
+            return out
+
+        condition = rewrite(condition)
+        body = rewrite(body)
+        return preheader, condition, body
@@ -0,0 +1,103 @@
+"""
+Runs a pipeline of optimization passes over every subroutine, and
+measures the time every pass takes and the instructions it changes.
+"""
+import difflib
+import time
+import typing
+
+
+def changed_instructions(before: typing.List[tuple],
+                         after: typing.List[tuple]) -> int:
+    """
+    Args:
+        before (typing.List[tuple]): the commands a pass was given.
+        after (typing.List[tuple]): the commands it returned.
+
+    Returns:
+        int: how many instructions were removed, added or replaced. A
+        replaced run counts its longer side.
+    """
+    if before == after:
+        return 0
+    matcher = difflib.SequenceMatcher(None, before, after, autojunk=False)
+    return sum(max(first_end - first, second_end - second)
+               for tag, first, first_end, second, second_end
+               in matcher.get_opcodes() if tag != "equal")
+
+
+class PassManager:
+    """Runs a pipeline of optimization passes over every subroutine, and
+    measures each of them.
+
+    A pass is an object whose run() takes the commands of one subroutine
+    and returns the optimized list, and whose stats() returns how often it
+    applied its optimizations. The commands are the tuples VMWriter
+    buffers, not the integer encoding of IR, and the passes that work on
+    basic blocks split them with FlowGraph. The manager is a pass itself, so VMWriter
+    runs it on every subroutine it flushes. Its statistics are those of
+    every pass, and the wall time every pass took and, if asked for, the
+    number of instructions it changed, by the name it was given in the
+    pipeline.
+    """
+
+    def __init__(self, pipeline: typing.Sequence[
+            typing.Tuple[str, typing.Any]] = (),
+                 count_changes: bool = False) -> None:
+        """
+        Args:
+            pipeline (typing.Sequence[typing.Tuple[str, typing.Any]]): the
+            (name, pass) pairs to run, in order.
+            count_changes (bool): if True, the instructions every pass
+            changed are counted, by diffing its input and output, which can
+            take longer than the pass itself.
+        """
+        self.pipeline = list(pipeline)
+        self.count_changes = count_changes
+        self.times = {name: 0.0 for name, _ in self.pipeline}
+        self.changed = {name: 0 for name, _ in self.pipeline}
+
+    def add(self, name: str, optimization: typing.Any) -> None:
+        """Appends a pass to the pipeline.
+
+        Args:
+            name (str): the name its measurements are reported under.
+            optimization (typing.Any): the pass.
+        """
+        self.pipeline.append((name, optimization))
+        self.times.setdefault(name, 0.0)
+        self.changed.setdefault(name, 0)
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: the statistics of every pass, and the
+            microseconds it ran for and, if they were counted, the
+            instructions it changed.
+        """
+        stats = {}
+        for name, optimization in self.pipeline:
+            stats.update(optimization.stats())
+            stats["pass microseconds: " + name] = \
+                round(self.times[name] * 1e6)
+            if self.count_changes:
+                stats["instructions changed: " + name] = self.changed[name]
+        return stats
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands after every pass.
+        """
+        for name, optimization in self.pipeline:
+            start = time.perf_counter()
+            optimized = optimization.run(commands)
+            self.times[name] += time.perf_counter() - start
+            if self.count_changes:
+                self.changed[name] += changed_instructions(commands,
+                                                           optimized)
+            commands = optimized
+        return commands
@@ -0,0 +1,170 @@
+"""
+A peephole optimizer: rewrites short windows of VM commands with a list
+of rules, and counts how often every rule applies.
+"""
+import typing
+
+COMPARISONS = {"eq", "gt", "lt"}
+JUMPS = {"goto", "if-goto"}
+# The segments that a push and a pop of the same slot can be removed for,
+# pointer is left alone as popping it also moves this or that.
+PLAIN_SEGMENTS = {"local", "argument", "static", "this", "that", "temp"}
+
+
+def temp_is_dead(slot: tuple, commands: typing.List[tuple],
+                 position: int) -> bool:
+    """
+    Args:
+        slot (tuple): a segment and an index, e.g. ("temp", 0).
+        commands (typing.List[tuple]): the commands of a subroutine.
+        position (int): where to start looking.
+
+    Returns:
+        bool: True if the slot is overwritten or no longer needed before it
+        is read again. Temps are shared by every function, so nothing reads
+        them across a call.
+    """
+    for command in commands[position:]:
+        if command[1:] == slot:
+            return command[0] == "pop"
+        if command[0] in {"call", "return"}:
+            return True
+        if command[0] in JUMPS or command[0] == "label":
+            return False
+    return True
+
+
+def push_then_pop(window, commands, position):
+    # push x; pop x
+    if window[0][0] == "push" and window[1][0] == "pop" and \
+            window[0][1:] == window[1][1:] and window[0][1] in PLAIN_SEGMENTS:
+        return []
+    return None
+
+
+def pop_then_push_temp(window, commands, position):
+    # pop temp k; push temp k, where temp k is not read afterwards
+    if window[0][:2] == ("pop", "temp") and \
+            window[1] == ("push",) + window[0][1:] and \
+            temp_is_dead(window[0][1:], commands, position):
+        return []
+    return None
+
+
+def double_negation(window, commands, position):
+    # neg; neg or not; not
+    if window[0] == window[1] and window[0][0] in {"neg", "not"}:
+        return []
+    return None
+
+
+def add_zero(window, commands, position):
+    # push constant 0; add or push constant 0; sub
+    if window[0] == ("push", "constant", 0) and \
+            window[1][0] in {"add", "sub"}:
+        return []
+    return None
+
+
+def constant_branch(window, commands, position):
+    # push constant 0; if-goto L never jumps, any other constant always
+    # does, and so does true, i.e. push constant 0; not.
+    if window[2][0] != "if-goto":
+        return None
+    if window[1][:2] == ("push", "constant"):
+        return window[:1] + ([("goto", window[2][1])] if window[1][2] else [])
+    if window[:2] == [("push", "constant", 0), ("not",)]:
+        return [("goto", window[2][1])]
+    return None
+
+
+def inverted_branch(window, commands, position):
+    # A comparison is either 0 or -1, so instead of negating it, the two
+    # targets can be swapped: lt; not; if-goto L; goto M is
+    # lt; if-goto M; goto L.
+    if window[0][0] in COMPARISONS and window[1] == ("not",) and \
+            window[2][0] == "if-goto" and window[3][0] == "goto":
+        return [window[0], ("if-goto", window[3][1]), ("goto", window[2][1])]
+    return None
+
+
+def jump_to_next(window, commands, position):
+    # goto L; label L
+    if window[0][0] == "goto" and window[1] == ("label", window[0][1]):
+        return [window[1]]
+    return None
+
+
+def unreachable(window, commands, position):
+    # Nothing after a goto or a return runs, up to the next label.
+    if window[0][0] in {"goto", "return"} and \
+            window[1][0] not in {"label", "function"}:
+        return [window[0]]
+    return None
+
+
+# The rules, by name, with the number of commands each one looks at.
+RULES = {
+    "push-pop": (2, push_then_pop),
+    "pop-push-temp": (2, pop_then_push_temp),
+    "double-negation": (2, double_negation),
+    "add-zero": (2, add_zero),
+    "constant-branch": (3, constant_branch),
+    "inverted-branch": (4, inverted_branch),
+    "jump-to-next": (2, jump_to_next),
+    "unreachable": (2, unreachable)
+}
+
+
+class Peephole:
+    """Rewrites short, redundant sequences of VM commands.
+
+    Commands are moved one at a time to the output, and after every one the
+    rules look at a sliding window at the end of the output. A rule is a
+    function that takes the window, the commands of the subroutine and the
+    position of the next command that was not moved yet, and returns the
+    commands to replace the window with, or None. After a rewrite the rules
+    run again, so rewrites can enable each other.
+    """
+
+    def __init__(self, rules: typing.Dict[str, tuple] = None) -> None:
+        """Creates a new peephole optimizer.
+
+        Args:
+            rules (typing.Dict[str, tuple]): the rules to apply by name, as
+            (window size, function) pairs. Defaults to RULES.
+        """
+        self.rules = RULES if rules is None else rules
+        self.hits = dict.fromkeys(self.rules, 0)
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how many times every rule was applied.
+        """
+        return {"peephole " + name: hits for name, hits in self.hits.items()}
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the rewritten commands.
+        """
+        out = []
+        for position, command in enumerate(commands, 1):
+            out.append(command)
+            rewritten = True
+            while rewritten:
+                rewritten = False
+                for name, (size, rule) in self.rules.items():
+                    if len(out) < size:
+                        continue
+                    replacement = rule(out[-size:], commands, position)
+                    if replacement is not None:
+                        out[-size:] = replacement
+                        self.hits[name] += 1
+                        rewritten = True
+                        break
+        return out
@@ -0,0 +1,102 @@
+"""
+Removes the reloads of pointer 1 with an address it already holds.
+"""
+import typing
+
+BINARY = {"add", "sub", "and", "or", "eq", "gt", "lt"}
+UNARY = {"neg", "not", "shiftleft", "shiftright"}
+# Segments whose slots are plain variables: their value only changes when
+# they are popped to.
+VARIABLE_SEGMENTS = {"local", "argument", "static", "temp"}
+THAT_POINTER = ("pop", "pointer", 1)
+
+
+class PointerReuse:
+    """Removes the "pop pointer 1" of an array access when pointer 1 already
+    holds the same address, e.g. in "let a[i] = a[i] + 1".
+
+    Addresses are numbered by the commands that compute them, which may only
+    read constants and variables, so two addresses computed the same way
+    are equal as long as none of their variables is stored to in between.
+    What pointer 1 holds is forgotten at labels, jumps and calls, and when
+    anything else is popped into it. When an address that is already in
+    pointer 1 is popped into it again, both the pop and the commands that
+    computed the address are removed, even if the address was computed
+    earlier and left on the stack, as the target of an array assignment is.
+    """
+
+    def __init__(self) -> None:
+        self.removed = {}  # function -> reloads removed
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: the pointer 1 reloads removed, in total
+            and for every function that had some.
+        """
+        stats = {"that reloads removed": sum(self.removed.values())}
+        for function, removed in self.removed.items():
+            stats["that reloads removed: " + function] = removed
+        return stats
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands without the redundant reloads.
+        """
+        function = commands[0][1] if commands and \
+            commands[0][0] == "function" else None
+        out = []
+        # Every value on the stack: (start in out, the commands that compute
+        # it or None, the index of the command that started it).
+        stack = []
+        stored = {}  # slot -> the index of the last command that popped it
+        that = None  # the commands of the address in pointer 1
+        for index, command in enumerate(commands):
+            operation = command[0]
+            if operation == "push":
+                pure = command[1] == "constant" or \
+                    command[1] in VARIABLE_SEGMENTS
+                stack.append((len(out), (command,) if pure else None, index))
+            elif operation in BINARY and len(stack) >= 2:
+                second, first = stack.pop(), stack.pop()
+                key = first[1] + second[1] + (command,) \
+                    if first[1] and second[1] else None
+                stack.append((first[0], key, first[2]))
+            elif operation in UNARY and stack:
+                first = stack.pop()
+                key = first[1] + (command,) if first[1] else None
+                stack.append((first[0], key, first[2]))
+            elif command == THAT_POINTER and stack:
+                start, key, born = stack.pop()
+                # The address is only known if its variables still hold the
+                # values it was computed from.
+                if key and any(stored.get(push[1:], -1) > born
+                               for push in key if push[0] == "push"):
+                    key = None
+                if key and key == that and \
+                        out[start:start + len(key)] == list(key):
+                    del out[start:start + len(key)]
+                    self.removed[function] = self.removed.get(function, 0) + 1
+                    continue
+                that = key
+            elif operation == "pop":
+                if stack:
+                    stack.pop()
+                stored[command[1:]] = index
+                if command == THAT_POINTER or \
+                        that and ("push",) + command[1:] in that:
+                    that = None
+            elif operation == "call":
+                del stack[max(len(stack) - command[2], 0):]
+                stack.append((len(out), None, index))
+                that = None
+            else:
+                # Labels, jumps and anything the stack cannot follow.
+                stack = []
+                that = None
+            out.append(command)
+        return out
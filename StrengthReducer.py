@@ -0,0 +1,203 @@
+"""
+Replaces multiplications and divisions by constants with shifts, adds
+and negations.
+"""
+import typing
+from ConstantFolder import constant_before
+
+MULTIPLY = ("call", "Math.multiply", 2)
+DIVIDE = ("call", "Math.divide", 2)
+BINARY = {"add", "sub", "and", "or", "eq", "gt", "lt"}
+UNARY = {"neg", "not", "shiftleft", "shiftright"}
+ENDS_EXPRESSION = {"label", "goto", "if-goto", "function", "return"}
+# The slot that a push reads a value from, when that value was popped into
+# it earlier in the same expression, e.g. "pop pointer 1; push that 0" for
+# a[i] reads the value of the address a + i.
+POPPED_SLOTS = {
+    "temp": lambda index: ("temp", index),
+    "pointer": lambda index: ("pointer", index),
+    "that": lambda index: ("pointer", 1)
+}
+# The longest add chain that replaces a multiplication, in VM commands. A
+# call to Math.multiply runs a 16 iteration loop, so this is still far
+# cheaper, but it keeps the code from growing too much.
+MAX_CHAIN = 8
+
+
+def power_of_two(value: int) -> typing.Optional[int]:
+    """
+    Args:
+        value (int): a positive integer.
+
+    Returns:
+        typing.Optional[int]: k if the value is 2 ** k, otherwise None.
+    """
+    if value > 0 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
+class StrengthReducer:
+    """Replaces the calls to Math.multiply and Math.divide that have a
+    constant operand by cheaper commands:
+
+    - x * 0 is 0, x * 1 and x / 1 are x, x * -1 and x / -1 are -x.
+    - x * 2 ** k is x shifted left k times, as Hack words wrap the same way
+      the product does.
+    - x / 2 ** k is x shifted right k times, but only when x is known to be
+      non-negative: Math.divide truncates towards zero, a shift does not.
+    - with add_chains, x * c for other small constants is an add chain,
+      e.g. x * 5 is (x << 2) + x.
+    """
+
+    def __init__(self, add_chains: bool = False) -> None:
+        """Creates a new reducer.
+
+        Args:
+            add_chains (bool): also replace multiplications by constants that
+            are not powers of two with add chains, which are faster but
+            longer than the call.
+        """
+        self.add_chains = add_chains
+        self.reduced = 0
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how many calls were reduced.
+        """
+        return {"operations reduced": self.reduced}
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands with the multiplications and
+            divisions by constants reduced.
+        """
+        out = []
+        # For every value on the stack: the index in out where the commands
+        # that compute it start, or None if unknown, and whether it is known
+        # to be non-negative.
+        stack = []
+        popped = {}  # a slot -> the start of the value popped into it
+        for command in commands:
+            start = len(out)
+            operation = command[0]
+            if command in (MULTIPLY, DIVIDE) and len(stack) >= 2 and \
+                    None not in (stack[-2][0], stack[-1][0]):
+                (first, first_sign), (second, second_sign) = stack[-2:]
+                reduced = self.reduce(out, first, second,
+                                      command == MULTIPLY, first_sign)
+                if reduced is not None:
+                    del stack[-2:]
+                    del out[first:]
+                    out.extend(reduced)
+                    stack.append((first, command == DIVIDE and
+                                  first_sign and second_sign))
+                    self.reduced += 1
+                    continue
+
+            if operation in ENDS_EXPRESSION:
+                stack = []
+                popped = {}
+            elif operation == "push":
+                if command[1] in POPPED_SLOTS:
+                    start = popped.get(
+                        POPPED_SLOTS[command[1]](command[2]), start)
+                stack.append((start, command[1] == "constant"))
+            elif operation == "pop":
+                value = stack.pop() if stack else (None, False)
+                popped[command[1:]] = value[0]
+            elif operation in UNARY:
+                if stack:
+                    sign = operation == "shiftright" and stack[-1][1]
+                    stack[-1] = (stack[-1][0], sign)
+            elif operation in BINARY:
+                second = stack.pop() if stack else (None, False)
+                first = stack.pop() if stack else (None, False)
+                sign = operation == "and" and (first[1] or second[1])
+                stack.append((None if None in (first[0], second[0])
+                              else first[0], sign))
+            elif operation == "call":
+                bottom = max(len(stack) - command[2], 0)
+                arguments = stack[bottom:]
+                del stack[bottom:]
+                if not arguments:
+                    first = start if command[2] == 0 else None
+                else:
+                    first = arguments[0][0]
+                    if len(arguments) < command[2] or \
+                            any(value[0] is None for value in arguments):
+                        first = None
+                sign = command == DIVIDE and len(arguments) == 2 and \
+                    all(value[1] for value in arguments)
+                stack.append((first, sign))
+            out.append(command)
+        return out
+
+    def reduce(self, out: typing.List[tuple], first: int, second: int,
+               multiply: bool, non_negative: bool) \
+            -> typing.Optional[typing.List[tuple]]:
+        """
+        Args:
+            out (typing.List[tuple]): the commands so far, ending with the
+            two operands.
+            first (int): the index in out where the first operand starts.
+            second (int): the index in out where the second operand starts.
+            multiply (bool): True for a multiplication, False for a
+            division.
+            non_negative (bool): whether the first operand is known to be
+            non-negative.
+
+        Returns:
+            typing.Optional[typing.List[tuple]]: the commands that replace
+            out[first:] and the call, or None to keep the call.
+        """
+        right = constant_before(out, len(out))
+        left = constant_before(out, second)
+        if right and right[1] == second and not (left and left[1] == first):
+            constant = right[0]
+            operand = out[first:second]
+        elif multiply and left and left[1] == first:
+            constant = left[0]
+            operand = out[second:]
+        else:
+            return None
+
+        if constant in (1, -1):
+            return operand + ([("neg",)] if constant < 0 else [])
+        if not multiply:
+            shifts = power_of_two(constant)
+            if shifts is None or not non_negative:
+                return None
+            return operand + [("shiftright",)] * shifts
+        if constant == 0:
+            if all(command[0] != "call" for command in operand):
+                return [("push", "constant", 0)]
+            return operand + [("pop", "temp", 0), ("push", "constant", 0)]
+        if constant == -0x8000:
+            return None
+
+        shifts = power_of_two(abs(constant))
+        if shifts is not None:
+            chain = [("shiftleft",)] * shifts
+        elif self.add_chains:
+            # Horner's rule over the bits of the constant, from the top.
+            if len(operand) == 1:
+                copy = operand
+                chain = []
+            else:
+                copy = [("push", "temp", 0)]
+                chain = [("pop", "temp", 0), ("push", "temp", 0)]
+            for bit in bin(abs(constant))[3:]:
+                chain.append(("shiftleft",))
+                if bit == "1":
+                    chain.extend(copy + [("add",)])
+            if len(chain) > MAX_CHAIN:
+                return None
+        else:
+            return None
+        return operand + chain + ([("neg",)] if constant < 0 else [])
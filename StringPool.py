@@ -0,0 +1,162 @@
+"""
+Builds every distinct string constant of a class once and keeps it in a
+static slot, for --string-pool.
+"""
+import typing
+from VMWriter import format_command
+
+# ':' is legal in VM names but not in Jack identifiers, so the initializer
+# can never clash with a subroutine of the class.
+INITIALIZER = "{}.strings:init"
+READY_LABEL = "STRINGS_READY"
+# The static segment is RAM[16] to RAM[255], right below the stack.
+STATIC_SLOTS = 240
+
+
+def string_commands(literal: str) -> typing.List[tuple]:
+    """
+    Args:
+        literal (str): the contents of a string constant.
+
+    Returns:
+        typing.List[tuple]: the commands that build the string on the heap.
+    """
+    commands = [("push", "constant", len(literal)),
+                ("call", "String.new", 1)]
+    for char in literal:
+        commands.append(("push", "constant", ord(char)))
+        commands.append(("call", "String.appendChar", 2))
+    return commands
+
+
+def code_size(commands: typing.Iterable[tuple]) -> int:
+    """
+    Args:
+        commands (typing.Iterable[tuple]): VM commands.
+
+    Returns:
+        int: the size of the commands as VM code, in bytes.
+    """
+    return sum(len(format_command(command)) for command in commands)
+
+
+class StringPool:
+    """Builds every distinct string constant of a class once, instead of
+    every time it is evaluated.
+
+    The strings live in static slots reserved after the class's own statics,
+    and are built by a generated initializer function. Every subroutine that
+    uses them starts with a guard that calls the initializer if the first
+    slot is still null, and every use is a single "push static". Pooled
+    strings are shared, so a program that changes or disposes of a string
+    constant sees the change at its other uses too. The class's statics and
+    its pooled strings must fit in the static segment together, and the
+    strings that do not fit are built where they are used, as without the
+    pool.
+
+    The pool is also a pass for VMWriter, which inserts the guards.
+    """
+
+    def __init__(self) -> None:
+        """Creates a new, empty pool."""
+        self.class_name = None
+        self.first_static = 0
+        self.literals = {}  # a literal -> its static slot
+        self.inline_size = 0
+        self.pooled_size = 0
+        self.pooled = 0
+        self.unpooled = 0
+
+    def start_class(self, class_name: str, first_static: int) -> None:
+        """Starts the pool of a new class.
+
+        Args:
+            class_name (str): the name of the class.
+            first_static (int): the first static slot that the class itself
+            does not use.
+        """
+        self.class_name = class_name
+        self.first_static = first_static
+        self.literals = {}
+
+    def can_pool(self, literal: str) -> bool:
+        """
+        Args:
+            literal (str): the contents of a string constant.
+
+        Returns:
+            bool: True if the string is in the pool or there is a static
+            slot left for it, False if it has to be built where it is used.
+        """
+        if literal in self.literals or \
+                self.first_static + len(self.literals) < STATIC_SLOTS:
+            return True
+        self.unpooled += 1
+        return False
+
+    def static_index(self, literal: str) -> int:
+        """
+        Args:
+            literal (str): the contents of a string constant.
+
+        Returns:
+            int: the static slot that holds the string.
+        """
+        if literal not in self.literals:
+            self.literals[literal] = self.first_static + len(self.literals)
+        index = self.literals[literal]
+        self.inline_size += code_size(string_commands(literal))
+        self.pooled_size += code_size([("push", "static", index)])
+        return index
+
+    def write_initializer(self, writer: "VMWriter") -> None:
+        """Writes the function that builds the strings of the class, if it
+        has any.
+
+        Args:
+            writer (VMWriter): the writer of the class.
+        """
+        if not self.literals:
+            return
+        commands = [("function", INITIALIZER.format(self.class_name), 0)]
+        # The first slot is what the guards check, so it is set last.
+        for literal, index in sorted(self.literals.items(),
+                                     key=lambda item: -item[1]):
+            commands.extend(string_commands(literal))
+            commands.append(("pop", "static", index))
+        commands.extend([("push", "constant", 0), ("return",)])
+        writer.write_commands(commands)
+        self.pooled_size += code_size(commands)
+        self.pooled += len(self.literals)
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """Adds the guard to a subroutine that uses the pool.
+
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands, with the guard after the
+            function command if needed.
+        """
+        if not any(command[:2] == ("push", "static") and
+                   command[2] >= self.first_static for command in commands):
+            return commands
+        guard = [("push", "static", self.first_static),
+                 ("if-goto", READY_LABEL),
+                 ("call", INITIALIZER.format(self.class_name), 0),
+                 ("pop", "temp", 0),
+                 ("label", READY_LABEL)]
+        self.pooled_size += code_size(guard)
+        return commands[:1] + guard + commands[1:]
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how many strings were pooled, how many
+            bytes of VM code that saved, and how many string constants were
+            built where they are used for lack of static slots.
+        """
+        return {"strings pooled": self.pooled,
+                "string bytes saved": self.inline_size - self.pooled_size,
+                "strings left unpooled": self.unpooled}
@@ -0,0 +1,198 @@
+"""
+Computes the repeated pure expressions of a basic block once.
+"""
+import typing
+
+BINARY = {"add", "sub", "and", "or", "eq", "gt", "lt"}
+UNARY = {"neg", "not", "shiftleft", "shiftright"}
+# Calls that only compute their result from their arguments.
+PURE_CALLS = {("call", "Math.multiply", 2), ("call", "Math.divide", 2)}
+# Temp 0 is the compiler's scratch slot and is never used for a value.
+CSE_SLOTS = range(1, 8)
+# A value that takes fewer commands to compute is cheaper to recompute than
+# to keep in a temp.
+MIN_SIZE = 3
+ENDS_BLOCK = {"label", "goto", "if-goto", "return", "function"}
+
+
+def number_values(block: typing.List[tuple]) \
+        -> typing.List[typing.Tuple[int, int, tuple]]:
+    """Gives every value a straight-line sequence of commands computes a
+    number, its key, such that two values with the same key are equal.
+
+    A key is built from the commands that computed the value. Every read of
+    a variable in it is tagged with the number of stores to the variable so
+    far, and every read of "this" or "that" with the number of stores to
+    memory and to the pointers. A call that is not pure may store to
+    statics and memory, so it counts as a store to all of them. The value of
+    an impure call has no key.
+
+    Args:
+        block (typing.List[tuple]): commands without labels or jumps.
+
+    Returns:
+        typing.List[typing.Tuple[int, int, tuple]]: the (start, end, key) of
+        every value that has a key, in the order they are completed.
+    """
+    values = []
+    stack = []  # (start, key) of every value on the stack
+    stores = {}  # variable -> how many times it was stored to
+    memory = 0  # how many times memory or a pointer was stored to
+    impure = 0
+    for index, command in enumerate(block):
+        operation = command[0]
+        if operation == "push":
+            segment = command[1]
+            if segment in {"this", "that"}:
+                key = command + (memory,)
+            elif segment == "static":
+                key = command + (stores.get(command[1:], 0), impure)
+            else:
+                key = command + (stores.get(command[1:], 0),)
+            stack.append((index, key))
+        elif (operation in BINARY or command in PURE_CALLS) and \
+                len(stack) >= 2:
+            second, first = stack.pop(), stack.pop()
+            key = (command, first[1], second[1]) \
+                if first[1] and second[1] else None
+            stack.append((first[0], key))
+        elif operation in UNARY and stack:
+            first = stack.pop()
+            stack.append((first[0], (command, first[1]) if first[1] else None))
+        elif operation == "call":
+            arguments = [stack.pop() for _ in range(min(command[2],
+                                                        len(stack)))]
+            stack.append((arguments[-1][0] if arguments else index, None))
+            impure += 1
+            memory += 1
+            continue
+        elif operation == "pop":
+            if stack:
+                stack.pop()
+            if command[1] in {"this", "that", "pointer"}:
+                memory += 1
+            else:
+                stores[command[1:]] = stores.get(command[1:], 0) + 1
+            continue
+        else:
+            stack = []
+            continue
+        if stack[-1][1]:
+            values.append((stack[-1][0], index + 1, stack[-1][1]))
+    return values
+
+
+class SubexpressionEliminator:
+    """Computes every repeated pure expression of a basic block once.
+
+    Variable reads, constants, arithmetic, Math.multiply and Math.divide are
+    pure, every other call is not, and its result is never reused. The
+    first time a repeated expression is computed, its value is also kept in
+    a temp that the subroutine does not use, and the repeats read the temp
+    instead. The callee of any call, pure or not, may use that temp too, so
+    a value is only reused while no call runs in between. The largest
+    repeated expressions are reused first.
+    """
+
+    def __init__(self) -> None:
+        self.reused = 0
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: how many repeated expressions were
+            replaced by a temp.
+        """
+        return {"subexpressions reused": self.reused}
+
+    def run(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Args:
+            commands (typing.List[tuple]): the commands of one subroutine.
+
+        Returns:
+            typing.List[tuple]: the commands, with every block rewritten.
+        """
+        used = {command[1:] for command in commands}
+        free = [slot for slot in CSE_SLOTS if ("temp", slot) not in used]
+        if not free:
+            return commands
+        out = []
+        start = 0
+        for index, command in enumerate(commands):
+            if command[0] in ENDS_BLOCK:
+                out.extend(self.rewrite(commands[start:index], free))
+                out.append(command)
+                start = index + 1
+        out.extend(self.rewrite(commands[start:], free))
+        return out
+
+    def rewrite(self, block: typing.List[tuple],
+                free: typing.List[int]) -> typing.List[tuple]:
+        """
+        Args:
+            block (typing.List[tuple]): commands without labels or jumps.
+            free (typing.List[int]): the temps that may hold values.
+
+        Returns:
+            typing.List[tuple]: the block with its repeats replaced.
+        """
+        groups = {}  # key -> the (start, end) of every occurrence
+        for start, end, key in number_values(block):
+            if end - start >= MIN_SIZE:
+                groups.setdefault(key, []).append((start, end))
+        if not any(len(occurrences) > 1 for occurrences in groups.values()):
+            return block
+        calls = [0]  # the number of calls before every command
+        for command in block:
+            calls.append(calls[-1] + (command[0] == "call"))
+
+        removed = []  # the (start, end) of every replaced occurrence
+        windows = {slot: [] for slot in free}  # slot -> (start, end) in use
+        saves = {}  # end of a first occurrence -> its slot
+        reads = {}  # start of a replaced occurrence -> (end, slot)
+        for occurrences in sorted(groups.values(), key=lambda occurrences: (
+                occurrences[0][0] - occurrences[0][1], occurrences[0][0])):
+            live = [(start, end) for start, end in occurrences
+                    if not any(outer_start <= start and end <= outer_end
+                               for outer_start, outer_end in removed)]
+            while len(live) >= 2:
+                # The first occurrence and its repeats before the next call,
+                # not counting the calls in the repeats, which are removed.
+                first = live[0]
+                repeats = []
+                for start, end in live[1:]:
+                    if calls[start] - calls[first[1]] != sum(
+                            calls[stop] - calls[begin]
+                            for begin, stop in repeats):
+                        break
+                    repeats.append((start, end))
+                live = live[len(repeats) + 1:]
+                if not repeats:
+                    continue
+                window = (first[1], repeats[-1][0])
+                slot = next((slot for slot in free if not any(
+                    start <= window[1] and window[0] <= end
+                    for start, end in windows[slot])), None)
+                if slot is None:
+                    continue
+                windows[slot].append(window)
+                saves.setdefault(first[1], []).append(slot)
+                for start, end in repeats:
+                    reads[start] = (end, slot)
+                    removed.append((start, end))
+                self.reused += len(repeats)
+
+        out = []
+        index = 0
+        while index < len(block):
+            if index in reads:
+                end, slot = reads[index]
+                out.append(("push", "temp", slot))
+                index = end
+            else:
+                out.append(block[index])
+                index += 1
+            for slot in saves.get(index, []):
+                out.extend([("pop", "temp", slot), ("push", "temp", slot)])
+        return out
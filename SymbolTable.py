@@ -7,40 +7,85 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
 
+# The VMWriter segment that holds the identifiers of every kind.
+SEGMENTS = {
+    "STATIC": "STATIC",
+    "FIELD": "THIS",
+    "ARG": "ARG",
+    "VAR": "LOCAL"
+}
+CLASS_KINDS = {"STATIC", "FIELD"}
+
+
+class Symbol:
+    """Everything the compiler knows about one identifier."""
+
+    __slots__ = ("name", "type", "kind", "index", "segment")
+
+    def __init__(self, name: str, type: str, kind: str, index: int) -> None:
+        """
+        Args:
+            name (str): the name of the identifier.
+            type (str): its type, e.g. "int" or a class name.
+            kind (str): "STATIC", "FIELD", "ARG" or "VAR".
+            index (int): its running index among the identifiers of its kind.
+        """
+        self.name = name
+        self.type = type
+        self.kind = kind
+        self.index = index
+        self.segment = SEGMENTS[kind]
+
 
 class SymbolTable:
     """A symbol table that associates names with information needed for Jack
-    compilation: type, kind and running index. The symbol table has two nested
-    scopes (class/subroutine).
+    compilation: type, kind and running index. The symbol table is a chain of
+    nested scopes, the outermost one being the class scope.
+
+    All the visible identifiers are kept in a single dict, so resolving one
+    takes a single lookup. Every scope remembers the names it defined and
+    what they shadowed, so leaving it restores the outer definitions.
     """
 
     def __init__(self) -> None:
         """Creates a new empty symbol table."""
         # Your code goes here!
-
-        self.static_dict = {}
-        self.arg_dict = {}
-        self.field_dict = {}
-        self.var_dict = {}
-        # self.dict_of_dicts = {
-        #     "STATIC": self.static_dict,
-        #     "FIELD": self.field_dict,
-        #     "ARG": self.arg_dict,
-        #     "VAR": self.var_dict
-        # }
+        self.symbols = {}  # name -> the innermost visible Symbol
+        # For every scope, the names it defined and the symbols they shadowed.
+        self.scopes = []
+        self.counts = dict.fromkeys(SEGMENTS, 0)
+        self.start_scope()  # the class scope
+        self.start_scope()  # the subroutine scope
+
+    def start_scope(self) -> None:
+        """Starts a new scope, nested in the current one."""
+        self.scopes.append([])
+
+    def end_scope(self) -> None:
+        """Ends the current scope, its identifiers are no longer visible.
+        Indices are not reused, so the subroutine keeps a slot for each of
+        its local variables.
+        """
+        for name, shadowed in reversed(self.scopes.pop()):
+            if shadowed is None:
+                del self.symbols[name]
+            else:
+                self.symbols[name] = shadowed
 
     def start_subroutine(self) -> None:
-        """Starts a new subroutine scope (i.e., resets the subroutine's 
+        """Starts a new subroutine scope (i.e., resets the subroutine's
         symbol table).
         """
         # Your code goes here!
-
-        self.arg_dict = {}
-        self.var_dict = {}
+        while len(self.scopes) > 1:
+            self.end_scope()
+        self.start_scope()
+        self.counts["ARG"] = 0
+        self.counts["VAR"] = 0
 
     def define(self, name: str, type: str, kind: str) -> None:
-        """Defines a new identifier of a given name, type and kind and assigns 
-        it a running index. "STATIC" and "FIELD" identifiers have a class scope, 
+        """Defines a new identifier of a given name, type and kind and assigns
+        it a running index. "STATIC" and "FIELD" identifiers have a class scope,
         while "ARG" and "VAR" identifiers have a subroutine scope.
 
         Args:
@@ -50,17 +95,21 @@ class SymbolTable:
             "STATIC", "FIELD", "ARG", "VAR".
         """
         # Your code goes here!
-        # curr_dict = self.dict_of_dicts[kind]
-        if kind == "VAR":
-            self.var_dict[name] = (type, len(self.var_dict))
-        if kind == "ARG":
-            self.arg_dict[name] = (type, len(self.arg_dict))
-        if kind == "STATIC":
-            self.static_dict[name] = (type, len(self.static_dict))
-        if kind == "FIELD":
-            self.field_dict[name] = (type, len(self.field_dict))
+        scope = self.scopes[0] if kind in CLASS_KINDS else self.scopes[-1]
+        scope.append((name, self.symbols.get(name)))
+        self.symbols[name] = Symbol(name, type, kind, self.counts[kind])
+        self.counts[kind] += 1
 
+    def resolve(self, name: str) -> typing.Optional[Symbol]:
+        """
+        Args:
+            name (str): name of an identifier.
 
+        Returns:
+            typing.Optional[Symbol]: the innermost definition of the
+            identifier, or None if it is not defined.
+        """
+        return self.symbols.get(name)
 
     def var_count(self, kind: str) -> int:
         """
@@ -68,19 +117,11 @@ class SymbolTable:
             kind (str): can be "STATIC", "FIELD", "ARG", "VAR".
 
         Returns:
-            int: the number of variables of the given kind already defined in 
+            int: the number of variables of the given kind already defined in
             the current scope.
         """
         # Your code goes here!
-        if kind == "ARG":
-            return len(self.arg_dict)
-        if kind == "STATIC":
-            return len(self.static_dict)
-        if kind == "VAR":
-            return len(self.var_dict)
-        if kind == "FIELD":
-            return len(self.field_dict)
-
+        return self.counts[kind]
 
     def kind_of(self, name: str) -> str:
         """
@@ -92,15 +133,8 @@ class SymbolTable:
             if the identifier is unknown in the current scope.
         """
         # Your code goes here!
-        if name in self.var_dict.keys():
-            return "LOCAL"
-        if name in self.arg_dict.keys():
-            return "ARG"
-        if name in self.static_dict.keys():
-            return "STATIC"
-        if name in self.field_dict.keys():
-            return "THIS"
-        return "NONE"
+        symbol = self.symbols.get(name)
+        return symbol.segment if symbol else "NONE"
 
     def type_of(self, name: str) -> str:
         """
@@ -111,14 +145,8 @@ class SymbolTable:
             str: the type of the named identifier in the current scope.
         """
         # Your code goes here!
-        if name in self.var_dict.keys():
-            return self.var_dict[name][0]
-        if name in self.arg_dict.keys():
-            return self.arg_dict[name][0]
-        if name in self.static_dict.keys():
-            return self.static_dict[name][0]
-        if name in self.field_dict.keys():
-            return self.field_dict[name][0]
+        symbol = self.symbols.get(name)
+        return symbol.type if symbol else None
 
     def index_of(self, name: str) -> int:
         """
@@ -129,11 +157,5 @@ class SymbolTable:
             int: the index assigned to the named identifier.
         """
         # Your code goes here!
-        if name in self.var_dict.keys():
-            return self.var_dict[name][1]
-        if name in self.arg_dict.keys():
-            return self.arg_dict[name][1]
-        if name in self.static_dict.keys():
-            return self.static_dict[name][1]
-        if name in self.field_dict.keys():
-            return self.field_dict[name][1]
\ No newline at end of file
+        symbol = self.symbols.get(name)
+        return symbol.index if symbol else None
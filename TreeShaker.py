@@ -0,0 +1,91 @@
+"""
+Removes the subroutines of a compiled program that cannot be reached
+from its roots, for --tree-shake.
+"""
+import os
+import typing
+
+
+class TreeShaker:
+    """Removes the subroutines of a program that can never run.
+
+    The call graph is built from the "call" commands of every .vm file of the
+    program. Everything that is not reachable from the roots, by default
+    Main.main, is dropped from the files. Calls to subroutines that are not
+    part of the program, like the OS, are ignored.
+    """
+
+    def __init__(self, roots: typing.Iterable[str] = ("Main.main",)) -> None:
+        """
+        Args:
+            roots (typing.Iterable[str]): the subroutines that are always
+            kept, by full name, e.g. "Main.main".
+        """
+        self.roots = list(roots)
+        self.removed = []  # (name, instructions, bytes) of every removal
+        self.kept = 0
+
+    def shake(self, paths: typing.Iterable[str]) -> None:
+        """Rewrites the .vm files of a program without their unreachable
+        subroutines. Files that lose nothing are left untouched.
+
+        Args:
+            paths (typing.Iterable[str]): every .vm file of the program.
+        """
+        files = {}  # path -> [(name, lines)] in file order
+        calls = {}  # subroutine -> the subroutines it calls
+        for path in paths:
+            subroutines = []
+            with open(path) as vm_file:
+                for line in vm_file:
+                    words = line.split()
+                    if words and words[0] == "function":
+                        subroutines.append((words[1], []))
+                        calls[words[1]] = set()
+                    if not subroutines:
+                        continue
+                    subroutines[-1][1].append(line)
+                    if words and words[0] == "call":
+                        calls[subroutines[-1][0]].add(words[1])
+            files[path] = subroutines
+
+        reachable = set()
+        pending = [root for root in self.roots if root in calls]
+        while pending:
+            name = pending.pop()
+            if name in reachable:
+                continue
+            reachable.add(name)
+            pending.extend(callee for callee in calls[name]
+                           if callee in calls and callee not in reachable)
+
+        for path, subroutines in files.items():
+            kept = [lines for name, lines in subroutines
+                    if name in reachable]
+            self.kept += len(kept)
+            if len(kept) == len(subroutines):
+                continue
+            for name, lines in subroutines:
+                if name not in reachable:
+                    self.removed.append((name, len(lines),
+                                         sum(len(line) for line in lines)))
+            temp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(temp_path, "w") as vm_file:
+                vm_file.write("".join(line for lines in kept
+                                      for line in lines))
+            os.replace(temp_path, path)
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: what was removed, with the instructions and bytes saved.
+        """
+        lines = ["tree shaking: kept {} subroutines, removed {} "
+                 "({} instructions, {} bytes)".format(
+                     self.kept, len(self.removed),
+                     sum(removed[1] for removed in self.removed),
+                     sum(removed[2] for removed in self.removed))]
+        for name, instructions, size in sorted(self.removed):
+            lines.append("  removed {} ({} instructions, {} bytes)".format(
+                name, instructions, size))
+        return "\n".join(lines)
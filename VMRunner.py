@@ -0,0 +1,607 @@
+"""
+vmrun: runs the VM code of a program and counts the instructions and
+calls of every function.
+"""
+import argparse
+import array
+import math
+import os
+import sys
+import time
+import typing
+from Bytecode import load
+from IR import Instruction, Opcode, Segment
+
+# The operations of the predecoded program. A push or a pop is specialized
+# by how its address is found: a constant, a fixed address (static, temp
+# and pointer), or a base register and an offset (local, argument, this and
+# that). Labels are not operations, jumps go to the instruction after them.
+(PUSH_CONSTANT, PUSH_FIXED, PUSH_BASED, POP_FIXED, POP_BASED, ADD, SUB, NEG,
+ EQ, GT, LT, AND, OR, NOT, SHIFTLEFT, SHIFTRIGHT, GOTO, IF_GOTO, FUNCTION,
+ CALL, CALL_OS, RETURN) = range(22)
+ARITHMETIC = {
+    Opcode.ADD: ADD, Opcode.SUB: SUB, Opcode.NEG: NEG, Opcode.EQ: EQ,
+    Opcode.GT: GT, Opcode.LT: LT, Opcode.AND: AND, Opcode.OR: OR,
+    Opcode.NOT: NOT, Opcode.SHIFTLEFT: SHIFTLEFT,
+    Opcode.SHIFTRIGHT: SHIFTRIGHT, Opcode.RETURN: RETURN,
+}
+# The registers that hold the bases of the segments that have one.
+BASES = {Segment.LOCAL: 1, Segment.ARGUMENT: 2, Segment.THIS: 3,
+         Segment.THAT: 4}
+FIXED = {Segment.TEMP: 5, Segment.POINTER: 3}
+STATIC_BASE = 16
+STACK_BASE = 256
+HEAP_BASE = 2048
+HEAP_END = 16384
+# The characters of the Jack character set that are not ASCII.
+NEW_LINE = 128
+BACKSPACE = 129
+DOUBLE_QUOTE = 34
+
+
+class Halt(Exception):
+    """Raised by the stub of Sys.halt to stop the program."""
+
+
+def find_files(paths: typing.Iterable[str]) -> typing.List[str]:
+    """
+    Args:
+        paths (typing.Iterable[str]): .vm and .vmb files, and directories
+        of them.
+
+    Returns:
+        typing.List[str]: the files of the program. Of a .vm and a .vmb
+        file of the same class, the one written last.
+    """
+    files = {}  # class file name without extension -> path
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = [os.path.join(path, filename)
+                          for filename in sorted(os.listdir(path))]
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            filename, extension = os.path.splitext(candidate)
+            if extension.lower() not in {".vm", ".vmb"}:
+                continue
+            if filename not in files or \
+                    os.path.getmtime(candidate) > \
+                    os.path.getmtime(files[filename]):
+                files[filename] = candidate
+    return list(files.values())
+
+
+class VMRunner:
+    """Runs a VM program and counts the instructions every function
+    executes and the calls it gets, and how deep the stack got.
+
+    The files of the program are linked into a single predecoded program,
+    kept in arrays: every instruction is an operation, its argument and,
+    for some, a second argument, with the addresses of static variables,
+    the targets of jumps and the functions called resolved ahead of time.
+    RAM is an array of 16-bit words, like the Hack computer's.
+
+    The functions that the program calls but does not define are run by
+    native stubs of the OS: Math, Memory, Array, String, Output and Sys. A
+    call of a stub counts as one instruction, like any call, and the
+    instructions of the stub are not counted. The strings of the stubs are
+    kept outside of RAM, under the address of a block of the heap.
+    """
+
+    def __init__(self, files: typing.Iterable[
+            typing.Tuple[typing.List[str], typing.List[Instruction]]],
+                 memory: int = 32768) -> None:
+        """Links a program.
+
+        Args:
+            files (typing.Iterable[typing.Tuple[typing.List[str],
+            typing.List[Instruction]]]): the string table and the
+            instructions of every file of the program, as returned by
+            Bytecode.load().
+            memory (int): the number of words of RAM.
+
+        Raises:
+            RuntimeError: if the static variables of the program do not fit
+            below the stack.
+        """
+        self.ram = array.array("h", bytes(2 * memory))
+        self.operations = array.array("b")
+        self.arguments = array.array("l")
+        self.extras = array.array("l")
+        self.functions = []  # the names of the functions, by number
+        self.numbers = {}  # function name -> its number in functions
+        self.entries = {}  # function number -> its address
+        self.stubs = []  # (OS function number, stub), by CALL_OS argument
+        self.statics = {}  # (class name, index) -> address
+        self.output = []
+        self.heap = HEAP_BASE
+        self.sizes = {}  # heap block -> its size
+        self.free = {}  # size -> the free blocks of that size
+        self.strings = {}  # string -> its characters
+        self.capacities = {}  # string -> its maximum length
+        files = list(files)
+        # The address every instruction will have, and then every label and
+        # function, so that jumps and calls can be resolved in one pass.
+        address = 0
+        labels = {}  # (function, label) -> address
+        for names, instructions in files:
+            function = None
+            for instruction in instructions:
+                if instruction.opcode == Opcode.LABEL:
+                    labels[(function, names[instruction.operand])] = address
+                    continue
+                if instruction.opcode == Opcode.FUNCTION:
+                    function = names[instruction.operand]
+                    self.entries[self.number(function)] = address
+                address += 1
+        for names, instructions in files:
+            function = None
+            for instruction in instructions:
+                if instruction.opcode == Opcode.FUNCTION:
+                    function = names[instruction.operand]
+                if instruction.opcode != Opcode.LABEL:
+                    self.append(*self.predecode(instruction, names, function,
+                                                labels))
+        self.instructions = [0] * len(self.functions)
+        self.calls = [0] * len(self.functions)
+        # The most words on the stack, measured as every function starts.
+        self.max_depth = 0
+
+    def number(self, name: str) -> int:
+        """
+        Args:
+            name (str): the name of a function, of the program or not.
+
+        Returns:
+            int: its number, a new one if it was not seen yet.
+        """
+        if name not in self.numbers:
+            self.numbers[name] = len(self.functions)
+            self.functions.append(name)
+        return self.numbers[name]
+
+    def append(self, operation: int, argument: int = 0,
+               extra: int = 0) -> None:
+        self.operations.append(operation)
+        self.arguments.append(argument)
+        self.extras.append(extra)
+
+    def predecode(self, instruction: Instruction, names: typing.List[str],
+                  function: typing.Optional[str],
+                  labels: typing.Dict[tuple, int]) -> typing.Tuple[int, ...]:
+        """
+        Args:
+            instruction (Instruction): an instruction of the program.
+            names (typing.List[str]): the string table of its file.
+            function (typing.Optional[str]): the function it is in.
+            labels (typing.Dict[tuple, int]): the address of every label.
+
+        Returns:
+            typing.Tuple[int, ...]: its operation and arguments.
+        """
+        opcode, operand, index = instruction
+        if opcode in {Opcode.PUSH, Opcode.POP}:
+            if operand == Segment.CONSTANT:
+                return PUSH_CONSTANT, index
+            pushed = opcode == Opcode.PUSH
+            if operand in BASES:
+                return PUSH_BASED if pushed else POP_BASED, \
+                    BASES[operand], index
+            if operand == Segment.STATIC:
+                address = self.static_address(function, index)
+            else:
+                address = FIXED[operand] + index
+            return PUSH_FIXED if pushed else POP_FIXED, address
+        if opcode in {Opcode.GOTO, Opcode.IF_GOTO}:
+            return GOTO if opcode == Opcode.GOTO else IF_GOTO, \
+                labels[(function, names[operand])]
+        if opcode == Opcode.FUNCTION:
+            return FUNCTION, self.number(names[operand]), index
+        if opcode == Opcode.CALL:
+            number = self.number(names[operand])
+            if number in self.entries:
+                return CALL, number, index
+            self.stubs.append((number, self.stub(names[operand])))
+            return CALL_OS, len(self.stubs) - 1, index
+        return ARITHMETIC[opcode],
+
+    def static_address(self, function: typing.Optional[str],
+                       index: int) -> int:
+        """
+        Args:
+            function (typing.Optional[str]): the function that uses the
+            static variable, which belongs to its class.
+            index (int): the index of the variable in the class.
+
+        Returns:
+            int: the address of the variable, a new one if it was not seen
+            yet.
+
+        Raises:
+            RuntimeError: if the program has more static variables than fit
+            below the stack.
+        """
+        key = (function.split(".")[0] if function else "", index)
+        if key not in self.statics:
+            if STATIC_BASE + len(self.statics) >= STACK_BASE:
+                raise RuntimeError(
+                    "more than {} static variables".format(
+                        STACK_BASE - STATIC_BASE))
+            self.statics[key] = STATIC_BASE + len(self.statics)
+        return self.statics[key]
+
+    def stub(self, name: str) -> typing.Callable[..., typing.Any]:
+        """
+        Args:
+            name (str): the name of an OS function, e.g. "Math.multiply".
+
+        Returns:
+            typing.Callable[..., typing.Any]: its stub, which takes the
+            arguments of the call. An OS function without a stub is an
+            error only once it is called.
+        """
+        class_name, _, subroutine = name.partition(".")
+        stub = getattr(self, "{}_{}".format(class_name.lower(), subroutine),
+                       None)
+        if stub is not None:
+            return stub
+        if subroutine == "init":
+            return lambda: 0
+
+        def missing(*args):
+            raise RuntimeError("no stub for the OS function " + name)
+        return missing
+
+    def run(self, entry: typing.Optional[str] = None,
+            limit: int = 1000000000) -> str:
+        """Runs the program until its entry returns or Sys.halt is called.
+
+        Args:
+            entry (typing.Optional[str]): the function to start with. By
+            default Sys.init if the program has it, Main.main otherwise.
+            limit (int): the most instructions to execute, checked at
+            every jump and call.
+
+        Returns:
+            str: what the program printed.
+        """
+        if entry is None:
+            entry = "Sys.init" if self.numbers.get("Sys.init") in \
+                self.entries else "Main.main"
+        if self.numbers.get(entry) not in self.entries:
+            raise RuntimeError("the program has no function " + entry)
+        ram = self.ram
+        operations, arguments, extras = \
+            self.operations, self.arguments, self.extras
+        entries, stubs = self.entries, self.stubs
+        instructions, calls = self.instructions, self.calls
+        # The function running, and the functions that called it with the
+        # addresses they resume at, which do not fit in a word of RAM in
+        # big programs. The return address in a frame is left 0. The
+        # instructions of a function are counted in bulk, from the count
+        # the last time it started or resumed running.
+        current = self.numbers[entry]
+        callers = []
+        executed = mark = 0
+        ram[2] = STACK_BASE
+        ram[1] = sp = deepest = STACK_BASE + 5
+        calls[current] += 1
+        pc = entries[current]
+        try:
+            while True:
+                operation = operations[pc]
+                executed += 1
+                if operation == PUSH_BASED:
+                    ram[sp] = ram[ram[arguments[pc]] + extras[pc]]
+                    sp += 1
+                elif operation == PUSH_CONSTANT:
+                    ram[sp] = arguments[pc]
+                    sp += 1
+                elif operation == POP_BASED:
+                    sp -= 1
+                    ram[ram[arguments[pc]] + extras[pc]] = ram[sp]
+                elif operation == PUSH_FIXED:
+                    ram[sp] = ram[arguments[pc]]
+                    sp += 1
+                elif operation == POP_FIXED:
+                    sp -= 1
+                    ram[arguments[pc]] = ram[sp]
+                elif operation == ADD:
+                    sp -= 1
+                    ram[sp - 1] = (ram[sp - 1] + ram[sp] + 0x8000
+                                   & 0xFFFF) - 0x8000
+                elif operation == IF_GOTO:
+                    sp -= 1
+                    if ram[sp]:
+                        pc = arguments[pc]
+                        if executed > limit:
+                            break
+                        continue
+                elif operation == GOTO:
+                    pc = arguments[pc]
+                    if executed > limit:
+                        break
+                    continue
+                elif operation == LT:
+                    sp -= 1
+                    ram[sp - 1] = -(ram[sp - 1] < ram[sp])
+                elif operation == GT:
+                    sp -= 1
+                    ram[sp - 1] = -(ram[sp - 1] > ram[sp])
+                elif operation == EQ:
+                    sp -= 1
+                    ram[sp - 1] = -(ram[sp - 1] == ram[sp])
+                elif operation == SUB:
+                    sp -= 1
+                    ram[sp - 1] = (ram[sp - 1] - ram[sp] + 0x8000
+                                   & 0xFFFF) - 0x8000
+                elif operation == NOT:
+                    ram[sp - 1] = ~ram[sp - 1]
+                elif operation == AND:
+                    sp -= 1
+                    ram[sp - 1] &= ram[sp]
+                elif operation == OR:
+                    sp -= 1
+                    ram[sp - 1] |= ram[sp]
+                elif operation == NEG:
+                    ram[sp - 1] = (0x8000 - ram[sp - 1] & 0xFFFF) - 0x8000
+                elif operation == SHIFTLEFT:
+                    ram[sp - 1] = (ram[sp - 1] * 2 + 0x8000 & 0xFFFF) - 0x8000
+                elif operation == SHIFTRIGHT:
+                    ram[sp - 1] >>= 1
+                elif operation == CALL:
+                    callee = arguments[pc]
+                    ram[sp] = 0
+                    ram[sp + 1] = ram[1]
+                    ram[sp + 2] = ram[2]
+                    ram[sp + 3] = ram[3]
+                    ram[sp + 4] = ram[4]
+                    ram[2] = sp - extras[pc]
+                    sp += 5
+                    ram[1] = sp
+                    instructions[current] += executed - mark
+                    mark = executed
+                    callers.append((current, pc + 1))
+                    current = callee
+                    calls[callee] += 1
+                    pc = entries[callee]
+                    if executed > limit:
+                        break
+                    continue
+                elif operation == FUNCTION:
+                    for _ in range(extras[pc]):
+                        ram[sp] = 0
+                        sp += 1
+                    if sp > deepest:
+                        deepest = sp
+                elif operation == RETURN:
+                    frame = ram[1]
+                    argument = ram[2]
+                    ram[argument] = ram[sp - 1]
+                    sp = argument + 1
+                    ram[4] = ram[frame - 1]
+                    ram[3] = ram[frame - 2]
+                    ram[2] = ram[frame - 3]
+                    ram[1] = ram[frame - 4]
+                    instructions[current] += executed - mark
+                    mark = executed
+                    if not callers:
+                        break
+                    current, pc = callers.pop()
+                    continue
+                elif operation == CALL_OS:
+                    number, stub = stubs[arguments[pc]]
+                    calls[number] += 1
+                    n_args = extras[pc]
+                    sp -= n_args
+                    ram[0] = sp
+                    value = stub(*ram[sp:sp + n_args]) or 0
+                    ram[sp] = (value + 0x8000 & 0xFFFF) - 0x8000
+                    sp += 1
+                pc += 1
+        except Halt:
+            pass
+        finally:
+            ram[0] = sp
+            instructions[current] += executed - mark
+            self.max_depth = max(self.max_depth, deepest - STACK_BASE)
+        if executed > limit:
+            raise RuntimeError("more than {} instructions".format(limit))
+        return "".join(self.output)
+
+    def profile(self) -> typing.List[typing.Tuple[str, int, int]]:
+        """
+        Returns:
+            typing.List[typing.Tuple[str, int, int]]: the name, the
+            instructions executed and the calls of every function that was
+            called, the busiest first.
+        """
+        return sorted(
+            ((name, self.instructions[number], self.calls[number])
+             for number, name in enumerate(self.functions)
+             if self.calls[number]),
+            key=lambda row: (-row[1], -row[2], row[0]))
+
+    # The stubs of the OS, named after the class, in lower case, and the
+    # function.
+
+    def math_multiply(self, x: int, y: int) -> int:
+        return x * y
+
+    def math_divide(self, x: int, y: int) -> int:
+        if y == 0:
+            raise RuntimeError("division by zero")
+        quotient = abs(x) // abs(y)
+        return quotient if (x < 0) == (y < 0) else -quotient
+
+    def math_abs(self, x: int) -> int:
+        return abs(x)
+
+    def math_min(self, x: int, y: int) -> int:
+        return min(x, y)
+
+    def math_max(self, x: int, y: int) -> int:
+        return max(x, y)
+
+    def math_sqrt(self, x: int) -> int:
+        if x < 0:
+            raise RuntimeError("square root of a negative number")
+        return math.isqrt(x)
+
+    def memory_peek(self, address: int) -> int:
+        return self.ram[address]
+
+    def memory_poke(self, address: int, value: int) -> None:
+        self.ram[address] = value
+
+    def memory_alloc(self, size: int) -> int:
+        size = max(size, 1)
+        if self.free.get(size):
+            block = self.free[size].pop()
+        else:
+            block = self.heap
+            if block + size > HEAP_END:
+                raise RuntimeError("out of heap memory")
+            self.heap += size
+            self.sizes[block] = size
+        for address in range(block, block + size):
+            self.ram[address] = 0
+        return block
+
+    def memory_deAlloc(self, block: int) -> None:
+        if block not in self.sizes:
+            raise RuntimeError("{} is not a block of the heap".format(block))
+        self.strings.pop(block, None)
+        self.free.setdefault(self.sizes[block], []).append(block)
+
+    def array_new(self, size: int) -> int:
+        return self.memory_alloc(size)
+
+    def array_dispose(self, this: int) -> None:
+        self.memory_deAlloc(this)
+
+    def string_new(self, max_length: int) -> int:
+        string = self.memory_alloc(1)
+        self.strings[string] = []
+        self.capacities[string] = max_length
+        return string
+
+    def string_dispose(self, this: int) -> None:
+        self.memory_deAlloc(this)
+
+    def string_length(self, this: int) -> int:
+        return len(self.strings[this])
+
+    def string_charAt(self, this: int, index: int) -> int:
+        return self.strings[this][index]
+
+    def string_setCharAt(self, this: int, index: int, character: int) -> None:
+        self.strings[this][index] = character
+
+    def string_appendChar(self, this: int, character: int) -> int:
+        if len(self.strings[this]) >= self.capacities[this]:
+            raise RuntimeError("string is full")
+        self.strings[this].append(character)
+        return this
+
+    def string_eraseLastChar(self, this: int) -> None:
+        self.strings[this].pop()
+
+    def string_intValue(self, this: int) -> int:
+        digits = "".join(map(chr, self.strings[this]))
+        sign = -1 if digits.startswith("-") else 1
+        value = 0
+        for digit in digits[sign < 0:]:
+            if not digit.isdigit():
+                break
+            value = value * 10 + int(digit)
+        return sign * value
+
+    def string_setInt(self, this: int, value: int) -> None:
+        self.strings[this][:] = map(ord, str(value))
+
+    def string_newLine(self) -> int:
+        return NEW_LINE
+
+    def string_backSpace(self) -> int:
+        return BACKSPACE
+
+    def string_doubleQuote(self) -> int:
+        return DOUBLE_QUOTE
+
+    def output_printChar(self, character: int) -> None:
+        self.output.append("\n" if character == NEW_LINE else
+                           "\b" if character == BACKSPACE else
+                           chr(character))
+
+    def output_printString(self, string: int) -> None:
+        for character in self.strings[string]:
+            self.output_printChar(character)
+
+    def output_printInt(self, value: int) -> None:
+        self.output.append(str(value))
+
+    def output_println(self) -> None:
+        self.output.append("\n")
+
+    def output_backSpace(self) -> None:
+        self.output.append("\b")
+
+    def output_moveCursor(self, row: int, column: int) -> None:
+        pass
+
+    def sys_halt(self) -> None:
+        raise Halt()
+
+    def sys_error(self, code: int) -> None:
+        raise RuntimeError("Sys.error({})".format(code))
+
+    def sys_wait(self, duration: int) -> None:
+        pass
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="vmrun",
+        description="Runs the VM code of a program and reports the "
+                    "instructions it executed.")
+    parser.add_argument("input_paths", nargs="+", metavar="input_path",
+                        help="a .vm or .vmb file, or a directory of them")
+    parser.add_argument(
+        "--entry",
+        help="the function to start with (default: Sys.init if the program "
+             "has it, Main.main otherwise)")
+    parser.add_argument(
+        "--limit", type=int, default=1000000000,
+        help="give up once more than this many instructions ran, checked "
+             "at every jump and call (default: 1000000000)")
+    parser.add_argument(
+        "--profile", type=int, nargs="?", const=20, metavar="N",
+        help="report the instructions and the calls of the N busiest "
+             "functions (default: 20)")
+    args = parser.parse_args()
+    paths = find_files(args.input_paths)
+    if not paths:
+        parser.error("no .vm or .vmb files found")
+    try:
+        runner = VMRunner(load(path) for path in paths)
+    except RuntimeError as error:
+        print("vmrun: {}".format(error), file=sys.stderr)
+        sys.exit(1)
+    start = time.perf_counter()
+    try:
+        sys.stdout.write(runner.run(args.entry, args.limit))
+    except RuntimeError as error:
+        sys.stdout.write("".join(runner.output))
+        print("vmrun: {}".format(error), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        elapsed = time.perf_counter() - start
+        executed = sum(runner.instructions)
+        print("{} instructions, {} calls in {:.3f}s ({:.0f} "
+              "instructions/s)".format(
+                  executed, sum(runner.calls), elapsed,
+                  executed / elapsed if elapsed else 0), file=sys.stderr)
+        for name, executed, called in runner.profile()[:args.profile or 0]:
+            print("{:>12} {:>10}  {}".format(executed, called, name),
+                  file=sys.stderr)
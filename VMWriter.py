@@ -24,17 +24,80 @@ SEGMENT_DICT = {
 }
 
 
+def format_command(command: tuple) -> str:
+    """
+    Args:
+        command (tuple): a VM command as buffered by VMWriter.
+
+    Returns:
+        str: the line of VM code of the command.
+    """
+    return " ".join(map(str, command)) + "\n"
+
+
+def parse_commands(text: str) -> typing.List[tuple]:
+    """
+    Args:
+        text (str): VM code, e.g. a .vm file of the OS.
+
+    Returns:
+        typing.List[tuple]: its commands as buffered by VMWriter, without
+        the comments.
+    """
+    commands = []
+    for line in text.split("\n"):
+        words = line.split("//")[0].split()
+        if words:
+            commands.append(tuple(int(word) if word.isdigit() else word
+                                  for word in words))
+    return commands
+
+
 class VMWriter:
     """
     Writes VM commands into a file. Encapsulates the VM command syntax.
+    Commands are buffered as tuples of their words, e.g.
+    ("push", "local", 0) or ("add",), and written to the file in one go on
+    flush(), which the compilation engine calls at the end of every
+    subroutine. Before that, the buffered subroutine goes through the
+    optimization passes, each an object whose run() method takes a list of
+    commands and returns the optimized list.
     """
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    def __init__(self, output_stream: typing.TextIO,
+                 passes: typing.Sequence = ()) -> None:
         """Creates a new file and prepares it for writing VM commands."""
         # Your code goes here!
         # Note that you can write to output_stream like so:
         # output_stream.write("Hello world! \n")
         self.out = output_stream
+        self.passes = passes
+        self.buffer = []
+
+    def flush(self) -> None:
+        """Optimizes the buffered commands and writes them to the output
+        stream.
+        """
+        if self.buffer:
+            commands = self.buffer
+            for optimization in self.passes:
+                commands = optimization.run(commands)
+            self.emit(commands)
+            self.buffer = []
+
+    def close(self) -> None:
+        """Writes the commands that are still buffered. Called once the
+        last command was written.
+        """
+        self.flush()
+
+    def emit(self, commands: typing.List[tuple]) -> None:
+        """Writes optimized commands to the output stream.
+
+        Args:
+            commands (typing.List[tuple]): the commands to write.
+        """
+        self.out.write("".join(map(format_command, commands)))
 
     def write_push(self, segment: str, index: int) -> None:
         """Writes a VM push command.
@@ -46,7 +109,7 @@ class VMWriter:
         """
         # Your code goes here!
         if segment in SEGMENTS:
-            self.out.write("push {} {}\n".format(SEGMENT_DICT[segment], index))
+            self.buffer.append(("push", SEGMENT_DICT[segment], index))
 
     def write_pop(self, segment: str, index: int) -> None:
         """Writes a VM pop command.
@@ -58,7 +121,7 @@ class VMWriter:
         """
         # Your code goes here!
         if segment in SEGMENTS:
-            self.out.write("pop {} {}\n".format(SEGMENT_DICT[segment], index))
+            self.buffer.append(("pop", SEGMENT_DICT[segment], index))
 
     def write_arithmetic(self, command: str) -> None:
         """Writes a VM arithmetic command.
@@ -69,7 +132,7 @@ class VMWriter:
         """
         # Your code goes here!
         if command in ARITHMETICS:
-            self.out.write("{}\n".format(command.lower()))
+            self.buffer.append((command.lower(),))
 
     def write_label(self, label: str) -> None:
         """Writes a VM label command.
@@ -78,7 +141,7 @@ class VMWriter:
             label (str): the label to write.
         """
         # Your code goes here!
-        self.out.write("label {}\n".format(label))
+        self.buffer.append(("label", label))
 
     def write_goto(self, label: str) -> None:
         """Writes a VM goto command.
@@ -87,7 +150,7 @@ class VMWriter:
             label (str): the label to go to.
         """
         # Your code goes here!
-        self.out.write("goto {}\n".format(label))
+        self.buffer.append(("goto", label))
 
     def write_if(self, label: str) -> None:
         """Writes a VM if-goto command.
@@ -96,7 +159,7 @@ class VMWriter:
             label (str): the label to go to.
         """
         # Your code goes here!
-        self.out.write("if-goto {}\n".format(label))
+        self.buffer.append(("if-goto", label))
 
     def write_call(self, name: str, n_args: int) -> None:
         """Writes a VM call command.
@@ -106,7 +169,7 @@ class VMWriter:
             n_args (int): the number of arguments the function receives.
         """
         # Your code goes here!
-        self.out.write("call {} {}\n".format(name, n_args))
+        self.buffer.append(("call", name, n_args))
 
     def write_function(self, name: str, n_locals: int) -> None:
         """Writes a VM function command.
@@ -116,9 +179,38 @@ class VMWriter:
             n_locals (int): the number of local variables the function uses.
         """
         # Your code goes here!
-        self.out.write("function {} {}\n".format(name, n_locals))
+        self.buffer.append(("function", name, n_locals))
+
+    def mark(self) -> int:
+        """
+        Returns:
+            int: the current position in the buffer, for cut().
+        """
+        return len(self.buffer)
+
+    def cut(self, mark: int) -> typing.List[tuple]:
+        """Takes back the commands written since a mark, so they can be
+        written again somewhere else, e.g. a loop's condition after its body.
+
+        Args:
+            mark (int): a position returned by mark().
+
+        Returns:
+            typing.List[tuple]: the commands written since the mark.
+        """
+        commands = self.buffer[mark:]
+        del self.buffer[mark:]
+        return commands
+
+    def write_commands(self, commands: typing.Iterable[tuple]) -> None:
+        """Writes commands that are already in the buffered form.
+
+        Args:
+            commands (typing.Iterable[tuple]): the commands to write.
+        """
+        self.buffer.extend(commands)
 
     def write_return(self) -> None:
         """Writes a VM return command."""
         # Your code goes here!
-        self.out.write("return\n")
+        self.buffer.append(("return",))
@@ -0,0 +1,80 @@
+"""
+Measures the Hack assembly of --asm against the two-step path, which
+compiles to VM code and translates every VM command on its own.
+
+Usage: python benchmarks/asm_bench.py [-O LEVEL] [program ...]
+
+A program is a directory of .jack files, by default every program of
+benchmarks/corpus. Both builds of a program are assembled and run in the
+Hack emulator, with the OS routines as Python stubs, and must print what
+VMRunner prints for the VM code. The ROM size and the cycles of both are reported.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus")
+sys.path.insert(0, ROOT)
+
+import Bytecode  # noqa: E402
+from AsmWriter import AsmWriter  # noqa: E402
+from ClassIndex import ClassIndex  # noqa: E402
+from JackCompiler import compile_file  # noqa: E402
+from VMRunner import VMRunner  # noqa: E402
+from VMWriter import parse_commands  # noqa: E402
+from hackemulator import HackEmulator  # noqa: E402
+from vmtranslator import VMTranslator  # noqa: E402
+
+
+def build(directory, asm, **options):
+    """Compiles a program to VM code or to assembly, returns the text."""
+    paths = sorted(glob.glob(os.path.join(directory, "*.jack")))
+    index = ClassIndex(directory)
+    index.update(paths)
+    output = io.StringIO()
+    if asm:
+        AsmWriter(output).write_runtime("Main.main")
+    for path in paths:
+        with open(path) as input_file:
+            compile_file(input_file, output, classes=index.classes(),
+                         asm=asm, **options)
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("programs", nargs="*", help="program directories")
+    parser.add_argument("-O", dest="opt_level", type=int, choices=range(3),
+                        default=1, help="optimization level (default: 1)")
+    args = parser.parse_args()
+    programs = args.programs or sorted(
+        glob.glob(os.path.join(CORPUS, "*", "")))
+
+    print("{:<12}{:<10}{:>10}{:>14}".format("program", "path", "ROM",
+                                            "cycles"))
+    for program in programs:
+        name = os.path.basename(os.path.normpath(program))
+        code = build(program, False, opt_level=args.opt_level)
+        commands = parse_commands(code)
+        reference = VMRunner([Bytecode.read(Bytecode.from_text(code))])
+        printed = reference.run("Main.main")
+        results = [
+            HackEmulator(VMTranslator("Main.main").translate(commands)),
+            HackEmulator(build(program, True,
+                               opt_level=args.opt_level).split("\n"))]
+        for label, emulator in zip(("two-step", "--asm"), results):
+            if emulator.run() != printed:
+                raise RuntimeError("{}: the {} output differs".format(
+                    name, label))
+            print("{:<12}{:<10}{:>10}{:>14}".format(
+                name, label, emulator.rom_size, emulator.cycles))
+        print("{:<22}{:>10.1%}{:>14.1%}".format(
+            "", results[1].rom_size / results[0].rom_size - 1,
+            results[1].cycles / results[0].cycles - 1))
+
+
+if __name__ == "__main__":
+    main()
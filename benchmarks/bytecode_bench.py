@@ -0,0 +1,99 @@
+"""
+Compares VM bytecode, .vmb, with VM code, .vm, in size and in the time it
+takes to write and to load.
+
+Usage: python benchmarks/bytecode_bench.py [--subroutines N] [program ...]
+
+A program is a directory of .jack files, by default every program of
+benchmarks/corpus and a synthetic class. Every program is compiled at -O1
+once, and its commands are then written and loaded in both formats, which
+must load to the same instructions.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus")
+sys.path.insert(0, ROOT)
+
+import Bytecode  # noqa: E402
+from JackCompiler import compile_file  # noqa: E402
+from VMWriter import VMWriter, parse_commands  # noqa: E402
+from synthetic import generate_class  # noqa: E402
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def write(writer_class, output, commands):
+    writer = writer_class(output)
+    writer.emit(commands)
+    writer.close()
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("programs", nargs="*", help="program directories")
+    parser.add_argument("--subroutines", type=int, default=1000,
+                        help="size of the synthetic class (default: 1000)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    sources = {}  # program -> the sources of its classes
+    for program in args.programs or sorted(
+            glob.glob(os.path.join(CORPUS, "*", ""))):
+        sources[os.path.basename(os.path.normpath(program))] = [
+            open(path).read()
+            for path in sorted(glob.glob(os.path.join(program, "*.jack")))]
+    if not args.programs:
+        sources["synthetic"] = [generate_class("Synthetic", args.subroutines)]
+
+    print("{:<12}{:<6}{:>10}{:>12}{:>12}".format(
+        "program", "format", "bytes", "write ms", "load ms"))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, classes in sources.items():
+            commands = []
+            for source in classes:
+                output = io.StringIO()
+                compile_file(io.StringIO(source), output, opt_level=1)
+                commands.extend(parse_commands(output.getvalue()))
+            results = []
+            for extension, writer_class, output_class, mode in (
+                    (".vm", VMWriter, io.StringIO, "w"),
+                    (".vmb", Bytecode.BytecodeWriter, io.BytesIO, "wb")):
+                write_time, data = best_time(
+                    lambda: write(writer_class, output_class(), commands),
+                    args.repeat)
+                path = os.path.join(directory, name + extension)
+                with open(path, mode) as output_file:
+                    output_file.write(data)
+                load_time, loaded = best_time(lambda: Bytecode.load(path),
+                                              args.repeat)
+                results.append((os.path.getsize(path), write_time,
+                                load_time, loaded))
+                print("{:<12}{:<6}{:>10}{:>12.2f}{:>12.2f}".format(
+                    name, extension, os.path.getsize(path),
+                    write_time * 1000, load_time * 1000))
+            if results[0][3] != results[1][3]:
+                raise RuntimeError("{}: the formats load differently".format(
+                    name))
+            print("{:<18}{:>10.1%}{:>12.1%}{:>12.1%}".format(
+                "", *(after / before - 1 for before, after
+                      in zip(results[0][:3], results[1][:3]))))
+
+
+if __name__ == "__main__":
+    main()
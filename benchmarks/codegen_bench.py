@@ -0,0 +1,78 @@
+"""
+Compares the VM code generated at every optimization level on the
+benchmark corpus.
+
+Usage: python benchmarks/codegen_bench.py [--levels 0 1 2] [program ...]
+
+A program is a directory of .jack files, by default every directory in
+benchmarks/corpus. For every program and level, the number of VM commands
+and of jumps (goto and if-goto) is reported, with the change against the
+first level.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus")
+sys.path.insert(0, ROOT)
+
+from JackCompiler import compile_file  # noqa: E402
+
+
+def compile_program(directory, **options):
+    """Compiles every class of a program, returns the VM commands."""
+    commands = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jack"))):
+        output = io.StringIO()
+        with open(path) as input_file:
+            compile_file(input_file, output, **options)
+        commands.extend(line.split() for line in output.getvalue().split("\n")
+                        if line)
+    return commands
+
+
+def count(commands):
+    jumps = sum(command[0] in {"goto", "if-goto"} for command in commands)
+    return len(commands), jumps
+
+
+def change(before, after):
+    return "{:+.1%}".format(after / before - 1) if before else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("programs", nargs="*", help="program directories")
+    parser.add_argument("--levels", type=int, nargs="+", default=[0, 1, 2])
+    args = parser.parse_args()
+    programs = args.programs or sorted(
+        path for path in glob.glob(os.path.join(CORPUS, "*"))
+        if os.path.isdir(path))
+
+    totals = {level: [0, 0] for level in args.levels}
+    print("{:<12}".format("program") + "".join(
+        "{:>24}".format("-O{} commands/jumps".format(level))
+        for level in args.levels))
+    for program in programs:
+        row = "{:<12}".format(os.path.basename(program))
+        base = None
+        for level in args.levels:
+            commands, jumps = count(compile_program(program, opt_level=level))
+            totals[level][0] += commands
+            totals[level][1] += jumps
+            base = base or commands
+            row += "{:>24}".format("{} ({}) / {}".format(
+                commands, change(base, commands), jumps))
+        print(row)
+    base = totals[args.levels[0]][0]
+    print("{:<12}".format("total") + "".join(
+        "{:>24}".format("{} ({}) / {}".format(
+            commands, change(base, commands), jumps))
+        for commands, jumps in totals.values()))
+
+
+if __name__ == "__main__":
+    main()
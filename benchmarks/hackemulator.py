@@ -0,0 +1,159 @@
+"""
+A small emulator of the Hack computer, for benchmarks that measure the
+assembly of a program by running it.
+
+The assembly is assembled in place: labels and the predefined symbols are
+resolved, and the other symbols are variables from RAM[16] on, except the
+names of functions that the program does not define. Calling one of those
+runs the Python stub of the OS routine of VMRunner instead, on the same
+RAM, which returns like a VM function would. Every instruction takes one
+cycle, and the stubs take none, so the counts only cover the code of the
+program. The shift instructions of the extended Hack ALU are supported.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from VMRunner import Halt, VMRunner  # noqa: E402
+
+PREDEFINED = dict({"SP": 0, "LCL": 1, "ARG": 2, "THIS": 3, "THAT": 4,
+                   "SCREEN": 16384, "KBD": 24576},
+                  **{"R{}".format(index): index for index in range(16)})
+VARIABLE_BASE = 16
+# The addresses that stand for the functions the program calls but does not
+# define, past the end of the ROM.
+TRAP_BASE = 32768
+HALT_LABEL = "$HALT"
+COMPUTATIONS = {
+    "0": lambda a, d, m: 0, "1": lambda a, d, m: 1,
+    "-1": lambda a, d, m: -1, "D": lambda a, d, m: d,
+    "A": lambda a, d, m: a, "M": lambda a, d, m: m,
+    "!D": lambda a, d, m: ~d, "!A": lambda a, d, m: ~a,
+    "!M": lambda a, d, m: ~m, "-D": lambda a, d, m: -d,
+    "-A": lambda a, d, m: -a, "-M": lambda a, d, m: -m,
+    "D+1": lambda a, d, m: d + 1, "A+1": lambda a, d, m: a + 1,
+    "M+1": lambda a, d, m: m + 1, "D-1": lambda a, d, m: d - 1,
+    "A-1": lambda a, d, m: a - 1, "M-1": lambda a, d, m: m - 1,
+    "D+A": lambda a, d, m: d + a, "D+M": lambda a, d, m: d + m,
+    "D-A": lambda a, d, m: d - a, "D-M": lambda a, d, m: d - m,
+    "A-D": lambda a, d, m: a - d, "M-D": lambda a, d, m: m - d,
+    "D&A": lambda a, d, m: d & a, "D&M": lambda a, d, m: d & m,
+    "D|A": lambda a, d, m: d | a, "D|M": lambda a, d, m: d | m,
+    "D<<": lambda a, d, m: d << 1, "A<<": lambda a, d, m: a << 1,
+    "M<<": lambda a, d, m: m << 1, "D>>": lambda a, d, m: d >> 1,
+    "A>>": lambda a, d, m: a >> 1, "M>>": lambda a, d, m: m >> 1,
+}
+JUMPS = {
+    "JGT": lambda value: value > 0, "JEQ": lambda value: value == 0,
+    "JGE": lambda value: value >= 0, "JLT": lambda value: value < 0,
+    "JNE": lambda value: value != 0, "JLE": lambda value: value <= 0,
+    "JMP": lambda value: True,
+}
+
+
+def is_function(symbol):
+    """Tells the name of a function from the name of a static variable,
+    which is a class name and a number.
+    """
+    return "." in symbol and not symbol.rsplit(".", 1)[1].isdigit()
+
+
+class HackEmulator:
+    """Assembles and runs a program."""
+
+    def __init__(self, lines, memory=32768):
+        instructions = []
+        self.labels = {}
+        for line in lines:
+            line = line.split("//")[0].strip()
+            if line.startswith("("):
+                self.labels[line[1:-1]] = len(instructions)
+            elif line:
+                instructions.append(line)
+        self.rom_size = len(instructions)
+        self.variables = {}
+        self.traps = []  # the OS routines, by address from TRAP_BASE
+        self.program = [self.decode(line) for line in instructions]
+        # A runner without a program, for its OS stubs and its RAM.
+        self.os = VMRunner((), memory)
+        self.ram = self.os.ram
+        self.stubs = [self.os.stub(name) for name in self.traps]
+        self.cycles = 0
+
+    def symbol(self, name):
+        if name in self.labels:
+            return self.labels[name]
+        if name in PREDEFINED:
+            return PREDEFINED[name]
+        if is_function(name):
+            if name not in self.traps:
+                self.traps.append(name)
+            return TRAP_BASE + self.traps.index(name)
+        if name not in self.variables:
+            self.variables[name] = VARIABLE_BASE + len(self.variables)
+        return self.variables[name]
+
+    def decode(self, line):
+        """Turns an instruction into (value,) for an A-instruction or
+        (computation, dest, jump) for a C-instruction.
+        """
+        if line.startswith("@"):
+            value = line[1:]
+            return (int(value) if value.isdigit() else self.symbol(value)),
+        dest, _, rest = line.rpartition("=")
+        computation, _, jump = rest.partition(";")
+        return (COMPUTATIONS[computation], dest,
+                JUMPS[jump] if jump else None)
+
+    def run(self, limit=200000000):
+        """Runs the program until it halts, returns what it printed."""
+        ram, program = self.ram, self.program
+        halt = self.labels.get(HALT_LABEL, -1)
+        a = d = pc = 0
+        cycles = 0
+        while pc != halt:
+            if pc >= TRAP_BASE:
+                pc = self.trap(self.stubs[pc - TRAP_BASE])
+                if pc is None:
+                    break
+                continue
+            instruction = program[pc]
+            cycles += 1
+            if cycles > limit:
+                raise RuntimeError("more than {} cycles".format(limit))
+            if len(instruction) == 1:
+                a = instruction[0]
+                pc += 1
+                continue
+            computation, dest, jump = instruction
+            value = computation(a, d, ram[a] if a < len(ram) else 0)
+            value = (value + 0x8000 & 0xFFFF) - 0x8000
+            if "M" in dest:
+                ram[a] = value
+            if "D" in dest:
+                d = value
+            if "A" in dest:
+                a = value & 0xFFFF
+            pc = a if jump and jump(value) else pc + 1
+        self.cycles += cycles
+        return "".join(self.os.output)
+
+    def trap(self, stub):
+        """Runs an OS stub from its entry, where the call has just set up
+        the frame, and returns like a VM function. Returns where to go on,
+        or None if the stub halts.
+        """
+        ram = self.ram
+        frame = ram[1]
+        n_args = frame - 5 - ram[2]
+        try:
+            value = stub(*ram[ram[2]:ram[2] + n_args]) or 0
+        except Halt:
+            return None
+        returned = ram[frame - 5]
+        ram[ram[2]] = (value + 0x8000 & 0xFFFF) - 0x8000
+        ram[0] = ram[2] + 1
+        ram[4], ram[3], ram[2], ram[1] = ram[frame - 1], ram[frame - 2], \
+            ram[frame - 3], ram[frame - 4]
+        return returned
@@ -0,0 +1,67 @@
+"""
+Measures the cost of the class index pre-pass against a full compilation.
+
+Usage: python benchmarks/index_bench.py [--classes N] [--subroutines N]
+
+A directory of synthetic classes is generated, then the index is built from
+scratch, rebuilt from the copy saved on disk, and the classes are compiled.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ClassIndex import ClassIndex, INDEX_NAME  # noqa: E402
+from JackCompiler import compile_path  # noqa: E402
+from synthetic import generate_class  # noqa: E402
+
+
+def build_index(directory, paths):
+    start = time.perf_counter()
+    index = ClassIndex(directory)
+    index.update(paths)
+    index.save()
+    return time.perf_counter() - start, index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--subroutines", type=int, default=50,
+                        help="subroutines per class (default: 50)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for number in range(args.classes):
+            name = "Class{}".format(number)
+            with open(os.path.join(directory, name + ".jack"), "w") as out:
+                out.write(generate_class(name, args.subroutines))
+        paths = sorted(glob.glob(os.path.join(directory, "*.jack")))
+
+        cold, index = build_index(directory, paths)
+        warm, _ = build_index(directory, paths)
+        classes = index.classes()
+        start = time.perf_counter()
+        for path in paths:
+            compile_path(path, os.path.splitext(path)[0] + ".vm",
+                         {"classes": classes})
+        compile_time = time.perf_counter() - start
+        index_size = os.path.getsize(os.path.join(directory, INDEX_NAME))
+
+    print("{} classes, {} subroutines".format(
+        len(classes), sum(len(signature["subroutines"])
+                          for signature in classes.values())))
+    print("compile:     {:8.3f} s".format(compile_time))
+    print("index, cold: {:8.3f} s ({:.1%} of compile)".format(
+        cold, cold / compile_time))
+    print("index, warm: {:8.3f} s ({:.1%} of compile)".format(
+        warm, warm / compile_time))
+    print("index file:  {:8} bytes".format(index_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Measures the peak memory of compiling ever larger synthetic classes, with
+and without the streaming pipeline.
+
+Usage: python benchmarks/memory_bench.py [--sizes 1 16 256 1024]
+
+Sizes are in MB of Jack source. Every compilation runs in its own process,
+so the reported peak RSS belongs to that compilation alone.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import write_class  # noqa: E402
+
+
+def child(input_path, streaming):
+    """Compiles one file and prints the peak RSS of this process, in KB."""
+    from JackCompiler import compile_file
+    with open(input_path) as input_file, open(os.devnull, "w") as output:
+        compile_file(input_file, output, streaming=streaming)
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def measure(input_path, streaming):
+    command = [sys.executable, os.path.abspath(__file__), "--child",
+               input_path]
+    if streaming:
+        command.append("--streaming")
+    start = time.perf_counter()
+    output = subprocess.run(command, check=True, capture_output=True,
+                            text=True).stdout
+    return int(output.split()[-1]) / 1024, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="input sizes in MB (default: 1 4 16 64)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--streaming", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.streaming)
+        return
+
+    print("{:>8} {:>16} {:>16} {:>10} {:>10}".format(
+        "MB", "peak RSS (MB)", "streaming (MB)", "time (s)", "stream (s)"))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, "Bench.jack")
+            with open(path, "w") as output_stream:
+                write_class(output_stream, "Bench", size << 20)
+            whole, whole_time = measure(path, False)
+            stream, stream_time = measure(path, True)
+            print("{:>8} {:>16.1f} {:>16.1f} {:>10.1f} {:>10.1f}".format(
+                size, whole, stream, whole_time, stream_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Measures identifier resolution in the symbol table on identifier-heavy code.
+
+Usage: python benchmarks/symbol_bench.py [--names N] [--lookups N]
+
+Three ways of resolving every reference are timed: the four-dict table the
+scope chain replaced, probing kind_of, index_of and type_of in turn; the
+same three calls on the current table, which are now wrappers; and a
+single resolve().
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SymbolTable import SymbolTable  # noqa: E402
+
+
+class FourDictTable:
+    """The lookups of the previous symbol table, kept for comparison."""
+
+    def __init__(self):
+        self.var_dict, self.arg_dict = {}, {}
+        self.static_dict, self.field_dict = {}, {}
+
+    def define(self, name, type, kind):
+        table = {"VAR": self.var_dict, "ARG": self.arg_dict,
+                 "STATIC": self.static_dict, "FIELD": self.field_dict}[kind]
+        table[name] = (type, len(table))
+
+    def kind_of(self, name):
+        if name in self.var_dict.keys():
+            return "LOCAL"
+        if name in self.arg_dict.keys():
+            return "ARG"
+        if name in self.static_dict.keys():
+            return "STATIC"
+        if name in self.field_dict.keys():
+            return "THIS"
+        return "NONE"
+
+    def type_of(self, name):
+        if name in self.var_dict.keys():
+            return self.var_dict[name][0]
+        if name in self.arg_dict.keys():
+            return self.arg_dict[name][0]
+        if name in self.static_dict.keys():
+            return self.static_dict[name][0]
+        if name in self.field_dict.keys():
+            return self.field_dict[name][0]
+
+    def index_of(self, name):
+        if name in self.var_dict.keys():
+            return self.var_dict[name][1]
+        if name in self.arg_dict.keys():
+            return self.arg_dict[name][1]
+        if name in self.static_dict.keys():
+            return self.static_dict[name][1]
+        if name in self.field_dict.keys():
+            return self.field_dict[name][1]
+
+
+def fill(table, names):
+    kinds = ["STATIC", "FIELD", "ARG", "VAR"]
+    for number, name in enumerate(names):
+        table.define(name, "int", kinds[number % 4])
+
+
+def time_lookups(lookup, references, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in references:
+            lookup(name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--names", type=int, default=64,
+                        help="identifiers in scope (default: 64)")
+    parser.add_argument("--lookups", type=int, default=500000,
+                        help="references to resolve (default: 500000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    names = ["name{}".format(number) for number in range(args.names)]
+    generator = random.Random(0)
+    references = [generator.choice(names) for _ in range(args.lookups)]
+    old, new = FourDictTable(), SymbolTable()
+    fill(old, names)
+    fill(new, names)
+
+    def three_calls(table):
+        def lookup(name):
+            return (table.kind_of(name), table.index_of(name),
+                    table.type_of(name))
+        return lookup
+
+    def resolve(name):
+        symbol = new.resolve(name)
+        return symbol.segment, symbol.index, symbol.type
+
+    results = [
+        ("four dicts", time_lookups(three_calls(old), references,
+                                    args.repeat)),
+        ("wrappers", time_lookups(three_calls(new), references, args.repeat)),
+        ("resolve", time_lookups(resolve, references, args.repeat))
+    ]
+    for name, elapsed in results:
+        print("{:>10}: {:8.3f} s {:12.0f} references/s {:6.1f}x".format(
+            name, elapsed, args.lookups / elapsed, results[0][1] / elapsed))
+
+
+if __name__ == "__main__":
+    main()
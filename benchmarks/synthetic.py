@@ -0,0 +1,72 @@
+"""
+Generates synthetic, valid Jack classes of arbitrary size for the
+benchmarks in this directory.
+"""
+import typing
+
+SUBROUTINE_TEMPLATE = """
+    /** Synthetic subroutine number {n}. */
+    function int f{n}(int a, int b) {{
+        var int i, s;
+        var Array buffer;
+        let buffer = Array.new(16);  // scratch space
+        let i = 0;
+        let s = a * {k} + (b / 2);
+        while (i < 16) {{
+            /* keep the loop body busy */
+            let buffer[i] = s + (i * 32);
+            if ((buffer[i] & 1) = 0) {{
+                let s = s + buffer[i] - {k};
+            }} else {{
+                let s = -s | ~b;
+            }}
+            let i = i + 1;
+        }}
+        do Output.printString("f{n} done");
+        do buffer.dispose();
+        return s;
+    }}
+"""
+
+
+def generate_class(name: str, subroutines: int) -> str:
+    """Builds the source of a class with the given number of subroutines.
+
+    Args:
+        name (str): the class name.
+        subroutines (int): how many subroutines to generate.
+
+    Returns:
+        str: the Jack source of the class.
+    """
+    parts = ["// Generated benchmark class.\nclass {} {{\n"
+             "    static int counter;\n    field int x, y;\n".format(name)]
+    for n in range(subroutines):
+        parts.append(SUBROUTINE_TEMPLATE.format(n=n, k=n % 97 + 1))
+    parts.append("}\n")
+    return "".join(parts)
+
+
+def write_class(output_stream: typing.TextIO, name: str,
+                size: int) -> int:
+    """Streams a class of roughly the given size in bytes to a file, without
+    holding the whole source in memory.
+
+    Args:
+        output_stream (typing.TextIO): where to write the class.
+        name (str): the class name.
+        size (int): the approximate size of the class, in bytes.
+
+    Returns:
+        int: the number of bytes written.
+    """
+    written = output_stream.write(
+        "// Generated benchmark class.\nclass {} {{\n"
+        "    static int counter;\n    field int x, y;\n".format(name))
+    n = 0
+    while written < size:
+        written += output_stream.write(
+            SUBROUTINE_TEMPLATE.format(n=n, k=n % 97 + 1))
+        n += 1
+    written += output_stream.write("}\n")
+    return written
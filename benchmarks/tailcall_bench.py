@@ -0,0 +1,79 @@
+"""
+Measures turning self tail calls into jumps by running the compiled code.
+
+Usage: python benchmarks/tailcall_bench.py [program ...]
+
+A program is a directory of .jack files, by default the Recursion and List
+programs of benchmarks/corpus. Every program is compiled at -O1 with and
+without the conversion and run by VMRunner, which reports the deepest the
+stack got, the VM instructions executed and the calls made. The VM code is
+also translated command by command into Hack assembly and run in the Hack
+emulator, for the cycles it takes.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, "benchmarks", "corpus")
+sys.path.insert(0, ROOT)
+
+import Bytecode  # noqa: E402
+from JackCompiler import compile_file  # noqa: E402
+from VMRunner import VMRunner  # noqa: E402
+from VMWriter import parse_commands  # noqa: E402
+from hackemulator import HackEmulator  # noqa: E402
+from vmtranslator import VMTranslator  # noqa: E402
+
+
+def run_program(directory, **options):
+    """Compiles and runs a program, returns what it printed and its
+    statistics.
+    """
+    files = []
+    commands = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jack"))):
+        output = io.StringIO()
+        with open(path) as input_file:
+            compile_file(input_file, output, **options)
+        files.append(Bytecode.read(Bytecode.from_text(output.getvalue())))
+        commands.extend(parse_commands(output.getvalue()))
+    runner = VMRunner(files)
+    printed = runner.run("Main.main")
+    emulator = HackEmulator(VMTranslator("Main.main").translate(commands))
+    if emulator.run() != printed:
+        raise RuntimeError("{}: the Hack output differs".format(directory))
+    return printed, {"stack": runner.max_depth,
+                     "instructions": sum(runner.instructions),
+                     "calls": sum(runner.calls), "cycles": emulator.cycles}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("programs", nargs="*", help="program directories")
+    args = parser.parse_args()
+    programs = args.programs or [os.path.join(CORPUS, name)
+                                 for name in ("Recursion", "List")]
+
+    print("{:<12}{:<12}{:>8}{:>14}{:>10}{:>14}".format(
+        "program", "tail calls", "stack", "instructions", "calls",
+        "cycles"))
+    for program in programs:
+        results = [run_program(program, opt_level=1, tail_calls=tail_calls)
+                   for tail_calls in (False, True)]
+        if results[0][0] != results[1][0]:
+            raise RuntimeError("{}: the outputs differ".format(program))
+        for label, (_, stats) in zip(("calls", "jumps"), results):
+            print("{:<12}{:<12}{:>8}{:>14}{:>10}{:>14}".format(
+                os.path.basename(program), label, stats["stack"],
+                stats["instructions"], stats["calls"], stats["cycles"]))
+        print("{:<24}{:>8.1%}{:>14.1%}{:>10.1%}{:>14.1%}".format(
+            "", *(results[1][1][name] / results[0][1][name] - 1
+                  for name in ("stack", "instructions", "calls",
+                               "cycles"))))
+
+
+if __name__ == "__main__":
+    main()
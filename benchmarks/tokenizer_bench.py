@@ -0,0 +1,63 @@
+"""
+Compares the throughput of the tokenizer's scanning engines.
+
+Usage: python benchmarks/tokenizer_bench.py [--subroutines N] [file.jack ...]
+
+Without input files, a synthetic class is generated. Every engine must
+produce the same token sequence, otherwise the benchmark fails.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from JackTokenizer import SCANNERS, TokenStore  # noqa: E402
+from synthetic import generate_class  # noqa: E402
+
+
+def best_time(scan, text, repeat):
+    best = None
+    for _ in range(repeat):
+        store = TokenStore()
+        start = time.perf_counter()
+        scan(text, store)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    tokens = [(store.types[i], store.value(i)) for i in range(len(store))]
+    return best, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("files", nargs="*", help="Jack files to scan")
+    parser.add_argument("--subroutines", type=int, default=2000,
+                        help="size of the synthetic class (default: 2000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.files:
+        text = "\n".join(open(path).read() for path in args.files)
+    else:
+        text = generate_class("Bench", args.subroutines)
+    megabytes = len(text.encode()) / 1e6
+
+    results = {}
+    for name, scan in SCANNERS.items():
+        results[name] = best_time(scan, text, args.repeat)
+
+    reference = results["legacy"][1]
+    print("input: {:.2f} MB, {} tokens".format(megabytes, len(reference)))
+    for name, (elapsed, tokens) in results.items():
+        if tokens != reference:
+            sys.exit("{} produced a different token sequence".format(name))
+        print("{:>8}: {:8.3f} s {:12.0f} tokens/s {:8.2f} MB/s".format(
+            name, elapsed, len(tokens) / elapsed, megabytes / elapsed))
+    print("speedup: {:.1f}x".format(
+        results["legacy"][0] / results["regex"][0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+A VM translator that expands every command on its own, the way the
+textbook describes it, for benchmarks that compare the Hack assembly of
+the two-step path, Jack to VM code to assembly, with AsmWriter's.
+
+The program starts with the same bootstrap as AsmWriter's: the entry is
+called, and the program halts at "$HALT" if it returns.
+"""
+
+BASES = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
+POINTERS = ("THIS", "THAT")
+BINARY = {"add": "M=D+M", "sub": "M=M-D", "and": "M=D&M", "or": "M=D|M"}
+UNARY = {"neg": ["M=-M"], "not": ["M=!M"], "shiftleft": ["M=M<<"],
+         "shiftright": ["M=M>>"]}
+JUMPS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
+PUSH_D = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
+POP_D = ["@SP", "AM=M-1", "D=M"]
+
+
+class VMTranslator:
+    """Translates the commands of a program into Hack assembly."""
+
+    def __init__(self, entry="Sys.init"):
+        self.function = ""
+        self.class_name = ""
+        self.labels = 0
+        self.lines = ["@256", "D=A", "@SP", "M=D"]
+        self.call(entry, 0, "$HALT")
+        self.lines.extend(["($HALT)", "@$HALT", "0;JMP"])
+
+    def translate(self, commands):
+        """Appends the assembly of VM commands, returns all of it."""
+        for command in commands:
+            operation = command[0]
+            if operation == "push":
+                self.push(command[1], command[2])
+            elif operation == "pop":
+                self.pop(command[1], command[2])
+            elif operation in BINARY:
+                self.lines.extend(POP_D + ["A=A-1", BINARY[operation]])
+            elif operation in UNARY:
+                self.lines.extend(["@SP", "A=M-1"] + UNARY[operation])
+            elif operation in JUMPS:
+                self.labels += 1
+                label = "$CMP.{}".format(self.labels)
+                self.lines.extend(POP_D + [
+                    "A=A-1", "D=M-D", "M=-1", "@" + label,
+                    "D;" + JUMPS[operation], "@SP", "A=M-1", "M=0",
+                    "({})".format(label)])
+            elif operation == "label":
+                self.lines.append("({}${})".format(self.function, command[1]))
+            elif operation == "goto":
+                self.lines.extend(["@{}${}".format(self.function, command[1]),
+                                   "0;JMP"])
+            elif operation == "if-goto":
+                self.lines.extend(POP_D + [
+                    "@{}${}".format(self.function, command[1]), "D;JNE"])
+            elif operation == "function":
+                self.function = command[1]
+                self.class_name = command[1].split(".")[0]
+                self.lines.append("({})".format(command[1]))
+                for _ in range(command[2]):
+                    self.push("constant", 0)
+            elif operation == "call":
+                self.labels += 1
+                self.call(command[1], command[2],
+                          "{}$ret.{}".format(self.function, self.labels))
+            elif operation == "return":
+                self.lines.extend([
+                    "@LCL", "D=M", "@R13", "M=D", "@5", "A=D-A", "D=M",
+                    "@R14", "M=D"] + POP_D + [
+                    "@ARG", "A=M", "M=D", "@ARG", "D=M+1", "@SP", "M=D"])
+                for register in ("THAT", "THIS", "ARG", "LCL"):
+                    self.lines.extend(["@R13", "AM=M-1", "D=M",
+                                       "@" + register, "M=D"])
+                self.lines.extend(["@R14", "A=M", "0;JMP"])
+        return self.lines
+
+    def push(self, segment, index):
+        if segment == "constant":
+            self.lines.extend(["@{}".format(index), "D=A"])
+        elif segment in BASES:
+            self.lines.extend(["@{}".format(index), "D=A",
+                               "@" + BASES[segment], "A=D+M", "D=M"])
+        else:
+            self.lines.extend([self.address(segment, index), "D=M"])
+        self.lines.extend(PUSH_D)
+
+    def pop(self, segment, index):
+        if segment in BASES:
+            self.lines.extend(["@{}".format(index), "D=A",
+                               "@" + BASES[segment], "D=D+M", "@R13", "M=D"] +
+                              POP_D + ["@R13", "A=M", "M=D"])
+        else:
+            self.lines.extend(POP_D + [self.address(segment, index), "M=D"])
+
+    def address(self, segment, index):
+        if segment == "temp":
+            return "@R{}".format(5 + index)
+        if segment == "pointer":
+            return "@" + POINTERS[index]
+        return "@{}.{}".format(self.class_name, index)
+
+    def call(self, name, n_args, returned):
+        self.lines.extend(["@" + returned, "D=A"] + PUSH_D)
+        for register in ("LCL", "ARG", "THIS", "THAT"):
+            self.lines.extend(["@" + register, "D=M"] + PUSH_D)
+        self.lines.extend([
+            "@SP", "D=M", "@{}".format(n_args + 5), "D=D-A", "@ARG", "M=D",
+            "@SP", "D=M", "@LCL", "M=D", "@" + name, "0;JMP",
+            "({})".format(returned)])
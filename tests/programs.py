@@ -0,0 +1,76 @@
+"""
+Compiles Jack classes in memory the way JackCompiler compiles a directory,
+and runs them, for the tests.
+"""
+import io
+import typing
+import Bytecode
+from ClassIndex import scan_headers
+from Inliner import CandidateCollector
+from JackCompiler import compile_file
+from VMRunner import VMRunner
+from VMWriter import format_command, parse_commands
+
+
+def compile_program(sources: typing.Sequence[str], **options) \
+        -> typing.Dict[str, typing.List[tuple]]:
+    """Compiles the classes of a program against their signatures, and at
+    -O2 with the subroutines that can be inlined, like JackCompiler does.
+
+    Args:
+        sources (typing.Sequence[str]): the Jack classes.
+        **options: keyword arguments for compile_file.
+
+    Returns:
+        typing.Dict[str, typing.List[tuple]]: the VM commands of every
+        class, by class name.
+    """
+    signatures = [scan_headers(source) for source in sources]
+    classes = {signature["name"]: signature for signature in signatures}
+    options.setdefault("classes", classes)
+    if options.get("opt_level", 0) >= 2 and "inline" not in options:
+        collector = CandidateCollector(classes)
+        for source in sources:
+            compile_file(io.StringIO(source), io.StringIO(), opt_level=1,
+                         classes=classes, extra_passes=[collector])
+        options["inline"] = collector.candidates
+    compiled = {}
+    for signature, source in zip(signatures, sources):
+        output = io.StringIO()
+        compile_file(io.StringIO(source), output, **options)
+        compiled[signature["name"]] = parse_commands(output.getvalue())
+    return compiled
+
+
+def run_program(compiled: typing.Dict[str, typing.List[tuple]]) -> str:
+    """
+    Args:
+        compiled (typing.Dict[str, typing.List[tuple]]): the VM commands of
+        every class, as returned by compile_program.
+
+    Returns:
+        str: what the program prints, run from Main.main.
+    """
+    return VMRunner(
+        Bytecode.read(Bytecode.from_text(
+            "".join(format_command(command) for command in commands)))
+        for commands in compiled.values()).run("Main.main")
+
+
+def functions(commands: typing.List[tuple]) \
+        -> typing.Dict[str, typing.List[tuple]]:
+    """
+    Args:
+        commands (typing.List[tuple]): the VM commands of a class.
+
+    Returns:
+        typing.Dict[str, typing.List[tuple]]: the commands of every function,
+        starting with its function command, by full name.
+    """
+    found = {}
+    for command in commands:
+        if command[0] == "function":
+            found[command[1]] = []
+            name = command[1]
+        found[name].append(command)
+    return found
@@ -0,0 +1,59 @@
+"""
+Regression tests for DeadStoreEliminator: a store is only dead if no path
+reads it, removing it must keep the calls that computed its value, and the
+locals left must be renumbered consistently.
+"""
+from DeadStoreEliminator import DeadStoreEliminator
+from programs import compile_program, run_program
+
+
+def test_dead_store_keeps_its_call():
+    commands = [("function", "Main.f", 1), ("push", "constant", 1),
+                ("call", "Main.g", 1), ("pop", "local", 0),
+                ("push", "constant", 0), ("return",)]
+    assert DeadStoreEliminator().run(commands) == [
+        ("function", "Main.f", 0), ("push", "constant", 1),
+        ("call", "Main.g", 1), ("pop", "temp", 0),
+        ("push", "constant", 0), ("return",)]
+
+
+def test_store_read_after_back_edge_is_kept():
+    commands = [("function", "Main.f", 1), ("push", "constant", 0),
+                ("pop", "local", 0), ("label", "LOOP"),
+                ("push", "argument", 0), ("if-goto", "END"),
+                ("push", "local", 0), ("call", "Output.printInt", 1),
+                ("pop", "temp", 0),
+                # Only read by the next iteration.
+                ("push", "constant", 7), ("pop", "local", 0),
+                ("goto", "LOOP"), ("label", "END"),
+                ("push", "constant", 0), ("return",)]
+    assert DeadStoreEliminator().run(commands) == commands
+
+
+def test_locals_are_renumbered_after_unused_ones_are_dropped():
+    commands = [("function", "Main.f", 3), ("push", "constant", 4),
+                ("pop", "local", 0), ("push", "constant", 5),
+                ("pop", "local", 1), ("push", "argument", 0),
+                ("pop", "local", 2), ("push", "local", 0),
+                ("push", "local", 2), ("add",), ("return",)]
+    assert DeadStoreEliminator().run(commands) == [
+        ("function", "Main.f", 2), ("push", "constant", 4),
+        ("pop", "local", 0), ("push", "argument", 0),
+        ("pop", "local", 1), ("push", "local", 0),
+        ("push", "local", 1), ("add",), ("return",)]
+
+    sources = ["""
+        class Main {
+            function int f(int x) {
+                var int a, unused, b;
+                let a = x + 4;
+                let unused = x * 3;
+                let b = x + 6;
+                return a * b;
+            }
+            function void main() {
+                do Output.printInt(Main.f(1));
+                return;
+            }
+        }"""]
+    assert run_program(compile_program(sources, opt_level=1)) == "35"
@@ -0,0 +1,58 @@
+"""
+Regression tests for the inliner: only straight-line leaf bodies are
+inlined, and an inlined method reads the fields of its receiver.
+"""
+from Inliner import DEFAULT_BUDGET, Inliner, inline_candidate
+from programs import compile_program, functions, run_program
+
+PROLOGUE = [("push", "argument", 0), ("pop", "pointer", 0)]
+GET_X = [("function", "Point.getX", 0)] + PROLOGUE + \
+    [("push", "this", 0), ("return",)]
+POINT = """
+    class Point {
+        field int x;
+        constructor Point new(int ax) { let x = ax; return this; }
+        method int getX() { return x; }
+    }"""
+
+
+def test_bodies_with_calls_labels_or_that_are_not_inlined():
+    function = [("function", "Main.f", 0)]
+    for body in ([("push", "constant", 1), ("call", "Main.g", 1)],
+                 [("label", "L"), ("push", "constant", 1)],
+                 [("push", "constant", 1), ("if-goto", "L"),
+                  ("push", "constant", 2)]):
+        commands = function + body + [("return",)]
+        assert inline_candidate(commands, False, 0, DEFAULT_BUDGET) is None
+    method = [("function", "Point.f", 0)] + PROLOGUE
+    for body in ([("push", "that", 0)],
+                 [("push", "argument", 1), ("pop", "pointer", 1),
+                  ("push", "this", 0)]):
+        commands = method + body + [("return",)]
+        assert inline_candidate(commands, True, 2, DEFAULT_BUDGET) is None
+    assert inline_candidate(GET_X, True, 1, DEFAULT_BUDGET)
+
+
+def test_method_accessor_reads_that_through_receiver():
+    candidate = inline_candidate(GET_X, True, 1, DEFAULT_BUDGET)
+    inliner = Inliner({"Point.getX": candidate})
+    commands = [("function", "Main.f", 1), ("push", "local", 0),
+                ("call", "Point.getX", 1), ("return",)]
+    assert inliner.run(commands) == [
+        ("function", "Main.f", 1), ("push", "local", 0),
+        ("pop", "pointer", 1), ("push", "that", 0), ("return",)]
+
+    sources = [POINT, """
+        class Main {
+            function void main() {
+                var Point p, q;
+                let p = Point.new(3);
+                let q = Point.new(40);
+                do Output.printInt(p.getX() + q.getX());
+                return;
+            }
+        }"""]
+    compiled = compile_program(sources, opt_level=2)
+    assert ("call", "Point.getX", 1) not in \
+        functions(compiled["Main"])["Main.main"]
+    assert run_program(compiled) == "43"
@@ -0,0 +1,82 @@
+"""
+Regression tests for LocalPromoter: temps are shared by every subroutine, so
+a variable must not be promoted into one that a call or inlined code uses.
+"""
+from LocalPromoter import LocalPromoter
+from programs import compile_program, functions, run_program
+
+POINT = """
+    class Point {
+        field int x;
+        constructor Point new(int ax) { let x = ax; return this; }
+        method int plus(int a) { return x + a; }
+    }"""
+
+
+def test_local_live_across_call_is_not_promoted():
+    commands = [("function", "Main.f", 1), ("push", "constant", 5),
+                ("pop", "local", 0), ("push", "local", 0),
+                ("call", "Main.g", 1), ("pop", "temp", 0),
+                ("push", "local", 0), ("push", "local", 0), ("add",),
+                ("return",)]
+    assert LocalPromoter().run(commands) == commands
+    # Without the call in between, the same local is promoted.
+    without_call = commands[:4] + commands[6:]
+    assert ("push", "local", 0) not in LocalPromoter().run(without_call)
+
+    # Main.g promotes its own local into the first free temp, which would
+    # clobber Main.f's local if that were promoted there too.
+    sources = ["""
+        class Main {
+            function int f(int x) {
+                var int a;
+                let a = x + 1;
+                do Main.g();
+                return a + a;
+            }
+            function void g() {
+                var int b;
+                let b = 7;
+                while (b < 20) { let b = b + 1; }
+                return;
+            }
+            function void main() {
+                do Output.printInt(Main.f(4));
+                return;
+            }
+        }"""]
+    compiled = compile_program(sources, opt_level=2)
+    assert ("push", "local", 0) in functions(compiled["Main"])["Main.f"]
+    assert run_program(compiled) == "10"
+
+
+def test_promoted_temps_do_not_collide_with_inlined_temps():
+    sources = [POINT, """
+        class Main {
+            function void main() {
+                var Point p;
+                var int i, total;
+                let p = Point.new(100);
+                let i = 0;
+                let total = 0;
+                while (i < 10) {
+                    let total = total + p.plus(i);
+                    let i = i + 1;
+                }
+                do Output.printInt(total);
+                return;
+            }
+        }"""]
+    compiled = compile_program(sources, opt_level=2)
+    main = functions(compiled["Main"])["Main.main"]
+    assert ("call", "Point.plus", 2) not in main
+    # Temp 1 holds the argument of the inlined method, so the promoted
+    # locals get the temps after it.
+    inlined = [index for index, command in enumerate(main)
+               if command == ("pop", "temp", 1)]
+    assert inlined and all(main[index + 1] == ("pop", "pointer", 1)
+                           for index in inlined)
+    assert any(command[1:2] == ("temp",) and command[2] > 1
+               for command in main)
+    assert run_program(compiled) == "1045"
+    assert run_program(compile_program(sources)) == "1045"
@@ -0,0 +1,72 @@
+"""
+Regression tests for LoopHoister: an expression is only hoisted out of a loop
+if nothing in the loop can change its value, and computing it is safe even
+if the loop never runs.
+"""
+import itertools
+from LoopHoister import LoopHoister
+from programs import compile_program, run_program
+
+
+def hoist(condition: list, body: list) -> tuple:
+    """
+    Args:
+        condition (list): the commands of a loop condition.
+        body (list): the commands of the loop body.
+
+    Returns:
+        tuple: the preheader, condition and body LoopHoister makes of them,
+        with new locals numbered from 10.
+    """
+    return LoopHoister().hoist(condition, body,
+                               itertools.count(10).__next__)
+
+
+CONDITION = [("push", "local", 0), ("push", "constant", 10), ("lt",)]
+INCREMENT = [("push", "local", 0), ("push", "constant", 1), ("add",),
+             ("pop", "local", 0)]
+
+
+def test_static_expression_is_not_hoisted_past_impure_call():
+    body = [("push", "static", 0), ("push", "constant", 3), ("add",),
+            ("pop", "local", 1), ("call", "Main.bump", 0),
+            ("pop", "temp", 0)] + INCREMENT
+    assert hoist(CONDITION, body) == ([], CONDITION, body)
+    # Without the call, the same expression is hoisted.
+    assert hoist(CONDITION, body[:4] + INCREMENT)[0]
+
+    sources = ["""
+        class Main {
+            static int count;
+            function void bump() { let count = count + 1; return; }
+            function void main() {
+                var int i, total;
+                let i = 0;
+                while (i < 5) {
+                    let total = total + (count * 10);
+                    do Main.bump();
+                    let i = i + 1;
+                }
+                do Output.printInt(total);
+                return;
+            }
+        }"""]
+    assert run_program(compile_program(sources, opt_level=2)) == "100"
+
+
+def test_field_is_not_hoisted_past_pointer_or_that_store():
+    read = [("push", "this", 0), ("push", "constant", 2), ("add",),
+            ("pop", "local", 1)]
+    for store in ([("push", "local", 2), ("pop", "pointer", 0)],
+                  [("push", "local", 2), ("pop", "that", 0)]):
+        body = read + store + INCREMENT
+        assert hoist(CONDITION, body) == ([], CONDITION, body)
+    assert hoist(CONDITION, read + INCREMENT)[0]
+
+
+def test_division_is_not_hoisted():
+    body = [("push", "local", 2), ("push", "local", 3),
+            ("call", "Math.divide", 2), ("pop", "local", 1)] + INCREMENT
+    assert hoist(CONDITION, body) == ([], CONDITION, body)
+    multiply = body[:2] + [("call", "Math.multiply", 2)] + body[3:]
+    assert hoist(CONDITION, multiply)[0]
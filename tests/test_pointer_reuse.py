@@ -0,0 +1,53 @@
+"""
+Regression tests for PointerReuse: pointer 1 may only be left as it is when
+nothing since its last load can have changed it or its address.
+"""
+from PointerReuse import PointerReuse
+from programs import compile_program, run_program
+
+FUNCTION = [("function", "Main.f", 4)]
+# a[i], with a in local 0 and i in local 1.
+ADDRESS = [("push", "local", 0), ("push", "local", 1), ("add",),
+           ("pop", "pointer", 1)]
+FIRST = ADDRESS + [("push", "that", 0), ("pop", "local", 2)]
+SECOND = ADDRESS + [("push", "that", 0), ("pop", "local", 3)]
+
+
+def test_reload_of_the_same_address_is_removed():
+    commands = FUNCTION + FIRST + SECOND
+    assert PointerReuse().run(commands) == FUNCTION + FIRST + SECOND[4:]
+
+
+def test_reload_is_kept_after_call():
+    commands = FUNCTION + FIRST + [("call", "Main.g", 0),
+                                   ("pop", "temp", 0)] + SECOND
+    assert PointerReuse().run(commands) == commands
+
+
+def test_reload_is_kept_after_label():
+    commands = FUNCTION + FIRST + [("label", "LOOP")] + SECOND
+    assert PointerReuse().run(commands) == commands
+
+
+def test_reload_is_kept_after_store_to_address_variable():
+    for variable in (("local", 0), ("local", 1)):
+        commands = FUNCTION + FIRST + [("push", "constant", 5),
+                                       ("pop",) + variable] + SECOND
+        assert PointerReuse().run(commands) == commands
+
+    sources = ["""
+        class Main {
+            function void main() {
+                var Array a;
+                var int i, x;
+                let a = Array.new(3);
+                let a[0] = 10;
+                let a[1] = 20;
+                let i = 0;
+                let x = a[i];
+                let i = 1;
+                do Output.printInt(x + a[i]);
+                return;
+            }
+        }"""]
+    assert run_program(compile_program(sources, opt_level=1)) == "30"
@@ -0,0 +1,40 @@
+"""
+Regression tests for StringPool: the pooled strings of a class must stay in
+the static segment.
+"""
+import io
+import Bytecode
+from JackCompiler import compile_file
+from StringPool import STATIC_SLOTS
+from VMRunner import VMRunner
+from VMWriter import parse_commands
+
+
+def run(source: str, **options) -> str:
+    """
+    Args:
+        source (str): a Main class.
+
+    Returns:
+        str: what it prints, compiled with the options.
+    """
+    output = io.StringIO()
+    compile_file(io.StringIO(source), output, **options)
+    return VMRunner([Bytecode.read(Bytecode.from_text(
+        output.getvalue()))]).run("Main.main")
+
+
+def test_strings_past_the_static_segment_are_built_inline():
+    prints = "".join('do Output.printString("s{}");'.format(number)
+                     for number in range(STATIC_SLOTS + 10))
+    source = """
+        class Main {
+            static int first, second;
+            function void main() { %s return; }
+        }""" % prints
+    output = io.StringIO()
+    compile_file(io.StringIO(source), output, opt_level=1, string_pool=True)
+    commands = parse_commands(output.getvalue())
+    assert max(command[2] for command in commands
+               if command[:2] == ("push", "static")) < STATIC_SLOTS
+    assert run(source, opt_level=1, string_pool=True) == run(source)
@@ -0,0 +1,77 @@
+"""
+Regression tests for SubexpressionEliminator: the values of calls that are
+not pure must never be reused, and pure values must not be reused across
+them.
+"""
+import io
+from JackCompiler import compile_file
+from SubexpressionEliminator import SubexpressionEliminator, number_values
+from VMWriter import parse_commands
+
+
+def compile_o2(source: str) -> list:
+    """
+    Args:
+        source (str): a Jack class.
+
+    Returns:
+        list: its VM commands, compiled at -O2.
+    """
+    output = io.StringIO()
+    compile_file(io.StringIO(source), output, opt_level=2)
+    return parse_commands(output.getvalue())
+
+
+def test_impure_calls_are_not_reused():
+    commands = compile_o2("""
+        class Main {
+            function int tick() { return 1; }
+            function void main() {
+                var int a;
+                let a = Main.tick() + Main.tick();
+                do Output.printInt(a);
+                return;
+            }
+        }""")
+    assert commands.count(("call", "Main.tick", 0)) == 2
+
+
+def test_pure_call_is_not_reused_across_impure_call():
+    # Main.bump changes x, so the second x * x is a different value.
+    commands = compile_o2("""
+        class Main {
+            static int x;
+            function void bump() { let x = x + 1; return; }
+            function void main() {
+                var int a, b;
+                let x = Keyboard.readInt("x? ");
+                let a = x * x;
+                do Main.bump();
+                let b = x * x;
+                do Output.printInt(a + b);
+                return;
+            }
+        }""")
+    assert commands.count(("call", "Math.multiply", 2)) == 2
+
+
+def test_method_calls_have_no_value_number():
+    block = [("push", "local", 0), ("call", "Point.getX", 1),
+             ("push", "local", 0), ("call", "Point.getX", 1), ("add",),
+             ("pop", "local", 1)]
+    for start, end, _ in number_values(block):
+        assert ("call", "Point.getX", 1) not in block[start:end]
+    assert SubexpressionEliminator().run(block) == block
+
+    commands = compile_o2("""
+        class Main {
+            function void main() {
+                var Point obj;
+                var int a;
+                let obj = Point.new(1, 2);
+                let a = obj.getX() + obj.getX();
+                do Output.printInt(a);
+                return;
+            }
+        }""")
+    assert commands.count(("call", "Point.getX", 1)) == 2
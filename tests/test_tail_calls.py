@@ -0,0 +1,62 @@
+"""
+Regression tests for self tail calls: only a call whose value is returned as
+it is becomes a jump, and a method that jumps back to its start runs on the
+receiver of the call.
+"""
+from CompilationEngine import START_LABEL
+from programs import compile_program, functions, run_program
+
+LIST = """
+    class Node {
+        field int value;
+        field Node next;
+        constructor Node new(int v, Node n) {
+            let value = v;
+            let next = n;
+            return this;
+        }
+        method int sum(int total) {
+            if (next = null) { return total + value; }
+            return next.sum(total + value);
+        }
+    }"""
+MAIN = """
+    class Main {
+        function void main() {
+            var Node list;
+            let list = Node.new(1, Node.new(20, Node.new(300, null)));
+            do Output.printInt(list.sum(0));
+            return;
+        }
+    }"""
+
+
+def test_method_tail_call_reloads_this_from_new_receiver():
+    compiled = compile_program([LIST, MAIN], opt_level=1)
+    method = functions(compiled["Node"])["Node.sum"]
+    assert ("call", "Node.sum", 2) not in method
+    assert ("goto", START_LABEL) in method
+    start = method.index(("label", START_LABEL))
+    assert method[start + 1:start + 3] == [("push", "argument", 0),
+                                           ("pop", "pointer", 0)]
+    assert run_program(compiled) == "321"
+    assert run_program(compile_program([LIST, MAIN])) == "321"
+
+
+def test_call_inside_returned_expression_is_not_a_jump():
+    sources = ["""
+        class Main {
+            function int count(int n) {
+                if (n = 0) { return 0; }
+                return 1 + Main.count(n - 1);
+            }
+            function void main() {
+                do Output.printInt(Main.count(5));
+                return;
+            }
+        }"""]
+    compiled = compile_program(sources, opt_level=1)
+    count = functions(compiled["Main"])["Main.count"]
+    assert ("call", "Main.count", 1) in count
+    assert ("label", START_LABEL) not in count
+    assert run_program(compiled) == "5"